@@ -139,3 +139,54 @@ def test_file_imports(rel_path, rv):
     else:
         # If rv is "No import errors," consider it a passed test
         print(f"{rel_path} passed the import test")
+
+
+# =========== DAG PARSE-TIME BUDGET ===========
+# Every DAG file is parsed by the scheduler on each loop, so parsing must stay
+# side-effect free and cheap (heavy imports belong inside the task callables).
+DAG_PARSE_BUDGET_SECONDS = float(os.environ.get("DAG_PARSE_BUDGET_SECONDS", "2.0"))
+
+# Parses one file in a fresh interpreter, so modules cached by other DAG files
+# (or by this test session) do not hide its real import cost.
+_PARSE_TIMER = """
+import sys, time
+from airflow.models import DagBag
+dag_bag = DagBag(dag_folder=sys.argv[1], include_examples=False, collect_dags=False)
+start = time.perf_counter()
+dag_bag.process_file(sys.argv[1], only_if_updated=False)
+print(time.perf_counter() - start)
+"""
+
+
+def get_dag_files():
+    """Files that define at least one DAG."""
+    with suppress_logging("airflow"):
+        dag_bag = DagBag(include_examples=False)
+    return sorted({dag.fileloc for dag in dag_bag.dags.values()})
+
+
+def parse_seconds(path):
+    import subprocess
+    import sys
+
+    output = subprocess.run(
+        [sys.executable, "-c", _PARSE_TIMER, path],
+        capture_output=True,
+        text=True,
+        check=True,
+        timeout=DAG_PARSE_BUDGET_SECONDS * 10 + 60,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize(
+    "dag_file", get_dag_files(), ids=[os.path.basename(x) for x in get_dag_files()]
+)
+def test_dag_parse_time(dag_file):
+    """Fail if parsing a DAG file exceeds DAG_PARSE_BUDGET_SECONDS"""
+    seconds = parse_seconds(dag_file)
+    print(f"{dag_file} parsed in {seconds:.3f}s (budget {DAG_PARSE_BUDGET_SECONDS}s)")
+    assert seconds <= DAG_PARSE_BUDGET_SECONDS, (
+        f"{dag_file} took {seconds:.3f}s to parse (budget {DAG_PARSE_BUDGET_SECONDS}s); "
+        "move heavy imports and I/O into the task callables"
+    )
@@ -0,0 +1,115 @@
+"""
+Benchmark: all-VARCHAR bronze vs typed bronze (see mitma/bronze_mitma.CSV_TYPES).
+
+Generates a synthetic MITMA-like daily file, writes it as bronze Parquet both
+ways and runs the silver transform over each, reporting bronze size and
+silver transform time. Runs on a local DuckDB, no lake needed.
+
+Usage (from the repo root):
+    python benchmarks/bench_bronze_types.py --rows 5000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import duckdb
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dags"))
+
+from mitma.bronze_mitma import CSV_TYPES  # noqa: E402
+
+SOURCE_COLUMNS = """
+    '20230102' AS fecha,
+    lpad(CAST(i % 24 AS VARCHAR), 2, '0') AS periodo,
+    lpad(CAST(1001 + i % 3000 AS VARCHAR), 5, '0') || CASE WHEN i % 7 = 0 THEN '_AM' ELSE '' END AS origen,
+    CASE WHEN i % 101 = 0 THEN 'externo' ELSE lpad(CAST(1001 + (i * 7) % 3000 AS VARCHAR), 5, '0') END AS destino,
+    ['0.5-2', '2-10', '10-50', '>50'][1 + i % 4] AS distancia,
+    ['casa', 'trabajo_estudio', 'frecuente', 'no_frecuente'][1 + i % 4] AS actividad_origen,
+    ['casa', 'trabajo_estudio', 'frecuente', 'no_frecuente'][1 + (i // 4) % 4] AS actividad_destino,
+    CASE WHEN i % 2 = 0 THEN 'si' ELSE 'no' END AS estudio_origen_posible,
+    CASE WHEN i % 3 = 0 THEN 'si' ELSE 'no' END AS estudio_destino_posible,
+    lpad(CAST(1 + i % 52 AS VARCHAR), 2, '0') AS residencia,
+    ['<10', '10-15', '>15'][1 + i % 3] AS renta,
+    ['0-25', '25-45', '45-65', '65-100', 'NA'][1 + i % 5] AS edad,
+    ['hombre', 'mujer', 'NA'][1 + i % 3] AS sexo,
+    CAST(round(random() * 50, 3) AS VARCHAR) AS viajes,
+    CAST(round(random() * 500, 3) AS VARCHAR) AS viajes_km
+"""
+
+SILVER_FILTER = """
+    origin_zone NOT LIKE 'PT%' AND destination_zone NOT LIKE 'PT%'
+    AND origin_zone NOT LIKE 'FR%' AND destination_zone NOT LIKE 'FR%'
+    AND origin_zone <> 'externo' AND destination_zone <> 'externo'
+"""
+
+BRONZE_SELECT = """
+    fecha AS date, periodo AS hour_period, origen AS origin_zone, destino AS destination_zone,
+    distancia AS distance_range, actividad_origen AS origin_activity, actividad_destino AS destination_activity,
+    estudio_origen_posible AS is_origin_study_possible, estudio_destino_posible AS is_destination_study_possible,
+    residencia AS residence_province_code, renta AS income_range, edad AS age_group, sexo AS gender,
+    viajes AS trips, viajes_km AS trips_km_product
+"""
+
+
+def timed(con, sql: str) -> float:
+    start = time.perf_counter()
+    con.execute(sql)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_bronze_")
+    csv_path = os.path.join(workdir, "20230102_Viajes_distritos.csv.gz")
+    con = duckdb.connect()
+    con.execute(f"""
+        COPY (SELECT {SOURCE_COLUMNS} FROM range({args.rows}) t(i))
+        TO '{csv_path}' (HEADER, DELIMITER '|', COMPRESSION gzip)
+    """)
+    print(f"Synthetic file: {args.rows} rows, {os.path.getsize(csv_path) / 1024 ** 2:.1f} MB gzip")
+
+    types = ", ".join(f"'{column}': '{dtype}'" for column, dtype in CSV_TYPES.items())
+    variants = {
+        "varchar": (
+            f"read_csv_auto('{csv_path}', compression='gzip', ignore_errors=true, all_varchar=true)",
+            """strptime(CAST(date AS VARCHAR), '%Y%m%d')::DATE AS date,
+               TRY_CAST(hour_period AS INTEGER) AS hour_period,
+               REPLACE(REPLACE(origin_zone, '_AM', ''), '_AD', '') AS origin_zone,
+               REPLACE(REPLACE(destination_zone, '_AM', ''), '_AD', '') AS destination_zone,
+               TRY_CAST(trips AS DOUBLE) AS trips""",
+            """CAST(date AS VARCHAR) = '20230102'
+               AND TRY_CAST(trips AS DOUBLE) IS NOT NULL AND TRY_CAST(hour_period AS INTEGER) IS NOT NULL""",
+        ),
+        "typed": (
+            f"read_csv('{csv_path}', compression='gzip', header=true, dateformat='%Y%m%d', types={{{types}}})",
+            """date, CAST(hour_period AS INTEGER) AS hour_period,
+               REPLACE(REPLACE(origin_zone, '_AM', ''), '_AD', '') AS origin_zone,
+               REPLACE(REPLACE(destination_zone, '_AM', ''), '_AD', '') AS destination_zone,
+               trips""",
+            "date = DATE '2023-01-02' AND trips IS NOT NULL AND hour_period IS NOT NULL",
+        ),
+    }
+
+    for label, (reader, silver_columns, silver_where) in variants.items():
+        bronze_path = os.path.join(workdir, f"bronze_{label}.parquet")
+        bronze_s = timed(con, f"COPY (SELECT {BRONZE_SELECT} FROM {reader}) TO '{bronze_path}' (FORMAT parquet)")
+        silver_s = timed(con, f"""
+            CREATE OR REPLACE TABLE silver_{label} AS
+            SELECT {silver_columns}, 2 AS day_type
+            FROM read_parquet('{bronze_path}')
+            WHERE {silver_where} AND {SILVER_FILTER}
+        """)
+        rows = con.execute(f"SELECT COUNT(*) FROM silver_{label}").fetchone()[0]
+        print(
+            f"{label:<8} bronze={os.path.getsize(bronze_path) / 1024 ** 2:8.1f} MB  "
+            f"bronze_write={bronze_s:6.2f}s  silver_transform={silver_s:6.2f}s  silver_rows={rows}"
+        )
+
+
+if __name__ == "__main__":
+    main()
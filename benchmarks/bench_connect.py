@@ -0,0 +1,66 @@
+"""
+Benchmark: cost of opening a DuckLake session with and without the session pool.
+
+Usage (from the repo root, with the same env vars the workers use):
+    python benchmarks/bench_connect.py --sessions 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dags"))
+
+from ducklake_pool import DuckLakeSessionPool  # noqa: E402
+from ducklake_utils import connect_ducklake, close_ducklake  # noqa: E402
+
+
+def bench_fresh(sessions: int) -> list:
+    """One connect_ducklake()/close_ducklake() pair per session (current behaviour)."""
+    timings = []
+    for _ in range(sessions):
+        start = time.perf_counter()
+        con = connect_ducklake()
+        con.execute("SELECT 1").fetchone()
+        close_ducklake(con)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_pooled(sessions: int) -> list:
+    """Same number of sessions served by a DuckLakeSessionPool."""
+    pool = DuckLakeSessionPool(max_size=1)
+    timings = []
+    try:
+        for _ in range(sessions):
+            start = time.perf_counter()
+            with pool.session() as con:
+                con.execute("SELECT 1").fetchone()
+            timings.append(time.perf_counter() - start)
+    finally:
+        pool.close_all()
+    print(f"   pool stats: {pool.stats}")
+    return timings
+
+
+def report(label: str, timings: list):
+    print(
+        f"{label:<8} n={len(timings):<4} total={sum(timings):8.3f}s  "
+        f"mean={statistics.mean(timings) * 1000:9.1f}ms  "
+        f"p50={statistics.median(timings) * 1000:9.1f}ms  "
+        f"max={max(timings) * 1000:9.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=10)
+    args = parser.parse_args()
+
+    report("fresh", bench_fresh(args.sessions))
+    report("pooled", bench_pooled(args.sessions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark: silver written in arrival order vs sorted by the silver sort keys
+(see mitma/silver_mitma.DEFAULT_SILVER_SORT_KEYS).
+
+Generates synthetic bronze-shaped rows for a few dates and writes them into a
+silver table through the same insert the pipeline runs (replace_partition
+over silver_select_sql, one date per call as in the date-partitioned lake),
+once per layout. Each date is then exported to its own Parquet file in
+table order, like the lake's per-date files, and selective queries like the
+report (a few origin zones) and the gravity rollups (one day_type) run over
+them. Reports the write and query times and how many row groups the min/max
+statistics allow to skip. Runs on a local DuckDB, no lake needed.
+
+day_type has a single value per date, so as a leading sort key it does not
+change the order inside a date partition: the "day_type first" layout is
+there to show it writes the same files as the default keys.
+
+Usage (from the repo root):
+    python benchmarks/bench_silver_clustering.py --days 7 --rows-per-day 2000000
+"""
+import argparse
+import datetime
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import duckdb
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dags"))
+
+from ducklake_utils import DIM_DATE_TABLE, SILVER_MITMA_TABLE, replace_partition  # noqa: E402
+from mitma.silver_mitma import DEFAULT_SILVER_SORT_KEYS, build_dim_date, silver_select_sql  # noqa: E402
+
+ZONES = 3500
+FIRST_DAY = datetime.date(2023, 1, 2)
+
+STAGING_COLUMNS = f"""
+    DATE '{FIRST_DAY.isoformat()}' + CAST({{day}} AS INTEGER) AS date,
+    lpad(CAST(hash(i, 1) % 24 AS VARCHAR), 2, '0') AS hour_period,
+    lpad(CAST(1001 + hash(i, 2) % {ZONES} AS VARCHAR), 7, '0') AS origin_zone,
+    lpad(CAST(1001 + hash(i, 3) % {ZONES} AS VARCHAR), 7, '0') AS destination_zone,
+    round(random() * 50, 3) AS trips
+"""
+
+QUERIES = {
+    "report (3 origin zones)": """
+        SELECT hour_period, SUM(trips) FROM {silver}
+        WHERE origin_zone IN ('0001500', '0001501', '0001502') GROUP BY hour_period
+    """,
+    "one origin, rush hours": """
+        SELECT destination_zone, SUM(trips) FROM {silver}
+        WHERE origin_zone = '0002000' AND hour_period BETWEEN 7 AND 9 GROUP BY destination_zone
+    """,
+    "holidays (day_type = 8)": """
+        SELECT origin_zone, AVG(trips) FROM {silver} WHERE day_type = 8 GROUP BY origin_zone
+    """,
+    "full scan (control)": """
+        SELECT day_type, SUM(trips) FROM {silver} GROUP BY day_type
+    """,
+}
+
+
+def timed(con, sql: str, repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        con.execute(sql).fetchall()
+        runs.append(time.perf_counter() - start)
+    return statistics.median(runs)
+
+
+def skippable_row_groups(con, files: str, column: str, values: list) -> tuple:
+    """(row groups whose min/max exclude all values, total row groups) for column."""
+    in_range = " OR ".join(f"('{v}' BETWEEN stats_min_value AND stats_max_value)" for v in values)
+    return con.execute(f"""
+        SELECT COUNT(*) FILTER (WHERE NOT ({in_range})), COUNT(*)
+        FROM parquet_metadata({files}) WHERE path_in_schema = '{column}'
+    """).fetchone()
+
+
+def write_silver(path: str, days: list, rows_per_day: int, order_by) -> float:
+    """Loads the synthetic dates into a fresh silver table at path; returns the insert time."""
+    con = duckdb.connect(path)
+    con.execute("CREATE TABLE ref_holidays (date DATE, is_holiday BOOLEAN)")
+    con.execute("INSERT INTO ref_holidays VALUES (DATE '2023-01-06', true)")
+    build_dim_date(con, FIRST_DAY.year)
+    con.execute(f"""
+        CREATE TABLE {SILVER_MITMA_TABLE} (
+            date DATE, hour_period INTEGER, origin_zone VARCHAR, destination_zone VARCHAR,
+            trips DOUBLE, day_type INTEGER, origin_zone_key INTEGER, destination_zone_key INTEGER
+        )
+    """)
+    seconds = 0.0
+    for i, day in enumerate(days):
+        con.execute("DROP TABLE IF EXISTS _bench_staging")
+        con.execute(f"CREATE TEMP TABLE _bench_staging AS SELECT {STAGING_COLUMNS.format(day=i)} "
+                    f"FROM range({rows_per_day}) t(i)")
+        start = time.perf_counter()
+        replace_partition(con, SILVER_MITMA_TABLE, day, silver_select_sql(
+            "_bench_staging",
+            day_type_sql="d.day_type",
+            joins=f"JOIN {DIM_DATE_TABLE} d ON d.date = b.date",
+        ), order_by=order_by)
+        seconds += time.perf_counter() - start
+    con.close()
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--rows-per-day", type=int, default=1_000_000)
+    parser.add_argument("--sort-keys", default=DEFAULT_SILVER_SORT_KEYS)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_silver_")
+    days = [FIRST_DAY + datetime.timedelta(days=i) for i in range(args.days)]
+    layouts = {
+        "arrival": None,
+        "sorted": args.sort_keys,
+        "day_type first": f"day_type, {args.sort_keys}",
+    }
+    print(f"Silver: {args.days} days x {args.rows_per_day} rows, sort keys ({args.sort_keys})")
+    con = duckdb.connect()
+    for label, order_by in layouts.items():
+        folder = os.path.join(workdir, label.replace(" ", "_"))
+        os.makedirs(folder)
+        database = os.path.join(folder, "silver.duckdb")
+        seconds = write_silver(database, days, args.rows_per_day, order_by)
+        con.execute(f"ATTACH '{database}' AS src (READ_ONLY)")
+        for day in days:
+            # One file per date in table order, like the lake's date partitions
+            con.execute(f"""
+                COPY (SELECT * FROM src.{SILVER_MITMA_TABLE} WHERE date = DATE '{day.isoformat()}')
+                TO '{os.path.join(folder, f"{day.isoformat()}.parquet")}' (FORMAT parquet)
+            """)
+        con.execute("DETACH src")
+
+        files = f"'{os.path.join(folder, '*.parquet')}'"
+        view = f"silver_{label.replace(' ', '_')}"
+        con.execute(f"CREATE OR REPLACE VIEW {view} AS SELECT * FROM read_parquet({files})")
+        skipped, total = skippable_row_groups(con, files, "origin_zone", ["0001500", "0001501", "0001502"])
+        print(f"\n{label} (order by {order_by or '-'}): write={seconds:6.2f}s, "
+              f"report filter can skip {skipped}/{total} row groups on origin_zone")
+        for name, sql in QUERIES.items():
+            query_seconds = timed(con, sql.format(silver=view), args.repeat)
+            print(f"   {name:<26} {query_seconds * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -45,7 +45,8 @@ from bussiness_layer.transform_gold_long_trip_dependency import transform_gold_l
 # Report generation
 from bussiness_layer.generate_report import generate_mobility_report_local
 
-from ducklake_utils import connect_ducklake, close_ducklake
+from ducklake_pool import ducklake_session
+from ducklake_utils import pin_table_files, GOLD_MITMA_TABLE
 
 
 # =============================================================================
@@ -129,9 +130,8 @@ with DAG(
     with TaskGroup("bq1_typical_patterns", tooltip="Business Question 1: Typical Day Patterns") as bq1_group:
 
         def _generate_report(**context):
-            con = None
-            try:
-                con = connect_ducklake()
+            with ducklake_session(stage="mobility_report", read_only=True) as con:
+                pin_table_files(con, GOLD_MITMA_TABLE)
 
                 # Auto-select ALL district_id values present in gold_geometry_wgs84.
                 rows = con.execute(
@@ -160,9 +160,6 @@ with DAG(
                 kwargs.update(_inject_year_kwargs(generate_mobility_report_local, FORCED_YEAR))
 
                 generate_mobility_report_local(**kwargs)
-            finally:
-                if con:
-                    close_ducklake(con)
 
         t_report = PythonOperator(task_id="generate_mobility_report", python_callable=_generate_report)
 
@@ -1,12 +1,8 @@
 import io
 import os
 from pathlib import Path
-import matplotlib.pyplot as plt
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from reportlab.lib import colors
 from ducklake_utils import GOLD_MITMA_TABLE
+from catalog_cache import catalog_cache
 
 def get_day_type_name(dt):
     mapping = {
@@ -19,6 +15,8 @@ def create_mobility_plot(x_data, y_data, title, y_label, color='#007acc'):
     """
     Helper function to generate a plot and return it as an in-memory buffer.
     """
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(8, 3)) 
     
     plt.plot(x_data, y_data, marker='o', linestyle='-', color=color, linewidth=2)
@@ -54,22 +52,14 @@ def _resolve_output_dir(output_dir: str) -> Path:
     return p
 
 
-def _escape_ident_for_pragma(name: str) -> str:
-    # PRAGMA table_info('<name>') uses a string literal, so we just escape single quotes.
-    return (name or "").replace("'", "''")
-
-
 def _table_has_column(con, table_name: str, column_name: str) -> bool:
     """Return True if `table_name` has `column_name`.
 
-    Works for DuckDB/DuckLake connections.
+    Works for DuckDB/DuckLake connections. Answers from the session's catalog
+    metadata cache, so repeated checks do not hit the catalog database.
     """
     try:
-        t = _escape_ident_for_pragma(table_name)
-        df_cols = con.execute(f"PRAGMA table_info('{t}')").fetch_df()
-        if df_cols is None or df_cols.empty:
-            return False
-        return column_name in df_cols["name"].tolist()
+        return catalog_cache(con).has_column(table_name, column_name)
     except Exception:
         return False
 
@@ -95,6 +85,11 @@ def generate_mobility_report_local(
     # and the filter is applied via JOIN with gold_geometry_wgs84:
     #   g.origin_zone (census_section_id) -> geo.census_section_id -> geo.district_id IN (...)
 
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
     if not target_origins:
         print("⚠️ Empty district list. Report skipped.")
         return
@@ -9,7 +9,8 @@ def transform_gold_long_trip_dependency(year: int | None = None, generate_map: b
     """
 
     import os
-    from ducklake_utils import connect_ducklake, close_ducklake
+    from ducklake_pool import ducklake_session
+    from catalog_cache import catalog_cache
 
     if year is None:
         try:
@@ -20,8 +21,7 @@ def transform_gold_long_trip_dependency(year: int | None = None, generate_map: b
             year = 2023
 
     def cols_info(con, table: str) -> dict[str, str]:
-        rows = con.execute(f"PRAGMA table_info('{table}')").fetchall()
-        return {r[1]: r[2] for r in rows}
+        return catalog_cache(con).columns(table)
 
     def pick(cols: dict[str, str], candidates: list[str], label: str) -> str:
         for c in candidates:
@@ -32,11 +32,7 @@ def transform_gold_long_trip_dependency(year: int | None = None, generate_map: b
             f"Tried: {candidates}. Available: {sorted(cols.keys())}"
         )
 
-    con = None
-    try:
-        con = connect_ducklake()
-        con.execute("INSTALL spatial;")
-        con.execute("LOAD spatial;")
+    with ducklake_session(stage="long_trip_dependency") as con:
 
         # --- Trips (silver_mobility_trips)
         tcols = cols_info(con, "silver_mobility_trips")
@@ -158,8 +154,10 @@ def transform_gold_long_trip_dependency(year: int | None = None, generate_map: b
         FROM agg;
         """)
 
-        # --- Map (Kepler.gl)
-        if generate_map:
+    # --- Map (Kepler.gl): read-only session pinned to one snapshot, so it does
+    # not race with writers; the gold table written above is already committed.
+    if generate_map:
+        with ducklake_session(stage="long_trip_dependency", read_only=True) as con:
             from keplergl import KeplerGl
 
             output_dir = "/usr/local/airflow/include/outputs"
@@ -204,11 +202,3 @@ def transform_gold_long_trip_dependency(year: int | None = None, generate_map: b
             map_kepler.save_to_html(file_name=output_path)
 
             print(f"✓ Map saved to: {output_path}")
-
-    finally:
-        if con:
-            close_ducklake(con)
-
-
-
-
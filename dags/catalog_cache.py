@@ -0,0 +1,146 @@
+"""
+Caché de metadatos del catálogo por sesión DuckLake.
+
+Con el catálogo en Postgres (Neon), cada table_exists() o PRAGMA table_info es
+un viaje de red. CatalogCache carga de una vez tablas, columnas, tipos y filas
+estimadas (estadísticas de DuckLake) y responde las comprobaciones desde memoria:
+
+    from catalog_cache import catalog_cache
+
+    cols = catalog_cache(con).columns("silver_mobility_trips")   # {columna: tipo}
+
+ducklake_session() asocia una caché a cada sesión y la invalida cuando por la
+misma sesión pasa DDL (CREATE/DROP/ALTER/...); las sentencias DML solo invalidan
+los conteos de filas. Con una conexión cruda (sin sesión) se crea una caché
+efímera, equivalente a consultar el catálogo directamente.
+"""
+import re
+
+# Sentencias que cambian la estructura del catálogo (o la base de datos en uso).
+_DDL_RE = re.compile(
+    r"^\s*(?:--[^\n]*\n\s*)*(CREATE|DROP|ALTER|ATTACH|DETACH|USE|ROLLBACK|ABORT|COMMENT|IMPORT)\b",
+    re.IGNORECASE,
+)
+# Sentencias que solo cambian el número de filas.
+_DML_RE = re.compile(
+    r"^\s*(?:--[^\n]*\n\s*)*(INSERT|DELETE|UPDATE|MERGE|COPY|TRUNCATE)\b",
+    re.IGNORECASE,
+)
+
+_TABLES_SQL = """
+    SELECT database_name, schema_name, table_name, estimated_size, temporary
+    FROM duckdb_tables()
+    WHERE NOT internal
+    UNION ALL
+    SELECT database_name, schema_name, view_name, NULL, temporary
+    FROM duckdb_views()
+    WHERE NOT internal
+"""
+
+_COLUMNS_SQL = """
+    SELECT database_name, schema_name, table_name, column_name, data_type
+    FROM duckdb_columns()
+    WHERE NOT internal
+    ORDER BY database_name, schema_name, table_name, column_index
+"""
+
+
+class CatalogCache:
+    """Instantánea de tablas/columnas de una conexión, cargada bajo demanda."""
+
+    def __init__(self, con):
+        self._con = con
+        self._tables = None
+        self._columns = None
+        self.stats = {"loads": 0, "hits": 0, "invalidations": 0}
+
+    def invalidate(self, rows_only: bool = False):
+        """Descarta la instantánea (o solo los conteos de filas)."""
+        self.stats["invalidations"] += 1
+        self._tables = None
+        if not rows_only:
+            self._columns = None
+
+    def observe(self, query: str):
+        """Invalida según la sentencia ejecutada en la sesión."""
+        if not isinstance(query, str):
+            return
+        if _DDL_RE.match(query):
+            self.invalidate()
+        elif _DML_RE.match(query):
+            self.invalidate(rows_only=True)
+
+    def _current(self):
+        return self._con.execute("SELECT current_database(), current_schema()").fetchone()
+
+    def _rank(self, database: str, schema: str, temporary: bool, current) -> int:
+        # Mismo orden de resolución que DuckDB: temporales, luego la base en uso.
+        if temporary:
+            return 0
+        if (database, schema) == tuple(current):
+            return 1
+        if database == current[0]:
+            return 2
+        return 3
+
+    def _load_tables(self):
+        if self._tables is not None:
+            self.stats["hits"] += 1
+            return self._tables
+        self.stats["loads"] += 1
+        current = self._current()
+        tables = {}
+        for database, schema, name, rows, temporary in self._con.execute(_TABLES_SQL).fetchall():
+            rank = self._rank(database, schema, temporary, current)
+            key = name.lower()
+            if key not in tables or rank < tables[key]["rank"]:
+                tables[key] = {
+                    "database": database,
+                    "schema": schema,
+                    "name": name,
+                    "rows": rows,
+                    "rank": rank,
+                }
+        self._tables = tables
+        return tables
+
+    def _load_columns(self):
+        if self._columns is not None:
+            self.stats["hits"] += 1
+            return self._columns
+        tables = self._load_tables()
+        self.stats["loads"] += 1
+        columns = {}
+        for database, schema, name, column, dtype in self._con.execute(_COLUMNS_SQL).fetchall():
+            entry = tables.get(name.lower())
+            if entry is None or (entry["database"], entry["schema"]) != (database, schema):
+                continue
+            columns.setdefault(name.lower(), {})[column] = dtype
+        self._columns = columns
+        return columns
+
+    def tables(self) -> list:
+        return sorted(t["name"] for t in self._load_tables().values())
+
+    def has_table(self, table_name: str) -> bool:
+        return table_name.lower() in self._load_tables()
+
+    def columns(self, table_name: str) -> dict:
+        """{columna: tipo} en el orden de la tabla; vacío si la tabla no existe."""
+        return dict(self._load_columns().get(table_name.lower(), {}))
+
+    def has_column(self, table_name: str, column_name: str) -> bool:
+        return column_name in self._load_columns().get(table_name.lower(), {})
+
+    def row_count(self, table_name: str):
+        """Filas estimadas según las estadísticas del catálogo (None si no hay)."""
+        entry = self._load_tables().get(table_name.lower())
+        return entry["rows"] if entry else None
+
+
+def catalog_cache(con) -> CatalogCache:
+    """Caché de la sesión si la conexión viene de ducklake_session(), si no una efímera."""
+    cache = getattr(con, "catalog", None)
+    if isinstance(cache, CatalogCache):
+        return cache
+    return CatalogCache(con)
@@ -0,0 +1,259 @@
+"""
+Pool de sesiones DuckLake a nivel de worker.
+
+connect_ducklake() instala/carga extensiones, crea los secrets y hace el ATTACH
+del catálogo en Postgres en cada llamada. El pool mantiene conexiones ya
+adjuntadas y las reutiliza dentro del mismo proceso:
+
+    from ducklake_pool import ducklake_session
+
+    with ducklake_session() as con:
+        con.execute("SELECT COUNT(*) FROM silver_mobility_trips").fetchone()
+
+    # Todas las escrituras de la sesión en un único commit (un snapshot)
+    with ducklake_session(transaction=True) as con:
+        ...
+
+Variables de entorno:
+    DUCKLAKE_POOL_ENABLED            "0" desactiva el pool (conectar/cerrar siempre)
+    DUCKLAKE_POOL_MAX_SIZE           conexiones ociosas por configuración (default 2)
+    DUCKLAKE_POOL_MAX_IDLE_SECONDS   segundos antes de descartar una conexión ociosa (default 600)
+    DUCKLAKE_GATEWAY_SOCKET          socket del gateway del lago (ver lake_gateway); las etapas
+                                     de lectura en GATEWAY_STAGES se sirven desde él
+
+Las sesiones se entregan envueltas en query_telemetry.InstrumentedConnection,
+con una caché de metadatos del catálogo en session.catalog (ver catalog_cache).
+"""
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from ducklake_utils import (
+    connect_ducklake, close_ducklake, ducklake_read_snapshot, ducklake_transaction, unpin_table_files,
+    DUCKLAKE_ATTACH_NAME,
+)
+from catalog_cache import CatalogCache
+from lake_gateway import connect_gateway
+from query_telemetry import InstrumentedConnection, telemetry_enabled
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.environ.get(name, default).strip().lower() not in ("0", "false", "no", "off")
+
+
+class DuckLakeSessionPool:
+    """Conexiones DuckLake ociosas agrupadas por los argumentos de connect_ducklake()."""
+
+    def __init__(self, connect=connect_ducklake, max_size: int = 2, max_idle_seconds: float = 600):
+        self._connect = connect
+        self.max_size = max_size
+        self.max_idle_seconds = max_idle_seconds
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._pid = os.getpid()
+        # Conexiones heredadas de un fork: no se cierran nunca en el hijo.
+        self._abandoned = []
+        self.stats = {"created": 0, "reused": 0, "discarded": 0}
+
+    @staticmethod
+    def _key(connect_kwargs: dict) -> tuple:
+        return tuple(sorted(connect_kwargs.items()))
+
+    def _after_fork(self):
+        """Olvida las conexiones del padre sin cerrarlas (no son seguras tras fork)."""
+        for bucket in self._idle.values():
+            self._abandoned.extend(con for con, _ in bucket)
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            self._after_fork()
+
+    def _is_healthy(self, con) -> bool:
+        try:
+            attached = con.execute(
+                "SELECT COUNT(*) FROM duckdb_databases() WHERE database_name = ?",
+                [DUCKLAKE_ATTACH_NAME],
+            ).fetchone()[0]
+            if not attached:
+                return False
+            con.execute(f"USE {DUCKLAKE_ATTACH_NAME}")
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, con):
+        self.stats["discarded"] += 1
+        try:
+            close_ducklake(con)
+        except Exception:
+            pass
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            for key, bucket in self._idle.items():
+                keep = [(con, ts) for con, ts in bucket if now - ts <= self.max_idle_seconds]
+                expired.extend(con for con, ts in bucket if now - ts > self.max_idle_seconds)
+                self._idle[key] = keep
+        for con in expired:
+            self._discard(con)
+
+    def acquire(self, **connect_kwargs):
+        """Devuelve una conexión ya adjuntada (reutilizada si hay una sana)."""
+        self._check_fork()
+        self._evict_idle()
+        key = self._key(connect_kwargs)
+        while True:
+            with self._lock:
+                bucket = self._idle.get(key)
+                entry = bucket.pop() if bucket else None
+            if entry is None:
+                break
+            con, _ = entry
+            if self._is_healthy(con):
+                self.stats["reused"] += 1
+                return con
+            self._discard(con)
+
+        con = self._connect(**connect_kwargs)
+        self.stats["created"] += 1
+        return con
+
+    def release(self, con, discard: bool = False, **connect_kwargs):
+        """Devuelve la conexión al pool, o la cierra si sobra o está marcada para descartar."""
+        self._check_fork()
+        key = self._key(connect_kwargs)
+        if not discard:
+            with self._lock:
+                bucket = self._idle.setdefault(key, [])
+                if len(bucket) < self.max_size:
+                    bucket.append((con, time.monotonic()))
+                    return
+        self._discard(con)
+
+    @contextmanager
+    def session(self, **connect_kwargs):
+        """Context manager: si el bloque falla la conexión se descarta en lugar de reutilizarse."""
+        con = self.acquire(**connect_kwargs)
+        failed = False
+        try:
+            yield con
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.release(con, discard=failed, **connect_kwargs)
+
+    def close_all(self):
+        """Cierra todas las conexiones ociosas del proceso actual."""
+        if self._pid != os.getpid():
+            return
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for bucket in idle.values():
+            for con, _ in bucket:
+                self._discard(con)
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_session_pool() -> DuckLakeSessionPool:
+    """Pool compartido por todo el proceso (se crea la primera vez que se usa)."""
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = DuckLakeSessionPool(
+                    max_size=int(os.environ.get("DUCKLAKE_POOL_MAX_SIZE", "2")),
+                    max_idle_seconds=float(os.environ.get("DUCKLAKE_POOL_MAX_IDLE_SECONDS", "600")),
+                )
+    return _POOL
+
+
+@contextmanager
+def _instrumented(con, transaction: bool = False, read_snapshot: bool = False):
+    """
+    Envuelve la conexión con telemetría de consultas y caché del catálogo. Las
+    vistas de pin_table_files se borran al salir: la conexión vuelve al pool.
+    """
+    session = InstrumentedConnection(con, enabled=telemetry_enabled())
+    session.catalog = CatalogCache(con)
+    session.listeners.append(session.catalog.observe)
+    session.pinned_views = set()
+    try:
+        if transaction:
+            with ducklake_transaction(session, label=_transaction_label()):
+                yield session
+        elif read_snapshot:
+            with ducklake_read_snapshot(session):
+                yield session
+        else:
+            yield session
+    finally:
+        try:
+            unpin_table_files(session, *sorted(session.pinned_views))
+        finally:
+            session.finish()
+
+
+def _transaction_label() -> str:
+    return os.environ.get("AIRFLOW_CTX_TASK_ID", "")
+
+
+@contextmanager
+def ducklake_session(transaction: bool = False, **connect_kwargs):
+    """
+    Sesión DuckLake lista para usar (USE mobility_ducklake ya aplicado).
+
+    Con transaction=True todo el bloque se ejecuta en una única transacción
+    (ver ducklake_utils.ducklake_transaction): un snapshot por tarea y ROLLBACK
+    completo si algo falla.
+
+    Con read_only=True (ver connect_ducklake) y sin `snapshot` explícito, el
+    bloque lee de un único snapshot aunque otros procesos sigan escribiendo.
+    """
+    read_snapshot = connect_kwargs.get("read_only", False) and connect_kwargs.get("snapshot") is None
+    use_gateway = not transaction and connect_kwargs.get("snapshot") is None
+    gateway = connect_gateway(connect_kwargs.get("stage")) if use_gateway else None
+    if gateway is not None:
+        try:
+            with _instrumented(gateway, read_snapshot=read_snapshot) as session:
+                yield session
+        finally:
+            gateway.close()
+        return
+
+    if not _env_flag("DUCKLAKE_POOL_ENABLED", "1"):
+        con = connect_ducklake(**connect_kwargs)
+        try:
+            with _instrumented(con, transaction, read_snapshot) as session:
+                yield session
+        finally:
+            close_ducklake(con)
+        return
+
+    with get_session_pool().session(**connect_kwargs) as con:
+        with _instrumented(con, transaction, read_snapshot) as session:
+            yield session
+
+
+def _reset_pool_after_fork():
+    if _POOL is not None:
+        _POOL._after_fork()
+
+
+def _close_pool_at_exit():
+    if _POOL is not None:
+        _POOL.close_all()
+
+
+os.register_at_fork(after_in_child=_reset_pool_after_fork)
+atexit.register(_close_pool_at_exit)
@@ -2,9 +2,7 @@ def create_silver_geometry():
     from ducklake_utils import connect_ducklake, close_ducklake
     con = None
     try:
-        con = connect_ducklake()
-        con.execute("INSTALL spatial")
-        con.execute("LOAD spatial")
+        con = connect_ducklake(stage="geometry")
         
         con.execute("""
             CREATE TABLE IF NOT EXISTS silver_geometry_wgs84 (
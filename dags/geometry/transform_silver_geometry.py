@@ -2,9 +2,7 @@ def transform_silver_geometry(year: int):
     from ducklake_utils import connect_ducklake, close_ducklake
     con = None
     try:
-        con = connect_ducklake()
-        con.execute("INSTALL spatial")
-        con.execute("LOAD spatial")
+        con = connect_ducklake(stage="geometry")
         
         bronze_table = f'bronze_geometry_{year}'
         silver_table = 'silver_geometry_wgs84'
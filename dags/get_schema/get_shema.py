@@ -1,4 +1,3 @@
-import duckdb
 from ducklake_utils import connect_ducklake, close_ducklake
 def get_schema_task():
     """
@@ -7,7 +6,7 @@ def get_schema_task():
     con=None
     try:
             
-        con = connect_ducklake()
+        con = connect_ducklake(stage="schema_inspector")
         
 	
         # The Query
@@ -22,4 +21,5 @@ def get_schema_task():
         if con:
             close_ducklake(con)
 # Run the 'DAG'
-get_schema_task()
\ No newline at end of file
+if __name__ == "__main__":
+    get_schema_task()
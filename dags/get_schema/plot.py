@@ -1,6 +1,6 @@
-from graphviz import Digraph
-
 def create_schema_plot(filename='schema_plot'):
+    from graphviz import Digraph
+
     dot = Digraph(comment='MITMA Schema', format='png')
     dot.attr(rankdir='LR')
     dot.attr('node', shape='record', style='filled', fillcolor='#f0f0f0')
@@ -34,4 +34,5 @@ def create_schema_plot(filename='schema_plot'):
     output_path = dot.render(filename, cleanup=True)
     print(f"Plot saved to {output_path}")
 
-create_schema_plot()
\ No newline at end of file
+if __name__ == "__main__":
+    create_schema_plot()
@@ -1,6 +1,4 @@
 from datetime import datetime, timedelta
-import duckdb
-from get_schema.get_shema import get_schema_task
 from ducklake_utils import connect_ducklake, close_ducklake
 
 # --- Use your preferred imports ---
@@ -32,7 +30,7 @@ def duckdb_schema_pipeline():
 
         # 2. Connect to DuckDB
         try:
-            con = connect_ducklake()
+            con = connect_ducklake(stage="schema_inspector")
             # 3. Run the specific query you asked for
             # This retrieves the 'CREATE TABLE' statements
             query = "SELECT sql FROM sqlite_master WHERE type = 'table';"
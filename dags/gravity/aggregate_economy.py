@@ -1,11 +1,9 @@
-from ducklake_utils import connect_ducklake, close_ducklake
+from ducklake_pool import ducklake_session
 
 
 def aggregate_economy(year: int = 2023):
     """Agrega datos económicos a nivel de municipio."""
-    con = None
-    try:
-        con = connect_ducklake()
+    with ducklake_session() as con:
         
         con.execute(f"""
             CREATE OR REPLACE TABLE temp_economy_by_municipality AS
@@ -19,7 +17,3 @@ def aggregate_economy(year: int = 2023):
         
         count = con.execute("SELECT COUNT(*) FROM temp_economy_by_municipality").fetchone()[0]
         print(f"✓ Municipios con datos económicos ({year}): {count}")
-        
-    finally:
-        if con:
-            close_ducklake(con)
@@ -1,26 +1,23 @@
-from ducklake_utils import connect_ducklake, close_ducklake
+from ducklake_pool import ducklake_session
+from ducklake_utils import DIM_ZONE_TABLE
 
 
 def aggregate_trips():
-    """Agrega viajes a nivel de municipio."""
-    con = None
-    try:
-        con = connect_ducklake()
+    """Agrega viajes a nivel de municipio (claves enteras de dim_zone)."""
+    with ducklake_session() as con:
         
-        con.execute("""
+        con.execute(f"""
             CREATE OR REPLACE TABLE temp_trips_by_municipality AS
             SELECT 
-                LEFT(origin_zone, 5) AS origin_municipality,
-                LEFT(destination_zone, 5) AS dest_municipality,
-                SUM(avg_trips) AS mean_trips,
-                AVG(std_trips) AS std_trips
-            FROM gold_typical_day_patterns
-            GROUP BY LEFT(origin_zone, 5), LEFT(destination_zone, 5)
+                lpad(CAST(oz.municipality_key AS VARCHAR), 5, '0') AS origin_municipality,
+                lpad(CAST(dz.municipality_key AS VARCHAR), 5, '0') AS dest_municipality,
+                SUM(g.avg_trips) AS mean_trips,
+                AVG(g.std_trips) AS std_trips
+            FROM gold_typical_day_patterns g
+            JOIN {DIM_ZONE_TABLE} oz ON oz.zone_key = g.origin_zone_key
+            JOIN {DIM_ZONE_TABLE} dz ON dz.zone_key = g.destination_zone_key
+            GROUP BY oz.municipality_key, dz.municipality_key
         """)
         
         count = con.execute("SELECT COUNT(*) FROM temp_trips_by_municipality").fetchone()[0]
         print(f"✓ Pares origen-destino: {count:,}")
-        
-    finally:
-        if con:
-            close_ducklake(con)
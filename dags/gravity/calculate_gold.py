@@ -1,11 +1,9 @@
-from ducklake_utils import connect_ducklake, close_ducklake
+from ducklake_pool import ducklake_session
 
 
 def calculate_and_create_gold():
     """Calcula k y crea la tabla gold."""
-    con = None
-    try:
-        con = connect_ducklake()
+    with ducklake_session() as con:
         
         # Calcular constante k
         k_result = con.execute("""
@@ -46,7 +44,3 @@ def calculate_and_create_gold():
         
         count = con.execute("SELECT COUNT(*) FROM gold_gravity_model_analysis").fetchone()[0]
         print(f"✓ gold_gravity_model_analysis: {count:,} filas")
-        
-    finally:
-        if con:
-            close_ducklake(con)
@@ -1,11 +1,9 @@
-from ducklake_utils import connect_ducklake, close_ducklake
+from ducklake_pool import ducklake_session
 
 
 def cleanup_temp_tables():
     """Limpia las tablas temporales."""
-    con = None
-    try:
-        con = connect_ducklake()
+    with ducklake_session() as con:
         
         for table in ["temp_municipality_centroids", "temp_municipality_distances", 
                       "temp_trips_by_municipality", "temp_economy_by_municipality", 
@@ -13,7 +11,3 @@ def cleanup_temp_tables():
             con.execute(f"DROP TABLE IF EXISTS {table}")
         
         print("✓ Tablas temporales eliminadas")
-        
-    finally:
-        if con:
-            close_ducklake(con)
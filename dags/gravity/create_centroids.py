@@ -1,13 +1,9 @@
-from ducklake_utils import connect_ducklake, close_ducklake
+from ducklake_pool import ducklake_session
 
 
 def create_municipality_centroids():
     """Agrega centroides a nivel de municipio."""
-    con = None
-    try:
-        con = connect_ducklake()
-        con.execute("INSTALL spatial;")
-        con.execute("LOAD spatial;")
+    with ducklake_session(stage="create_municipality_centroids") as con:
         
         con.execute("""
             CREATE OR REPLACE TABLE temp_municipality_centroids AS
@@ -20,7 +16,3 @@ def create_municipality_centroids():
         
         count = con.execute("SELECT COUNT(*) FROM temp_municipality_centroids").fetchone()[0]
         print(f"✓ Centroides agregados: {count} municipios")
-        
-    finally:
-        if con:
-            close_ducklake(con)
@@ -1,13 +1,9 @@
-from ducklake_utils import connect_ducklake, close_ducklake
+from ducklake_pool import ducklake_session
 
 
 def create_municipality_distances():
     """Calcula distancias entre municipios."""
-    con = None
-    try:
-        con = connect_ducklake()
-        con.execute("INSTALL spatial;")
-        con.execute("LOAD spatial;")
+    with ducklake_session(stage="create_municipality_distances") as con:
         
         con.execute("""
             CREATE OR REPLACE TABLE temp_municipality_distances AS
@@ -23,7 +19,3 @@ def create_municipality_distances():
         
         count = con.execute("SELECT COUNT(*) FROM temp_municipality_distances").fetchone()[0]
         print(f"✓ Pares de distancias calculados: {count:,}")
-        
-    finally:
-        if con:
-            close_ducklake(con)
@@ -1,11 +1,9 @@
-from ducklake_utils import connect_ducklake, close_ducklake
+from ducklake_pool import ducklake_session
 
 
 def create_gravity_data(year: int = 2023):
     """Combina todos los datos para el modelo de gravedad."""
-    con = None
-    try:
-        con = connect_ducklake()
+    with ducklake_session() as con:
         
         con.execute(f"""
             CREATE OR REPLACE TABLE temp_gravity_data AS
@@ -32,7 +30,3 @@ def create_gravity_data(year: int = 2023):
         
         count = con.execute("SELECT COUNT(*) FROM temp_gravity_data").fetchone()[0]
         print(f"✓ Pares con datos completos: {count:,}")
-        
-    finally:
-        if con:
-            close_ducklake(con)
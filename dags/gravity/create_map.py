@@ -1,4 +1,5 @@
-from ducklake_utils import connect_ducklake, close_ducklake
+from ducklake_pool import ducklake_session
+from ducklake_utils import pin_table_files
 import os
 
 
@@ -9,12 +10,9 @@ def create_infrastructure_map():
     output_dir = "/usr/local/airflow/include/outputs"
     os.makedirs(output_dir, exist_ok=True)
     
-    con = None
-    try:
-        con = connect_ducklake()
-        con.execute("INSTALL spatial;")
-        con.execute("LOAD spatial;")
-        
+    with ducklake_session(stage="create_infrastructure_map", read_only=True) as con:
+        pin_table_files(con, "gold_municipality_infrastructure_ranking")
+
         df = con.execute("""
             SELECT 
                 r.origin_municipality AS municipality_id,
@@ -52,7 +50,3 @@ def create_infrastructure_map():
         map_kepler.save_to_html(file_name=output_path)
         
         print(f"✓ Mapa guardado en: {output_path}")
-        
-    finally:
-        if con:
-            close_ducklake(con)
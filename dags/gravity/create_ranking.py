@@ -1,11 +1,9 @@
-from ducklake_utils import connect_ducklake, close_ducklake
+from ducklake_pool import ducklake_session
 
 
 def create_infrastructure_ranking():
     """Crea el ranking de infraestructura por municipio."""
-    con = None
-    try:
-        con = connect_ducklake()
+    with ducklake_session() as con:
         
         con.execute("""
             CREATE OR REPLACE TABLE gold_municipality_infrastructure_ranking AS
@@ -38,7 +36,3 @@ def create_infrastructure_ranking():
         
         print("✓ Ranking creado:")
         print(summary.to_string(index=False))
-        
-    finally:
-        if con:
-            close_ducklake(con)
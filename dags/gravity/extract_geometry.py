@@ -1,15 +1,11 @@
-from ducklake_utils import connect_ducklake, close_ducklake
+from ducklake_pool import ducklake_session
 
 DEFAULT_WKT = """POLYGON((-0.5663 39.5765, -0.2295 39.5765, -0.2295 39.3073, -0.5663 39.3073, -0.5663 39.5765))"""
 
 
 def extract_geometry(wkt_polygon: str = DEFAULT_WKT, spatial_predicate: str = 'intersects'):
     """Extrae geometrías del polígono WKT a gold_geometry_wgs84."""
-    con = None
-    try:
-        con = connect_ducklake()
-        con.execute("INSTALL spatial;")
-        con.execute("LOAD spatial;")
+    with ducklake_session(stage="extract_geometry") as con:
         
         # Verificar silver
         silver_count = con.execute("SELECT COUNT(*) FROM silver_geometry_wgs84").fetchone()[0]
@@ -54,7 +50,3 @@ def extract_geometry(wkt_polygon: str = DEFAULT_WKT, spatial_predicate: str = 'i
             ORDER BY sections DESC
         """).fetchdf()
         print(f"\n✓ Municipios extraídos: {len(df)}")
-        
-    finally:
-        if con:
-            close_ducklake(con)
@@ -1,17 +1,15 @@
-from ducklake_utils import connect_ducklake, close_ducklake, table_exists
+from ducklake_utils import table_exists
+from ducklake_pool import ducklake_session
 
 
 def verify_dependencies():
     """Verifica que existen las tablas necesarias para el modelo."""
-    con = None
-    try:
-        con = connect_ducklake()
-        con.execute("INSTALL spatial;")
-        con.execute("LOAD spatial;")
+    with ducklake_session(stage="verify_dependencies") as con:
         
         required_tables = [
             "gold_geometry_wgs84",
-            "gold_typical_day_patterns", 
+            "gold_typical_day_patterns",
+            "dim_zone",
             "silver_population",
             "silver_economy_aggregated"
         ]
@@ -28,7 +26,3 @@ def verify_dependencies():
             raise ValueError(f"Tablas faltantes: {', '.join(missing)}")
         
         print("\n✓ Todas las dependencias verificadas")
-        
-    finally:
-        if con:
-            close_ducklake(con)
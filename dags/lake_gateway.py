@@ -0,0 +1,255 @@
+"""
+Gateway del lago: un proceso de larga duración que mantiene una sesión DuckLake
+adjuntada (caché de buffers y de metadatos calientes) y sirve consultas a las
+tareas por un socket Unix.
+
+Arranque (sidecar del worker):
+
+    python dags/lake_gateway.py --socket /tmp/ducklake_gateway.sock
+
+Las tareas lo usan de forma transparente a través de ducklake_session(): si
+DUCKLAKE_GATEWAY_SOCKET apunta a un gateway vivo y la etapa está en
+GATEWAY_STAGES, la sesión es un GatewayConnection en lugar de una conexión
+DuckDB propia. El cliente imita lo que usan gravity/* y bussiness_layer/*:
+
+    con.execute(sql, params).fetchone() / fetchall() / fetchdf() / fetch_df() / df()
+
+Protocolo: tramas con prefijo de longitud (4 bytes big-endian). Petición: JSON
+{"sql", "params"}. Respuesta: cabecera JSON {"ok", "error"} seguida del
+resultado en formato Arrow IPC (stream).
+
+Variables de entorno:
+    DUCKLAKE_GATEWAY_SOCKET   ruta del socket; sin ella no se usa el gateway
+"""
+import argparse
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+
+from ducklake_utils import connect_ducklake, ensure_extensions, required_extensions
+
+# Etapas de solo lectura que se benefician de la caché caliente del gateway.
+GATEWAY_STAGES = {"mobility_report", "create_infrastructure_map"}
+
+_HEADER = struct.Struct(">I")
+
+
+class LakeGatewayError(Exception):
+    """Error devuelto por el gateway al ejecutar una consulta."""
+
+
+def gateway_socket_path():
+    return os.environ.get("DUCKLAKE_GATEWAY_SOCKET")
+
+
+def _recv_exact(sock, n: int) -> bytes:
+    chunks = []
+    while n:
+        chunk = sock.recv(min(n, 1 << 20))
+        if not chunk:
+            raise ConnectionError("gateway socket closed")
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b"".join(chunks)
+
+
+def _send_frame(sock, payload: bytes):
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_frame(sock) -> bytes:
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return _recv_exact(sock, size)
+
+
+def _table_to_ipc(table) -> bytes:
+    import pyarrow as pa
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _ipc_to_table(payload: bytes):
+    import pyarrow as pa
+
+    return pa.ipc.open_stream(payload).read_all()
+
+
+# ---------------------------------------------------------------------------
+# Servidor
+# ---------------------------------------------------------------------------
+class _GatewayHandler(socketserver.BaseRequestHandler):
+    """Un cursor por cliente: comparte la base de datos (y sus cachés) del gateway."""
+
+    def handle(self):
+        cursor = self.server.lake.cursor()
+        try:
+            cursor.execute(f"USE {self.server.database}")
+            while True:
+                try:
+                    request = json.loads(_recv_frame(self.request))
+                except ConnectionError:
+                    return
+                self._serve(cursor, request)
+        finally:
+            cursor.close()
+
+    def _serve(self, cursor, request: dict):
+        try:
+            table = cursor.execute(request["sql"], request.get("params")).to_arrow_table()
+            body = _table_to_ipc(table)
+        except Exception as e:
+            _send_frame(self.request, json.dumps({"ok": False, "error": str(e)}).encode())
+            return
+        with self.server.stats_lock:
+            self.server.stats["queries"] += 1
+        _send_frame(self.request, json.dumps({"ok": True}).encode())
+        _send_frame(self.request, body)
+
+
+class LakeGateway(socketserver.ThreadingUnixStreamServer):
+    """Servidor del gateway sobre una única conexión DuckLake adjuntada en solo lectura."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, connect=connect_ducklake, stages=GATEWAY_STAGES):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        # Solo sirve consultas de lectura (GATEWAY_STAGES)
+        self.lake = connect(read_only=True)
+        extensions = {ext for stage in stages for ext in required_extensions(stage=stage)}
+        ensure_extensions(self.lake, *sorted(extensions))
+        self.database = self.lake.execute("SELECT current_database()").fetchone()[0]
+        self.stats = {"queries": 0}
+        self.stats_lock = threading.Lock()
+        super().__init__(socket_path, _GatewayHandler)
+        os.chmod(socket_path, 0o660)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.remove(self.server_address)
+        except OSError:
+            pass
+        self.lake.close()
+
+
+# ---------------------------------------------------------------------------
+# Cliente
+# ---------------------------------------------------------------------------
+class GatewayResult:
+    """Resultado materializado de una consulta, con la API de fetch de DuckDB."""
+
+    def __init__(self, table):
+        self._table = table
+        self._rows = None
+        self._pos = 0
+
+    def _all_rows(self) -> list:
+        if self._rows is None:
+            columns = [col.to_pylist() for col in self._table.columns]
+            self._rows = list(zip(*columns)) if columns else []
+        return self._rows
+
+    def fetchone(self):
+        rows = self._all_rows()
+        if self._pos >= len(rows):
+            return None
+        self._pos += 1
+        return rows[self._pos - 1]
+
+    def fetchmany(self, size: int = 1) -> list:
+        rows = self._all_rows()[self._pos:self._pos + size]
+        self._pos += len(rows)
+        return rows
+
+    def fetchall(self) -> list:
+        rows = self._all_rows()[self._pos:]
+        self._pos += len(rows)
+        return rows
+
+    def fetchdf(self):
+        return self._table.to_pandas()
+
+    fetch_df = fetchdf
+    df = fetchdf
+
+    def to_arrow_table(self):
+        return self._table
+
+    fetch_arrow_table = to_arrow_table
+    arrow = to_arrow_table
+
+    @property
+    def description(self):
+        return [(name, str(field.type), None, None, None, None, None)
+                for name, field in zip(self._table.column_names, self._table.schema)]
+
+
+class GatewayConnection:
+    """Cliente del gateway con la parte de la API de DuckDB que usan las tareas."""
+
+    def __init__(self, socket_path: str, timeout: float = None):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        self._sock.connect(socket_path)
+        self._lock = threading.Lock()
+
+    def execute(self, query, parameters=None) -> GatewayResult:
+        request = json.dumps({"sql": query, "params": parameters}, default=str).encode()
+        with self._lock:
+            _send_frame(self._sock, request)
+            header = json.loads(_recv_frame(self._sock))
+            if not header["ok"]:
+                raise LakeGatewayError(header["error"])
+            return GatewayResult(_ipc_to_table(_recv_frame(self._sock)))
+
+    def executemany(self, query, parameters=None):
+        for params in parameters or []:
+            self.execute(query, params)
+
+    def sql(self, query):
+        return self.execute(query)
+
+    def close(self):
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+
+
+def connect_gateway(stage=None):
+    """GatewayConnection si hay un gateway disponible para la etapa, si no None."""
+    path = gateway_socket_path()
+    if not path or stage not in GATEWAY_STAGES or not os.path.exists(path):
+        return None
+    try:
+        return GatewayConnection(path)
+    except OSError as e:
+        print(f"⚠️ Gateway no disponible en {path} ({e}); se usa una sesión local")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gateway DuckLake por socket Unix")
+    parser.add_argument("--socket", default=gateway_socket_path() or "/tmp/ducklake_gateway.sock")
+    args = parser.parse_args()
+
+    server = LakeGateway(args.socket)
+    print(f"🛰️ Gateway DuckLake escuchando en {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"🛰️ Gateway detenido tras {server.stats['queries']} consultas")
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
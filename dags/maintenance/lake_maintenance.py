@@ -0,0 +1,196 @@
+"""
+Mantenimiento del lago DuckLake.
+
+Las inserciones por fecha, los DELETE por partición de silver y los CREATE OR
+REPLACE de gold y de las tablas temp_* de gravedad dejan muchos ficheros
+Parquet pequeños y snapshots antiguos: los escaneos abren más ficheros y el
+catálogo en Neon crece con cada snapshot. Este módulo agrupa las funciones
+de mantenimiento de DuckLake:
+
+- merge_small_files:   ducklake_merge_adjacent_files por tabla (ficheros de una
+                       misma partición hasta target_file_size)
+- rewrite_deleted:     ducklake_rewrite_data_files, reescribe los ficheros con
+                       muchas filas borradas (ficheros de borrado de DELETEs antiguos)
+- expire_snapshots:    ducklake_expire_snapshots con una retención en días
+- cleanup_files:       ducklake_cleanup_old_files + ducklake_delete_orphaned_files
+
+lake_stats() mide antes y después ficheros y bytes vivos por tabla
+(ducklake_table_info), snapshots y bytes de todos los ficheros que el catálogo
+conserva (incluidos los de snapshots antiguos), y maintenance_report() imprime
+lo recuperado.
+"""
+from contextlib import contextmanager
+
+from ducklake_utils import DUCKLAKE_ATTACH_NAME
+
+DEFAULT_SNAPSHOT_RETENTION_DAYS = 7
+# Margen para no borrar ficheros que una consulta o escritura en curso aún usa
+DEFAULT_FILE_GRACE_HOURS = 24
+DEFAULT_DELETE_THRESHOLD = 0.25
+# Valor por defecto de DuckLake, para restaurarlo si el catálogo no tenía ninguno
+_DUCKLAKE_TARGET_FILE_SIZE = "512MB"
+
+_METADATA = f"__ducklake_metadata_{DUCKLAKE_ATTACH_NAME}"
+
+
+def lake_stats(con) -> dict:
+    """
+    Estado del lago: {"tables": {tabla: {files, bytes, delete_files, delete_bytes}},
+    "snapshots", "tracked_files", "tracked_bytes"}. tracked_* cuentan todos los
+    ficheros del catálogo, también los que solo ven snapshots antiguos.
+    """
+    tables = {
+        name: {"files": files, "bytes": size, "delete_files": delete_files, "delete_bytes": delete_size}
+        for name, files, size, delete_files, delete_size in con.execute(f"""
+            SELECT table_name, file_count, file_size_bytes, delete_file_count, delete_file_size_bytes
+            FROM ducklake_table_info('{DUCKLAKE_ATTACH_NAME}')
+        """).fetchall()
+    }
+    snapshots = con.execute(f"SELECT COUNT(*) FROM ducklake_snapshots('{DUCKLAKE_ATTACH_NAME}')").fetchone()[0]
+    tracked_files, tracked_bytes = con.execute(f"""
+        SELECT COUNT(*), COALESCE(SUM(file_size_bytes), 0) FROM (
+            SELECT file_size_bytes FROM {_METADATA}.ducklake_data_file
+            UNION ALL
+            SELECT file_size_bytes FROM {_METADATA}.ducklake_delete_file
+        )
+    """).fetchone()
+    return {"tables": tables, "snapshots": snapshots,
+            "tracked_files": tracked_files, "tracked_bytes": int(tracked_bytes)}
+
+
+@contextmanager
+def _target_file_size(con, target_file_size: str = None):
+    """
+    target_file_size solo durante el bloque. set_option lo guarda en el
+    catálogo y afectaría a todas las escrituras posteriores, así que al salir
+    se restaura el valor anterior.
+    """
+    if not target_file_size:
+        yield
+        return
+    previous = con.execute(f"""
+        SELECT value FROM ducklake_options('{DUCKLAKE_ATTACH_NAME}')
+        WHERE option_name = 'target_file_size' AND lower(scope) = 'global'
+    """).fetchone()
+    con.execute(f"CALL {DUCKLAKE_ATTACH_NAME}.set_option('target_file_size', ?)", [target_file_size])
+    try:
+        yield
+    finally:
+        restored = previous[0] if previous else _DUCKLAKE_TARGET_FILE_SIZE
+        con.execute(f"CALL {DUCKLAKE_ATTACH_NAME}.set_option('target_file_size', ?)", [restored])
+
+
+def merge_small_files(con, tables: list = None, target_file_size: str = None) -> list:
+    """
+    Fusiona los ficheros pequeños adyacentes de cada tabla (dentro de cada
+    partición) hasta target_file_size. Sin tablas, fusiona todo el lago en una
+    llamada. Las tablas con orden declarado (SET SORTED BY) se reescriben
+    ordenadas. target_file_size solo se aplica a esta compactación.
+    Devuelve las tablas que fallaron.
+    """
+    with _target_file_size(con, target_file_size):
+        if not tables:
+            con.execute(f"CALL ducklake_merge_adjacent_files('{DUCKLAKE_ATTACH_NAME}')")
+            print("🧱 Ficheros adyacentes fusionados en todo el lago")
+            return []
+        failed = []
+        for table in tables:
+            try:
+                con.execute(f"CALL ducklake_merge_adjacent_files('{DUCKLAKE_ATTACH_NAME}', '{table}')")
+                print(f"🧱 {table}: ficheros adyacentes fusionados")
+            except Exception as e:
+                print(f"⚠️ {table}: no se pudo compactar ({e})")
+                failed.append(table)
+        return failed
+
+
+def rewrite_deleted(con, tables: list, delete_threshold: float = DEFAULT_DELETE_THRESHOLD) -> list:
+    """
+    Reescribe los ficheros de las tablas con más de delete_threshold de filas
+    borradas, eliminando sus ficheros de borrado. Devuelve las tablas que fallaron.
+    """
+    failed = []
+    for table in tables:
+        try:
+            con.execute(f"""
+                CALL ducklake_rewrite_data_files('{DUCKLAKE_ATTACH_NAME}', '{table}',
+                                                 delete_threshold => {float(delete_threshold)})
+            """)
+            print(f"✂️ {table}: ficheros con filas borradas reescritos")
+        except Exception as e:
+            print(f"⚠️ {table}: no se pudieron reescribir los ficheros con borrados ({e})")
+            failed.append(table)
+    return failed
+
+
+def expire_snapshots(con, retention_days: int = DEFAULT_SNAPSHOT_RETENTION_DAYS, dry_run: bool = False) -> int:
+    """
+    Expira los snapshots de más de retention_days días (el último se conserva
+    siempre). Sus ficheros quedan programados para borrarse en cleanup_files.
+    Devuelve los snapshots expirados.
+    """
+    expired = con.execute(f"""
+        CALL ducklake_expire_snapshots('{DUCKLAKE_ATTACH_NAME}',
+                                       older_than => now() - INTERVAL '{int(retention_days)} days',
+                                       dry_run => {str(dry_run).lower()})
+    """).fetchall()
+    print(f"🗑️ {'Se expirarían' if dry_run else 'Expirados'} {len(expired)} snapshots de más de {retention_days} días")
+    return len(expired)
+
+
+def cleanup_files(con, grace_hours: int = DEFAULT_FILE_GRACE_HOURS, dry_run: bool = False) -> dict:
+    """
+    Borra del almacenamiento los ficheros de snapshots expirados y los huérfanos
+    (ficheros en DATA_PATH que el catálogo no conoce, p. ej. de escrituras
+    fallidas) con más de grace_hours horas. Devuelve cuántos de cada tipo.
+    """
+    older_than = f"older_than => now() - INTERVAL '{int(grace_hours)} hours', dry_run => {str(dry_run).lower()}"
+    old_files = con.execute(
+        f"CALL ducklake_cleanup_old_files('{DUCKLAKE_ATTACH_NAME}', {older_than})"
+    ).fetchall()
+    try:
+        orphaned = con.execute(
+            f"CALL ducklake_delete_orphaned_files('{DUCKLAKE_ATTACH_NAME}', {older_than})"
+        ).fetchall()
+    except Exception as e:
+        print(f"⚠️ No se pudieron borrar ficheros huérfanos ({e})")
+        orphaned = []
+    verb = "Se borrarían" if dry_run else "Borrados"
+    print(f"🧹 {verb} {len(old_files)} ficheros expirados y {len(orphaned)} huérfanos")
+    return {"old_files": len(old_files), "orphaned_files": len(orphaned)}
+
+
+def _mb(size: int) -> str:
+    return f"{size / 1024 ** 2:,.1f} MB"
+
+
+def maintenance_report(before: dict, after: dict, cleanup: dict = None) -> dict:
+    """Imprime y devuelve ficheros/bytes por tabla y lo recuperado entre dos lake_stats()."""
+    rows = []
+    print("📊 Mantenimiento del lago (antes -> después):")
+    for table in sorted(set(before["tables"]) | set(after["tables"])):
+        old = before["tables"].get(table, {})
+        new = after["tables"].get(table, {})
+        files_before = (old.get("files") or 0) + (old.get("delete_files") or 0)
+        files_after = (new.get("files") or 0) + (new.get("delete_files") or 0)
+        bytes_before = (old.get("bytes") or 0) + (old.get("delete_bytes") or 0)
+        bytes_after = (new.get("bytes") or 0) + (new.get("delete_bytes") or 0)
+        rows.append({"table": table, "files_before": files_before, "files_after": files_after,
+                     "bytes_before": bytes_before, "bytes_after": bytes_after})
+        if files_before != files_after:
+            print(f"   {table:<45} ficheros {files_before:>6} -> {files_after:<6} "
+                  f"{_mb(bytes_before)} -> {_mb(bytes_after)}")
+
+    summary = {
+        "tables": rows,
+        "snapshots_before": before["snapshots"],
+        "snapshots_after": after["snapshots"],
+        "tracked_files_before": before["tracked_files"],
+        "tracked_files_after": after["tracked_files"],
+        "bytes_reclaimed": before["tracked_bytes"] - after["tracked_bytes"],
+        **(cleanup or {}),
+    }
+    print(f"   snapshots {summary['snapshots_before']} -> {summary['snapshots_after']}, "
+          f"ficheros en el catálogo {summary['tracked_files_before']} -> {summary['tracked_files_after']}, "
+          f"recuperado {_mb(summary['bytes_reclaimed'])}")
+    return summary
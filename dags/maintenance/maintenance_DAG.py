@@ -0,0 +1,106 @@
+"""
+DAG de mantenimiento del lago: compactación de ficheros pequeños, reescritura
+de ficheros con borrados, expiración de snapshots y limpieza de ficheros
+expirados y huérfanos (ver maintenance/lake_maintenance.py). Termina con un
+informe de ficheros y bytes por tabla antes/después y lo recuperado.
+"""
+from datetime import datetime, timedelta
+
+from airflow.sdk import dag, task, Param
+
+from maintenance.lake_maintenance import (
+    DEFAULT_DELETE_THRESHOLD, DEFAULT_FILE_GRACE_HOURS, DEFAULT_SNAPSHOT_RETENTION_DAYS,
+    cleanup_files, expire_snapshots, lake_stats, maintenance_report, merge_small_files, rewrite_deleted,
+)
+from ducklake_pool import ducklake_session
+
+default_args = {
+    'owner': 'airflow',
+    'retries': 1,
+    'retry_delay': timedelta(minutes=10),
+}
+
+
+@dag(
+    dag_id='ducklake_maintenance',
+    default_args=default_args,
+    description='DuckLake maintenance: compaction, snapshot expiration and file cleanup',
+    schedule='0 3 * * 0',            # Sundays 03:00, outside the MITMA ingestion window
+    start_date=datetime(2024, 1, 1),
+    catchup=False,
+    max_active_runs=1,
+    tags=['ducklake', 'maintenance'],
+    params={
+        "snapshot_retention_days": Param(
+            default=DEFAULT_SNAPSHOT_RETENTION_DAYS, type="integer", minimum=1,
+            description="Snapshots older than this many days are expired (time travel window)",
+        ),
+        "file_grace_hours": Param(
+            default=DEFAULT_FILE_GRACE_HOURS, type="integer", minimum=1,
+            description="Expired/orphaned files are deleted only once older than this",
+        ),
+        "target_file_size": Param(
+            default="512MB", type="string",
+            description="Target Parquet file size for compaction",
+        ),
+        "delete_threshold": Param(
+            default=DEFAULT_DELETE_THRESHOLD, type="number", minimum=0, maximum=1,
+            description="Rewrite data files with at least this fraction of deleted rows",
+        ),
+        "dry_run": Param(
+            default=False, type="boolean",
+            description="Only report what would be expired and deleted (no compaction)",
+        ),
+    },
+)
+def ducklake_maintenance():
+
+    @task
+    def task_stats_before():
+        with ducklake_session(stage="lake_maintenance", read_only=True) as con:
+            return lake_stats(con)
+
+    @task
+    def task_compact(before, **context):
+        params = context['params']
+        if params['dry_run']:
+            print("Dry run: compaction skipped")
+            return
+        # Only tables with something to merge or rewrite
+        to_merge = [table for table, info in before["tables"].items() if (info["files"] or 0) > 1]
+        with_deletes = [table for table, info in before["tables"].items() if info["delete_files"]]
+        with ducklake_session(stage="lake_maintenance") as con:
+            failed = merge_small_files(con, to_merge, target_file_size=params['target_file_size'])
+            failed += rewrite_deleted(con, with_deletes, params['delete_threshold'])
+        if failed:
+            print(f"⚠️ Tables not compacted: {', '.join(sorted(set(failed)))}")
+
+    @task
+    def task_expire_snapshots(**context):
+        params = context['params']
+        with ducklake_session(stage="lake_maintenance") as con:
+            return expire_snapshots(con, params['snapshot_retention_days'], dry_run=params['dry_run'])
+
+    @task
+    def task_cleanup_files(**context):
+        params = context['params']
+        with ducklake_session(stage="lake_maintenance") as con:
+            return cleanup_files(con, params['file_grace_hours'], dry_run=params['dry_run'])
+
+    @task(trigger_rule="all_done")
+    def task_report(before, cleanup, expired):
+        with ducklake_session(stage="lake_maintenance", read_only=True) as con:
+            after = lake_stats(con)
+        return maintenance_report(before, after, {**(cleanup or {}), "snapshots_expired": expired})
+
+    before = task_stats_before()
+    compacted = task_compact(before)
+    expired = task_expire_snapshots()
+    # One lake writer at a time: compaction, then expiration, then file deletion
+    compacted >> expired
+    cleanup = task_cleanup_files()
+    expired >> cleanup
+    task_report(before, cleanup, expired)
+
+
+dag_instance = ducklake_maintenance()
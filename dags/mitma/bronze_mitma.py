@@ -1,13 +1,52 @@
-from ducklake_utils import  extract_date_from_url,BRONZE_MITMA_TABLE
+import datetime
+import os
 
-def create_bronze_mitma_table(con):
-    """
-    Creates the table in Neon/S3 if it does not exist.
-    """
-    con.execute(f"""
-        CREATE TABLE IF NOT EXISTS {BRONZE_MITMA_TABLE} (
-            date VARCHAR,
-            hour_period VARCHAR,
+from catalog_cache import catalog_cache
+from ducklake_utils import  extract_date_from_url,table_exists,ducklake_transaction,ensure_date_partitioning,BRONZE_MITMA_TABLE,BRONZE_QUARANTINE_TABLE
+from mitma.fetch_url_mitma import probe_mitma_url
+from mitma.landing_mitma import landed_metadata, landing_path
+from mitma.silver_mitma import load_silver_from_staging
+from mitma.manifest_mitma import (
+    MANIFEST_TABLE, create_manifest_table, is_republished, manifest_entries, record_bronze, tag_commit,
+)
+from resource_profile import task_memory_bytes
+
+# Typical compressed size of a daily *_Viajes_distritos.csv.gz and how much it
+# grows once decompressed; used to size bronze batches before files are landed.
+DEFAULT_FILE_BYTES = 64 * 1024 ** 2
+GZIP_EXPANSION = 8
+MAX_BRONZE_BATCH = 31
+
+# Types of the MITMA CSV columns as read into bronze. Codes stay VARCHAR (the
+# Parquet writer dictionary-encodes them); rows that fail a cast go to the
+# quarantine table instead of bronze.
+CSV_TYPES = {
+    "fecha": "DATE",
+    "periodo": "SMALLINT",
+    "origen": "VARCHAR",
+    "destino": "VARCHAR",
+    "distancia": "VARCHAR",
+    "actividad_origen": "VARCHAR",
+    "actividad_destino": "VARCHAR",
+    "estudio_origen_posible": "VARCHAR",
+    "estudio_destino_posible": "VARCHAR",
+    "residencia": "VARCHAR",
+    "renta": "VARCHAR",
+    "edad": "VARCHAR",
+    "sexo": "VARCHAR",
+    "viajes": "DOUBLE",
+    "viajes_km": "DOUBLE",
+}
+_STAGING_TABLE = "_mitma_source_staging"
+_REJECT_SCANS = "_bronze_reject_scans"
+_REJECT_ERRORS = "_bronze_reject_errors"
+
+
+def _bronze_ddl(table_name: str) -> str:
+    return f"""
+        CREATE TABLE IF NOT EXISTS {table_name} (
+            date DATE,
+            hour_period SMALLINT,
             origin_zone VARCHAR,
             destination_zone VARCHAR,
             distance_range VARCHAR,
@@ -19,58 +58,333 @@ def create_bronze_mitma_table(con):
             income_range VARCHAR,
             age_group VARCHAR,
             gender VARCHAR,
-            trips VARCHAR,
-            trips_km_product VARCHAR,
+            trips DOUBLE,
+            trips_km_product DOUBLE,
             ingestion_date TIMESTAMP
         );
+    """
+
+
+def create_bronze_mitma_table(con):
+    """
+    Creates the table in Neon/S3 if it does not exist, together with its
+    quarantine table. A bronze table from before the typed schema is migrated.
+    """
+    con.execute(_bronze_ddl(BRONZE_MITMA_TABLE))
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {BRONZE_QUARANTINE_TABLE} (
+            source_date DATE,
+            source_file VARCHAR,
+            line BIGINT,
+            csv_line VARCHAR,
+            errors VARCHAR,
+            quarantined_at TIMESTAMP
+        );
     """)
+    if catalog_cache(con).columns(BRONZE_MITMA_TABLE).get("date") == "VARCHAR":
+        migrate_bronze_to_typed(con)
+    ensure_date_partitioning(con, BRONZE_MITMA_TABLE)
     print("✅ Table bronze_mobility_trips checked/created.")
 
-def ingestion_bronze_mitma(con, url:str):
-    try:    
-        date_obj = extract_date_from_url(url)            
-        if not date_obj:
-            print(f"⚠️ Could not extract date from {url}. Skipping.")
-            return
-
-        target_date = date_obj.strftime('%Y-%m-%d')
-                        
-        check_query = f"SELECT count(*) FROM bronze_mobility_trips WHERE date = '{target_date}'"
-
-        try:
-            count = con.execute(check_query).fetchone()[0]
-            if count > 0:
-                print(f"⏭️ Skipping {target_date}: Data already found in table.")
-                return
-        except:
-            # Table might not exist yet, so we proceed to insert
-            pass
 
+def migrate_bronze_to_typed(con):
+    """
+    One-off rewrite of the old all-VARCHAR bronze into the typed schema. Rows
+    whose date, hour or trips do not cast are moved to the quarantine table.
+    """
+    typed_table = f"{BRONZE_MITMA_TABLE}_typed"
+    cast_ok = """
+        TRY_STRPTIME(date, '%Y%m%d') IS NOT NULL
+        AND (hour_period IS NULL OR TRY_CAST(hour_period AS SMALLINT) IS NOT NULL)
+        AND (trips IS NULL OR TRY_CAST(trips AS DOUBLE) IS NOT NULL)
+        AND (trips_km_product IS NULL OR TRY_CAST(trips_km_product AS DOUBLE) IS NOT NULL)
+    """
+    print("🔁 Migrating bronze_mobility_trips to the typed schema...")
+    with ducklake_transaction(con, label="bronze typed migration"):
+        con.execute(_bronze_ddl(typed_table))
         con.execute(f"""
-            INSERT INTO bronze_mobility_trips
-            SELECT 
-                fecha AS date,
-                periodo AS hour_period,
-                origen AS origin_zone,
-                destino AS destination_zone,
-                distancia AS distance_range,
-                actividad_origen AS origin_activity,
-                actividad_destino AS destination_activity,
-                estudio_origen_posible AS is_origin_study_possible,
-                estudio_destino_posible AS is_destination_study_possible,
-                residencia AS residence_province_code,
-                renta AS income_range,
-                edad AS age_group,
-                sexo AS gender,
-                viajes AS trips,
-                viajes_km AS trips_km_product,
-                CURRENT_TIMESTAMP AS ingestion_date
-            FROM read_csv_auto('{url}', compression='gzip', ignore_errors=true, all_varchar=true)
+            INSERT INTO {typed_table}
+            SELECT
+                STRPTIME(date, '%Y%m%d')::DATE,
+                CAST(hour_period AS SMALLINT),
+                origin_zone, destination_zone, distance_range, origin_activity, destination_activity,
+                is_origin_study_possible, is_destination_study_possible, residence_province_code,
+                income_range, age_group, gender,
+                CAST(trips AS DOUBLE),
+                CAST(trips_km_product AS DOUBLE),
+                ingestion_date
+            FROM {BRONZE_MITMA_TABLE}
+            WHERE {cast_ok}
         """)
-        
-        print(f"Successfully inserted data for {target_date}")            
+        con.execute(f"""
+            INSERT INTO {BRONZE_QUARANTINE_TABLE}
+            SELECT
+                TRY_STRPTIME(date, '%Y%m%d')::DATE,
+                '{BRONZE_MITMA_TABLE}',
+                NULL,
+                concat_ws('|', date, hour_period, origin_zone, destination_zone, distance_range,
+                          origin_activity, destination_activity, is_origin_study_possible,
+                          is_destination_study_possible, residence_province_code, income_range,
+                          age_group, gender, trips, trips_km_product),
+                'typed migration: cast failed',
+                CURRENT_TIMESTAMP
+            FROM {BRONZE_MITMA_TABLE}
+            WHERE NOT ({cast_ok})
+        """)
+        con.execute(f"DROP TABLE {BRONZE_MITMA_TABLE}")
+        con.execute(f"ALTER TABLE {typed_table} RENAME TO {BRONZE_MITMA_TABLE}")
+    print("✅ Bronze migrated to the typed schema.")
+
+
+def _as_date(raw_date: str) -> datetime.date:
+    return datetime.datetime.strptime(raw_date, '%Y%m%d').date()
+
+
+def typed_csv_reader(files: list) -> str:
+    """read_csv over MITMA daily files with the bronze types; failed rows land in the rejects temp tables."""
+    file_list = ", ".join(f"'{path}'" for path in files)
+    types = ", ".join(f"'{column}': '{dtype}'" for column, dtype in CSV_TYPES.items())
+    return f"""read_csv([{file_list}], compression='gzip', header=true, dateformat='%Y%m%d',
+                        types={{{types}}},
+                        store_rejects=true, rejects_scan='{_REJECT_SCANS}', rejects_table='{_REJECT_ERRORS}')"""
+
+
+def rejects_select_sql() -> str:
+    """Rows rejected by the last typed_csv_reader scan, shaped like the quarantine table."""
+    return f"""
+        SELECT
+            TRY_STRPTIME(regexp_extract(s.file_path, '(\\d{{8}})_Viajes', 1), '%Y%m%d')::DATE AS source_date,
+            s.file_path AS source_file,
+            e.line,
+            any_value(e.csv_line) AS csv_line,
+            string_agg(coalesce(e.column_name, '') || ' ' || e.error_type, '; ') AS errors,
+            CURRENT_TIMESTAMP AS quarantined_at
+        FROM temp.main.{_REJECT_ERRORS} e
+        JOIN temp.main.{_REJECT_SCANS} s USING (scan_id, file_id)
+        GROUP BY s.file_path, e.line
+    """
+
+
+def rejects_path(parquet_path: str) -> str:
+    """Sidecar with the rows a raw Parquet copy rejected (always written, possibly empty)."""
+    return parquet_path[:-len(".parquet")] + ".rejects.parquet"
+
+
+def _source_rows_reader(paths: list) -> str:
+    """
+    Typed source rows (MITMA column names) of the given files: raw Parquet
+    copies (see raw_parquet_mitma) are read directly, the rest as gzip CSV.
+    """
+    parquet = [p for p in paths if p.endswith(".parquet")]
+    csv = [p for p in paths if not p.endswith(".parquet")]
+    scans = []
+    if csv:
+        scans.append(f"SELECT * FROM {typed_csv_reader(csv)}")
+    if parquet:
+        scans.append(f"SELECT * FROM read_parquet([{', '.join(repr(p) for p in parquet)}])")
+    return "(" + " UNION ALL BY NAME ".join(scans) + ")"
+
+
+def _quarantine_rejects(con, csv_scanned: bool = True, reject_files: list = None) -> int:
+    """
+    Moves the rows rejected by the last typed CSV scan, and those recorded in
+    raw Parquet reject sidecars, into the quarantine table.
+    """
+    quarantined = 0
+    if csv_scanned:
+        con.execute(f"INSERT INTO {BRONZE_QUARANTINE_TABLE} {rejects_select_sql()}")
+        quarantined += con.execute(
+            f"SELECT COUNT(DISTINCT (scan_id, file_id, line)) FROM temp.main.{_REJECT_ERRORS}"
+        ).fetchone()[0]
+    if reject_files:
+        file_list = ", ".join(f"'{path}'" for path in reject_files)
+        con.execute(f"INSERT INTO {BRONZE_QUARANTINE_TABLE} SELECT * FROM read_parquet([{file_list}])")
+        quarantined += con.execute(f"SELECT COUNT(*) FROM read_parquet([{file_list}])").fetchone()[0]
+    if quarantined:
+        print(f"🚧 {quarantined} rows failed type casts and were quarantined in {BRONZE_QUARANTINE_TABLE}")
+    return quarantined
+
+def _bronze_file_bytes(url: str) -> int:
+    """Compressed size of a daily file: the landed copy if any, else a typical size."""
+    path = landing_path(url)
+    return os.path.getsize(path) if os.path.exists(path) else DEFAULT_FILE_BYTES
+
+
+def plan_bronze_batches(urls: list, batch_size: int = 0, memory_bytes: int = None) -> list:
+    """
+    Groups URLs into bronze micro-batches (one task, one scan and one commit each).
+
+    batch_size > 0 fixes the number of URLs per batch (1 = one task per date).
+    batch_size = 0 sizes batches adaptively: files are added while their estimated
+    uncompressed volume fits in the memory a bronze task gets on this worker.
+    """
+    # Date order in both modes, so each batch covers consecutive days
+    urls = sorted((u for u in urls if u), key=lambda u: (extract_date_from_url(u) or datetime.date.max, u))
+    if batch_size and batch_size > 0:
+        return [urls[i:i + batch_size] for i in range(0, len(urls), batch_size)]
+
+    budget = memory_bytes or task_memory_bytes(stage="ingest_bronze_mitma")
+    batches, current, current_bytes = [], [], 0
+    for url in urls:
+        file_bytes = _bronze_file_bytes(url) * GZIP_EXPANSION
+        if current and (current_bytes + file_bytes > budget or len(current) >= MAX_BRONZE_BATCH):
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append(url)
+        current_bytes += file_bytes
+    if current:
+        batches.append(current)
+
+    print(f"📦 Planned {len(batches)} bronze batches for {len(urls)} URLs "
+          f"(memory budget {budget / 1024 ** 3:.1f} GB)")
+    return batches
+
+
+def _bronze_row_counts(con, raw_dates: list) -> dict:
+    """Rows per raw YYYYMMDD date for the listed dates (file pruning keeps it cheap)."""
+    if not raw_dates or not table_exists(con, BRONZE_MITMA_TABLE):
+        return {}
+    placeholders = ", ".join("?" for _ in raw_dates)
+    rows = con.execute(
+        f"SELECT date, COUNT(*) FROM {BRONZE_MITMA_TABLE} WHERE date IN ({placeholders}) GROUP BY date",
+        [_as_date(raw) for raw in raw_dates],
+    ).fetchall()
+    return {r[0].strftime('%Y%m%d'): r[1] for r in rows}
+
+
+def _source_metadata(url: str, metadata: dict) -> dict:
+    """
+    Current ETag/Last-Modified/size of url: given by the caller (the fetch
+    plan), else a HEAD request, else the landed copy's when MITMA is unreachable.
+    """
+    return (metadata or {}).get(url) or probe_mitma_url(url) or landed_metadata(url) or {}
+
+
+def ingestion_bronze_mitma_batch(con, urls: list, sources: dict = None, metadata: dict = None,
+                                 commit_token: str = None, fused: bool = False) -> list:
+    """
+    Loads several MITMA daily files into bronze with a single multi-file
+    read_csv scan and a single INSERT (one DuckLake snapshot).
+
+    Idempotency comes from the ingestion manifest (see manifest_mitma): dates
+    recorded there are skipped unless the file was republished, in which case
+    the old rows are replaced. Dates loaded before the manifest existed are
+    detected once in bronze and adopted into the manifest.
+    `sources` maps each URL to the path it is read from (landing-zone copies,
+    see landing_mitma); URLs without an entry are read over HTTP.
+    `metadata` maps URLs to their current source metadata (from the fetch
+    plan); without it each date is checked with a HEAD request.
+    fused=True reads the files once into a local staging table and writes
+    both bronze and the silver rows of the inserted dates from it (see
+    silver_mitma.load_silver_from_staging), instead of rescanning bronze.
+    Returns the URLs that were inserted.
+    """
+    sources = sources or {}
+    try:
+        dated = {}
+        for url in urls:
+            date_obj = extract_date_from_url(url)
+            if not date_obj:
+                print(f"⚠️ Could not extract date from {url}. Skipping.")
+                continue
+            dated[date_obj.strftime('%Y%m%d')] = url
+        if not dated:
+            return []
+        if not table_exists(con, MANIFEST_TABLE):
+            create_manifest_table(con)
+
+        entries = manifest_entries(con, list(dated))
+        republished = [raw for raw in dated if raw in entries
+                       and is_republished(entries[raw], _source_metadata(dated[raw], metadata))]
+        for raw in sorted(set(entries) - set(republished)):
+            print(f"⏭️ Skipping {raw}: Data already found in table.")
+
+        # Dates without a manifest row: only these need a look at bronze itself.
+        unknown = [raw for raw in dated if raw not in entries]
+        legacy_counts = _bronze_row_counts(con, unknown)
+        for raw in sorted(legacy_counts):
+            print(f"⏭️ Skipping {raw}: Data already found in table (adopted into the manifest).")
+
+        if republished:
+            print(f"♻️ Republished upstream, reloading: {', '.join(sorted(republished))}")
+            # The old version's quarantined rows go with its bronze rows
+            for table, column in ((BRONZE_MITMA_TABLE, "date"), (BRONZE_QUARANTINE_TABLE, "source_date")):
+                con.execute(
+                    f"DELETE FROM {table} WHERE {column} IN ({', '.join('?' for _ in republished)})",
+                    [_as_date(raw) for raw in republished],
+                )
+
+        pending = sorted(republished + [raw for raw in unknown if raw not in legacy_counts])
+        if pending:
+            paths = [sources.get(dated[raw]) or dated[raw] for raw in pending]
+            csv_scanned = any(not path.endswith(".parquet") for path in paths)
+            reject_files = [rejects_path(path) for path in paths if path.endswith(".parquet")]
+            con.execute(f"DROP TABLE IF EXISTS temp.main.{_REJECT_ERRORS}")
+            con.execute(f"DROP TABLE IF EXISTS temp.main.{_REJECT_SCANS}")
+            source_rows = f"""
+                SELECT 
+                    fecha AS date,
+                    periodo AS hour_period,
+                    origen AS origin_zone,
+                    destino AS destination_zone,
+                    distancia AS distance_range,
+                    actividad_origen AS origin_activity,
+                    actividad_destino AS destination_activity,
+                    estudio_origen_posible AS is_origin_study_possible,
+                    estudio_destino_posible AS is_destination_study_possible,
+                    residencia AS residence_province_code,
+                    renta AS income_range,
+                    edad AS age_group,
+                    sexo AS gender,
+                    viajes AS trips,
+                    viajes_km AS trips_km_product,
+                    CURRENT_TIMESTAMP AS ingestion_date
+                FROM {_source_rows_reader(paths)}
+            """
+            if fused:
+                con.execute(f"CREATE OR REPLACE TEMP TABLE {_STAGING_TABLE} AS {source_rows}")
+                con.execute(f"INSERT INTO {BRONZE_MITMA_TABLE} SELECT * FROM temp.main.{_STAGING_TABLE}")
+            else:
+                con.execute(f"INSERT INTO {BRONZE_MITMA_TABLE} {source_rows}")
+            _quarantine_rejects(con, csv_scanned, reject_files)
+            print(f"Successfully inserted data for {len(pending)} dates: {', '.join(pending)}")
+
+        to_record = pending + sorted(legacy_counts)
+        if to_record:
+            counts = dict(legacy_counts)
+            counts.update(_bronze_row_counts(con, pending))
+            token = commit_token or tag_commit(con, "bronze", f"{len(pending)} dates")
+            loads = []
+            for raw in to_record:
+                meta = _source_metadata(dated[raw], metadata)
+                loads.append({
+                    "source_date": raw,
+                    "url": dated[raw],
+                    "etag": meta.get("etag"),
+                    "last_modified": meta.get("last_modified"),
+                    "byte_size": meta.get("byte_size"),
+                    "content_sha256": meta.get("sha256"),
+                    "row_count": counts.get(raw, 0),
+                })
+            record_bronze(con, loads, token)
+
+        if fused and pending:
+            try:
+                load_silver_from_staging(con, f"temp.main.{_STAGING_TABLE}", [_as_date(raw) for raw in pending])
+            finally:
+                con.execute(f"DROP TABLE IF EXISTS temp.main.{_STAGING_TABLE}")
+        return [dated[raw] for raw in pending]
     except Exception as e:
         print(f"Pipeline Failed: {e}")
         # Cleanup: If a temp folder was left behind due to crash, you might want to log it
         # or attempt to delete it here, though it's safer to leave it for inspection.
-        raise e
\ No newline at end of file
+        raise e
+
+
+def ingestion_bronze_mitma(con, url:str, source:str=None):
+    """
+    Loads one MITMA daily file into bronze. `url` identifies the date; `source`
+    is where the file is read from (a landing-zone copy, see landing_mitma),
+    defaulting to the URL itself.
+    """
+    return ingestion_bronze_mitma_batch(con, [url], {url: source} if source else None)
@@ -0,0 +1,158 @@
+"""
+Per-run checkpoints of the MITMA ingestion.
+
+ops_ingestion_checkpoints records, for every DAG run, each date that went
+through a stage (fetched, bronze, silver): whether it finished or failed, the
+rows it produced and the time spent. Checkpoints are written in the same
+transaction as the data they describe, so a "done" row always means the data
+is committed.
+
+Bronze and silver tasks commit a whole batch at once; if the batch fails they
+fall back to one transaction per date (see run_per_date), so a single bad file
+only fails its own date. Retries and reruns then skip what is already done:
+bronze through the ingestion manifest, silver through these checkpoints.
+run_summary() prints the per-stage throughput of a run.
+"""
+import time
+
+from ducklake_utils import extract_date_from_url, table_exists
+
+CHECKPOINT_TABLE = "ops_ingestion_checkpoints"
+STAGES = ("fetched", "bronze", "silver")
+
+
+def create_checkpoint_table(con):
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+            run_id VARCHAR,
+            source_date VARCHAR,
+            stage VARCHAR,
+            status VARCHAR,
+            rows BIGINT,
+            seconds DOUBLE,
+            error VARCHAR,
+            recorded_at TIMESTAMP
+        );
+    """)
+
+
+def _raw_date(url: str):
+    date_obj = extract_date_from_url(url)
+    return date_obj.strftime('%Y%m%d') if date_obj else None
+
+
+def record_checkpoints(con, run_id: str, stage: str, urls: list, seconds: float = 0.0,
+                       rows: dict = None, status: str = "done", error: str = None):
+    """
+    Records `stage` for the dates of urls. `seconds` is the time of the whole
+    batch and is split evenly between its dates; `rows` maps raw date -> rows.
+    """
+    raw_dates = [raw for raw in (_raw_date(url) for url in urls) if raw]
+    if not raw_dates:
+        return
+    if not table_exists(con, CHECKPOINT_TABLE):
+        create_checkpoint_table(con)
+    per_date = seconds / len(raw_dates)
+    con.executemany(
+        f"""
+        INSERT INTO {CHECKPOINT_TABLE} (run_id, source_date, stage, status, rows, seconds, error, recorded_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """,
+        [[run_id, raw, stage, status, (rows or {}).get(raw), per_date, error] for raw in raw_dates],
+    )
+
+
+def completed_urls(con, run_id: str, stage: str, urls: list) -> set:
+    """URLs whose date already finished `stage` in this run."""
+    if not urls or not table_exists(con, CHECKPOINT_TABLE):
+        return set()
+    done = {
+        row[0] for row in con.execute(
+            f"SELECT source_date FROM {CHECKPOINT_TABLE} WHERE run_id = ? AND stage = ? AND status = 'done'",
+            [run_id, stage],
+        ).fetchall()
+    }
+    return {url for url in urls if _raw_date(url) in done}
+
+
+def run_per_date(urls: list, open_session, process, run_id: str, stage: str) -> list:
+    """
+    Runs process(con, urls) on the whole batch in one session; if that fails,
+    once per date, each in its own session (transaction). Every successful
+    unit records a "done" checkpoint through process's return value
+    ({raw_date: rows} or None); failed dates record a "failed" checkpoint.
+    Raises after the fallback if any date failed, listing them.
+    """
+    def attempt(unit: list):
+        start = time.perf_counter()
+        with open_session() as con:
+            rows = process(con, unit)
+            record_checkpoints(con, run_id, stage, unit, time.perf_counter() - start, rows)
+
+    try:
+        attempt(urls)
+        return urls
+    except Exception as e:
+        if len(urls) == 1:
+            _record_failure(open_session, run_id, stage, urls, e)
+            raise
+        print(f"⚠️ {stage} batch of {len(urls)} dates failed ({e}); retrying date by date")
+
+    done, failed = [], []
+    for url in urls:
+        try:
+            attempt([url])
+            done.append(url)
+        except Exception as e:
+            print(f"❌ {stage} failed for {url}: {e}")
+            _record_failure(open_session, run_id, stage, [url], e)
+            failed.append(url)
+    if failed:
+        raise RuntimeError(f"{stage}: {len(failed)}/{len(urls)} dates failed: {', '.join(failed)}")
+    return done
+
+
+def _record_failure(open_session, run_id, stage, urls, error):
+    try:
+        with open_session() as con:
+            record_checkpoints(con, run_id, stage, urls, status="failed", error=str(error)[:1000])
+    except Exception as e:
+        print(f"⚠️ Could not record the failed checkpoint: {e}")
+
+
+def run_summary(con, run_id: str) -> list:
+    """Prints and returns dates, rows and throughput per stage for a run."""
+    if not table_exists(con, CHECKPOINT_TABLE):
+        print("📊 No checkpoints recorded.")
+        return []
+    rows = con.execute(f"""
+        WITH latest AS (
+            -- A date retried within the run counts once, with its last status
+            SELECT * FROM {CHECKPOINT_TABLE}
+            WHERE run_id = ?
+            QUALIFY row_number() OVER (PARTITION BY source_date, stage ORDER BY recorded_at DESC) = 1
+        )
+        SELECT
+            stage,
+            COUNT(*) FILTER (WHERE status = 'done') AS dates_done,
+            COUNT(*) FILTER (WHERE status = 'failed') AS dates_failed,
+            COALESCE(SUM(rows), 0) AS rows,
+            COALESCE(SUM(seconds), 0) AS seconds
+        FROM latest
+        GROUP BY stage
+    """, [run_id]).fetchall()
+    by_stage = {row[0]: row for row in rows}
+
+    summary = []
+    print(f"📊 Ingestion summary for run {run_id}:")
+    for stage in STAGES:
+        if stage not in by_stage:
+            continue
+        _, done, failed, total_rows, seconds = by_stage[stage]
+        rows_per_s = total_rows / seconds if seconds else None
+        summary.append({"stage": stage, "dates_done": done, "dates_failed": failed,
+                        "rows": total_rows, "seconds": round(seconds, 1), "rows_per_second": rows_per_s})
+        throughput = f"{rows_per_s:,.0f} rows/s" if rows_per_s else "-"
+        print(f"   {stage:<8} done={done:<5} failed={failed:<4} rows={total_rows:<12,} "
+              f"time={seconds:8.1f}s  {throughput}")
+    return summary
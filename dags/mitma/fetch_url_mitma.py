@@ -1,13 +1,72 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
+"""
+Discovery of published MITMA daily files.
+
+fetch_mitma_sources() HEADs the candidate URLs of a date range with asyncio
+(one pooled httpx client, bounded concurrency, retry with backoff on timeouts
+and 5xx/429) and keeps the answers in a JSON availability cache, so known dates
+are not probed again on every run:
+
+- available dates are re-checked after AVAILABLE_TTL_HOURS (recent dates) or
+  AVAILABLE_OLD_TTL_HOURS (older ones, so republished files are still noticed)
+- missing dates are re-checked after MISSING_TTL_HOURS while they are recent
+  (MITMA publishes with a delay) and after MISSING_OLD_TTL_HOURS otherwise
+- answers that stay unknown after the retries (network errors) are not cached
+
+Environment variables:
+    MITMA_BASE_URL               base of the daily file URLs (e.g. a local stand-in in tests)
+    MITMA_AVAILABILITY_CACHE     cache file (default $AIRFLOW_HOME/data/cache/mitma_availability.json)
+    MITMA_PROBE_CONCURRENCY      concurrent HEAD requests (default 32)
+"""
+import asyncio
+import fcntl
+import json
+import os
+import time
 from datetime import datetime, timedelta
-import requests
 import re
-def check_url_exists(url):
+
+DEFAULT_BASE_URL = "https://movilidad-opendata.mitma.es/estudios_basicos/por-distritos/viajes/ficheros-diarios"
+PROBE_TIMEOUT = 5
+PROBE_RETRIES = 3
+RECENT_DAYS = 30
+AVAILABLE_TTL_HOURS = 24
+AVAILABLE_OLD_TTL_HOURS = 24 * 30
+MISSING_TTL_HOURS = 6
+MISSING_OLD_TTL_HOURS = 24 * 7
+
+
+def mitma_base_url() -> str:
+    return os.environ.get("MITMA_BASE_URL", DEFAULT_BASE_URL).rstrip("/")
+
+
+def mitma_url(day) -> str:
+    """URL of the daily district trips file for a date."""
+    return f"{mitma_base_url()}/{day.strftime('%Y-%m')}/{day.strftime('%Y%m%d')}_Viajes_distritos.csv.gz"
+
+
+def _source_from_headers(url, headers):
+    size = headers.get("Content-Length")
+    return {
+        "url": url,
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "byte_size": int(size) if size else None,
+    }
+
+
+def probe_mitma_url(url):
+    """HEAD request: source metadata of an available file, or None if it is not published."""
+    import requests
     try:
         response = requests.head(url, timeout=5)
-        return url if response.status_code == 200 else None
     except:
         return None
+    if response.status_code != 200:
+        return None
+    return _source_from_headers(url, response.headers)
+
+def check_url_exists(url):
+    return url if probe_mitma_url(url) else None
 
 def extract_date_from_url(url):
     match = re.search(r'/(\d{8})_Viajes_distritos', url)
@@ -15,7 +74,144 @@ def extract_date_from_url(url):
         return datetime.strptime(match.group(1), '%Y%m%d').date()
     return None
 
+# ---------------------------------------------------------------------------
+# Async probing
+# ---------------------------------------------------------------------------
+async def _probe_async(client, url, semaphore, retries=PROBE_RETRIES):
+    """
+    HEAD with retries: source metadata if published, False if the server says
+    it is not (404/403...), None if it could not be determined.
+    """
+    import httpx
+
+    for attempt in range(retries):
+        async with semaphore:
+            try:
+                response = await client.head(url)
+            except httpx.HTTPError:
+                response = None
+        if response is not None:
+            if response.status_code == 200:
+                return _source_from_headers(url, response.headers)
+            if response.status_code < 500 and response.status_code != 429:
+                return False
+        if attempt < retries - 1:
+            await asyncio.sleep(0.5 * 2 ** attempt)
+    return None
+
+
+async def probe_mitma_urls_async(urls, concurrency=None, timeout=PROBE_TIMEOUT, retries=PROBE_RETRIES) -> dict:
+    """{url: metadata | False | None} for every url, see _probe_async."""
+    import httpx
+
+    if concurrency is None:
+        concurrency = int(os.environ.get("MITMA_PROBE_CONCURRENCY", "32"))
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        results = await asyncio.gather(*(_probe_async(client, url, semaphore, retries) for url in urls))
+    return dict(zip(urls, results))
+
+
+def probe_mitma_urls(urls, **kwargs) -> dict:
+    return asyncio.run(probe_mitma_urls_async(list(urls), **kwargs))
+
+
+# ---------------------------------------------------------------------------
+# Availability cache
+# ---------------------------------------------------------------------------
+def availability_cache_path() -> str:
+    default_path = os.path.join(os.environ.get("AIRFLOW_HOME", "."), "data", "cache", "mitma_availability.json")
+    return os.environ.get("MITMA_AVAILABILITY_CACHE", default_path)
+
+
+def _load_cache(path) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(path, updates: dict):
+    """Merges updates into the cache file (locked, atomic replace)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            cache = _load_cache(path)
+            cache.update(updates)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(cache, f, sort_keys=True)
+            os.replace(tmp_path, path)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _cache_entry(url, source, now) -> dict:
+    return {"url": url, "available": bool(source), "source": source or None, "checked_at": now}
+
+
+def remember_available(source: dict):
+    """Records a file found published outside resolve_availability (e.g. by the sensor trigger)."""
+    _save_cache(availability_cache_path(), {source["url"]: _cache_entry(source["url"], source, time.time())})
+
+
+def _is_fresh(entry, day, now) -> bool:
+    if not entry or entry.get("url") is None:
+        return False
+    recent = (datetime.fromtimestamp(now).date() - day).days <= RECENT_DAYS
+    if entry["available"]:
+        ttl = AVAILABLE_TTL_HOURS if recent else AVAILABLE_OLD_TTL_HOURS
+    else:
+        ttl = MISSING_TTL_HOURS if recent else MISSING_OLD_TTL_HOURS
+    return now - entry["checked_at"] < ttl * 3600
+
+
+def resolve_availability(days, refresh=False) -> dict:
+    """
+    {date: source metadata or None} for the given dates, answering from the
+    availability cache and probing only stale or unknown dates.
+    """
+    path = availability_cache_path()
+    cache = _load_cache(path)
+    now = time.time()
+    urls = {day: mitma_url(day) for day in days}
+
+    # Cache entries are keyed by URL so a different MITMA_BASE_URL never reuses them
+    result, to_probe = {}, []
+    for day, url in urls.items():
+        entry = cache.get(url)
+        if not refresh and _is_fresh(entry, day, now):
+            result[day] = entry["source"] if entry["available"] else None
+        else:
+            to_probe.append(day)
+
+    print(f"Availability cache: {len(result)} dates cached, probing {len(to_probe)}...")
+    if to_probe:
+        probed = probe_mitma_urls([urls[day] for day in to_probe])
+        updates, unknown = {}, 0
+        for day in to_probe:
+            source = probed[urls[day]]
+            if source is None:
+                unknown += 1
+                continue
+            updates[urls[day]] = _cache_entry(urls[day], source, now)
+            result[day] = source or None
+        if unknown:
+            print(f"⚠️ {unknown} URLs could not be checked; they will be probed again next run")
+        if updates:
+            _save_cache(path, updates)
+    return result
+
+
 def fetch_mitma_url(start_date:datetime,end_date:datetime):
+    sources = fetch_mitma_sources(start_date, end_date)
+    return None if sources is None else [s["url"] for s in sources]
+
+def fetch_mitma_sources(start_date:datetime,end_date:datetime):
+    """Like fetch_mitma_url, but returns the HEAD metadata of each available file (see probe_mitma_url)."""
     try:
         #I need to be sure that they are dates of type datetime  
         if isinstance(start_date, str):
@@ -39,24 +235,11 @@ def fetch_mitma_url(start_date:datetime,end_date:datetime):
         if start > end:
             raise ValueError(f"Start date ({start.date()}) cannot be after end date ({end.date()}).")
         
-        dates = [start + timedelta(days=x) for x in range((end - start).days + 1)]
-        
-        all_urls = [
-            f"https://movilidad-opendata.mitma.es/estudios_basicos/por-distritos/viajes/ficheros-diarios/{d.strftime('%Y-%m')}/{d.strftime('%Y%m%d')}_Viajes_distritos.csv.gz" 
-            for d in dates
-        ]
-        
-        print(f"Checking {len(all_urls)} URLs...")
+        dates = [(start + timedelta(days=x)).date() for x in range((end - start).days + 1)]
         
-        valid_urls = []
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            futures = {executor.submit(check_url_exists, url): url for url in all_urls}
-            for i, future in enumerate(as_completed(futures), 1):
-                if i % 50 == 0:
-                    print(f"Checked {i}/{len(all_urls)} URLs...")
-                result = future.result()
-                if result:
-                    valid_urls.append(result)
+        print(f"Checking {len(dates)} URLs...")
+        availability = resolve_availability(dates)
+        valid_urls = [availability[d] for d in dates if availability.get(d)]
         
         print(f"Found {len(valid_urls)} valid URLs")
         
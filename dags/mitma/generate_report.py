@@ -1,10 +1,4 @@
 import io
-import boto3
-import matplotlib.pyplot as plt
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from reportlab.lib import colors
 from ducklake_utils import GOLD_MITMA_TABLE
 
 def get_day_type_name(dt):
@@ -18,6 +12,8 @@ def create_mobility_plot(x_data, y_data, title, y_label, color='#007acc'):
     """
     Helper function to generate a plot and return it as an in-memory buffer.
     """
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(8, 3)) 
     
     plt.plot(x_data, y_data, marker='o', linestyle='-', color=color, linewidth=2)
@@ -39,6 +35,12 @@ def create_mobility_plot(x_data, y_data, title, y_label, color='#007acc'):
     return buf
 
 def generate_mobility_report_s3(con, target_origins: list, bucket_name: str, s3_key: str = "reports/mobility_report.pdf"):
+    import boto3
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
     print(f"📊 Generating Aggregated Report for Origins: {target_origins}")
 
     # 1. Prepare SQL with Dynamic List of Origins
@@ -0,0 +1,275 @@
+"""
+Landing zone for MITMA daily files.
+
+Bronze ingestion used to read every *_Viajes_distritos.csv.gz straight over
+HTTP, so each retry or re-ingest downloaded the whole file again. Files are now
+downloaded once into a local cache and bronze reads the local copy:
+
+- downloads resume from the partial file with HTTP Range requests
+- a file lock per file keeps parallel tasks from downloading the same file twice
+- completed files are checked against the server before they are accepted:
+  the size against Content-Length / Content-Range and, when the caller passes
+  the current source metadata (HEAD), against its size and ETag; resumed
+  requests send If-Range, so a file republished mid-download restarts
+- a .meta.json sidecar is written (ETag, Last-Modified, size, sha256). MITMA
+  publishes no checksum, so the sha256 is ours: it only detects local
+  corruption of the cached copy before reuse, not a bad download
+- when the current source metadata differs from the sidecar, the file was
+  republished and the stale copy is replaced
+- prefetch_landing() downloads a list of URLs in parallel, so the next dates are
+  already local while the current one is being ingested
+
+Environment variables:
+    MITMA_LANDING_DIR          cache directory (default $AIRFLOW_HOME/data/landing/mitma)
+    MITMA_LANDING_WORKERS      parallel downloads in prefetch_landing (default 4)
+    MITMA_LANDING_KEEP_DAYS    files older than this are pruned by prefetch (default 14)
+"""
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+CHUNK_SIZE = 4 * 1024 * 1024
+NETWORK_CHUNK_SIZE = 256 * 1024
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_TIMEOUT = (10, 120)
+
+
+def landing_dir() -> str:
+    default_dir = os.path.join(os.environ.get("AIRFLOW_HOME", "."), "data", "landing", "mitma")
+    return os.environ.get("MITMA_LANDING_DIR", default_dir)
+
+
+def landing_path(url: str) -> str:
+    """Local path for a MITMA URL, keeping the YYYY-MM folder of the source."""
+    parts = urlparse(url).path.rstrip("/").split("/")
+    return os.path.join(landing_dir(), parts[-2], parts[-1])
+
+
+@contextmanager
+def _file_lock(path: str):
+    with open(path + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _gzip_is_complete(path: str) -> bool:
+    """Reads the whole stream; gzip checks the CRC32 and length trailer."""
+    try:
+        with gzip.open(path, "rb") as f:
+            while f.read(CHUNK_SIZE):
+                pass
+        return True
+    except (OSError, EOFError):
+        return False
+
+
+def landed_metadata(url: str):
+    """Source metadata recorded when url was landed (etag, last_modified, byte_size, sha256), or None."""
+    meta_path = landing_path(url) + ".meta.json"
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        return json.load(f)
+
+
+SOURCE_KEYS = ("etag", "last_modified", "byte_size")
+
+
+def same_source(recorded: dict, source: dict) -> bool:
+    """False if recorded and source (ETag/Last-Modified/size) disagree on any key both have."""
+    if not recorded or not source:
+        return True
+    for key in SOURCE_KEYS:
+        old, new = recorded.get(key), source.get(key)
+        if old is not None and new is not None and str(old) != str(new):
+            return False
+    return True
+
+
+def is_landed(url: str, source: dict = None) -> bool:
+    """
+    True if url has a local copy matching `source` metadata (when given) whose
+    sha256 still matches the one recorded at download time (local corruption).
+    """
+    path = landing_path(url)
+    meta = landed_metadata(url)
+    if meta is None or not os.path.exists(path) or not same_source(meta, source):
+        return False
+    return meta.get("sha256") == _sha256(path)
+
+
+def _drop_landed(url: str):
+    path = landing_path(url)
+    for stale in (path, path + ".meta.json", path + ".part"):
+        if os.path.exists(stale):
+            os.remove(stale)
+
+
+def _total_size(response, offset: int):
+    """Full size of the file on the server, from Content-Range or Content-Length."""
+    content_range = response.headers.get("Content-Range", "")
+    if "/" in content_range and content_range.rsplit("/", 1)[1].isdigit():
+        return int(content_range.rsplit("/", 1)[1])
+    length = response.headers.get("Content-Length")
+    return offset + int(length) if length else None
+
+
+def _check_against_source(url: str, part_path: str, etag, source: dict):
+    """Rejects a download whose size or ETag disagrees with the source metadata (HEAD)."""
+    if not source:
+        return
+    size = os.path.getsize(part_path)
+    if source.get("byte_size") is not None and size != int(source["byte_size"]):
+        os.remove(part_path)
+        raise IOError(f"Downloaded {size} bytes for {url}, the server announced {source['byte_size']}")
+    if etag and source.get("etag") and etag != source["etag"]:
+        os.remove(part_path)
+        raise IOError(f"ETag of {url} changed during the download ({source['etag']} -> {etag})")
+
+
+def _download(url: str, path: str, source: dict = None):
+    """
+    Downloads into path + '.part', resuming from whatever is already there, and
+    checks the result against what the server announced before accepting it.
+    """
+    import requests
+
+    part_path = path + ".part"
+    source_headers = {}
+    if_range = (source or {}).get("etag")
+    for attempt in range(1, DOWNLOAD_RETRIES + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        if offset and if_range:
+            # A republished file comes back whole (200) instead of being appended to
+            headers["If-Range"] = if_range
+        try:
+            with requests.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                if response.status_code == 416:
+                    # Range not satisfiable: the partial file is already complete.
+                    break
+                response.raise_for_status()
+                if offset and response.status_code != 206:
+                    print(f"↩️ Server ignored the Range request, restarting {os.path.basename(path)}")
+                    offset = 0
+                expected = _total_size(response, offset)
+                source_headers = response.headers
+                if_range = source_headers.get("ETag") or if_range
+
+                with open(part_path, "ab" if offset else "wb") as f:
+                    for chunk in response.iter_content(chunk_size=NETWORK_CHUNK_SIZE):
+                        f.write(chunk)
+
+            if expected is not None and os.path.getsize(part_path) != expected:
+                raise IOError(f"expected {expected} bytes, got {os.path.getsize(part_path)}")
+            break
+        except (requests.RequestException, IOError) as e:
+            if attempt == DOWNLOAD_RETRIES:
+                raise
+            print(f"⚠️ Download attempt {attempt} for {os.path.basename(path)} failed ({e}), resuming...")
+            time.sleep(2 ** attempt)
+
+    _check_against_source(url, part_path, source_headers.get("ETag"), source)
+    if not _gzip_is_complete(part_path):
+        os.remove(part_path)
+        raise IOError(f"Downloaded file for {url} is not a valid gzip stream")
+
+    with open(path + ".meta.json", "w") as f:
+        json.dump({
+            "url": url,
+            "etag": source_headers.get("ETag"),
+            "last_modified": source_headers.get("Last-Modified"),
+            "byte_size": os.path.getsize(part_path),
+            "sha256": _sha256(part_path),
+        }, f)
+    os.replace(part_path, path)
+
+
+def ensure_landed(url: str, source: dict = None) -> str:
+    """
+    Returns the local path of url, downloading it first if needed. `source` is
+    the current metadata of the published file (see fetch_url_mitma); a local
+    copy of an older version is dropped and downloaded again.
+    """
+    path = landing_path(url)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with _file_lock(path):
+        if is_landed(url, source):
+            print(f"📦 Landing hit: {path}")
+            return path
+        if not same_source(landed_metadata(url), source):
+            print(f"♻️ {os.path.basename(path)} was republished upstream, dropping the stale copy")
+            _drop_landed(url)
+        start = time.perf_counter()
+        _download(url, path, source)
+        size_mb = os.path.getsize(path) / 1024 ** 2
+        print(f"⬇️ Landed {os.path.basename(path)} ({size_mb:.1f} MB) in {time.perf_counter() - start:.1f}s")
+    return path
+
+
+def bronze_source(url: str, source: dict = None) -> str:
+    """Local copy of url for bronze ingestion, or the URL itself if the download fails."""
+    try:
+        return ensure_landed(url, source)
+    except Exception as e:
+        print(f"⚠️ Could not land {url} ({e}). Reading it over HTTP instead.")
+        return url
+
+
+def prune_landing(keep_days: int = None):
+    """Removes cached files older than keep_days."""
+    if keep_days is None:
+        keep_days = int(os.environ.get("MITMA_LANDING_KEEP_DAYS", "14"))
+    cutoff = time.time() - keep_days * 86400
+    removed = 0
+    for root, _, files in os.walk(landing_dir()):
+        for name in files:
+            path = os.path.join(root, name)
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+    if removed:
+        print(f"🧹 Pruned {removed} files older than {keep_days} days from the landing zone")
+
+
+def prefetch_landing(urls: list, max_workers: int = None, sources: dict = None) -> list:
+    """
+    Downloads urls in parallel into the landing zone. `sources` maps URLs to
+    their current metadata (republished files are downloaded again).
+    Returns the URLs that landed.
+    """
+    sources = sources or {}
+    if max_workers is None:
+        max_workers = int(os.environ.get("MITMA_LANDING_WORKERS", "4"))
+    prune_landing()
+
+    landed = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(ensure_landed, url, sources.get(url)): url for url in urls}
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                future.result()
+                landed.append(url)
+            except Exception as e:
+                print(f"⚠️ Prefetch failed for {url}: {e}")
+    print(f"📦 Landing zone ready: {len(landed)}/{len(urls)} files")
+    return landed
@@ -0,0 +1,169 @@
+"""
+Ingestion manifest for MITMA daily files.
+
+ops_ingestion_manifest keeps one row per source date: where it came from
+(URL, ETag, Last-Modified, byte size, content hash), how many rows bronze
+received and the DuckLake snapshots that loaded it into bronze and silver.
+
+Idempotency checks read this small table instead of probing bronze/silver,
+and plan_missing_sources() diffs the files MITMA currently publishes against
+it so only missing or republished days are scheduled.
+
+Snapshot ids: each ingestion transaction is tagged with a commit token
+(DuckLake commit message extra_info, see tag_commit). The manifest stores the
+token in the same transaction as the data, and resolve_manifest_snapshots()
+later fills in the snapshot ids those tokens committed as.
+"""
+import uuid
+
+from ducklake_utils import DUCKLAKE_ATTACH_NAME, table_exists
+from mitma.landing_mitma import same_source
+
+MANIFEST_TABLE = "ops_ingestion_manifest"
+
+_COLUMNS = [
+    "source_date", "url", "etag", "last_modified", "byte_size", "content_sha256", "row_count",
+    "bronze_commit", "bronze_snapshot_id", "bronze_loaded_at",
+    "silver_commit", "silver_snapshot_id", "silver_loaded_at",
+]
+
+
+def create_manifest_table(con):
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+            source_date VARCHAR,
+            url VARCHAR,
+            etag VARCHAR,
+            last_modified VARCHAR,
+            byte_size BIGINT,
+            content_sha256 VARCHAR,
+            row_count BIGINT,
+            bronze_commit VARCHAR,
+            bronze_snapshot_id BIGINT,
+            bronze_loaded_at TIMESTAMP,
+            silver_commit VARCHAR,
+            silver_snapshot_id BIGINT,
+            silver_loaded_at TIMESTAMP
+        );
+    """)
+    print(f"✅ Table {MANIFEST_TABLE} checked/created.")
+
+
+def tag_commit(con, kind: str, detail: str = "") -> str:
+    """Tags the open transaction's DuckLake commit and returns its token."""
+    token = f"mitma:{kind}:{uuid.uuid4().hex}"
+    try:
+        con.execute(
+            f"CALL {DUCKLAKE_ATTACH_NAME}.set_commit_message('airflow', ?, extra_info => ?)",
+            [f"{kind} {detail}".strip(), token],
+        )
+    except Exception as e:
+        # Older DuckLake versions: the manifest keeps the token, ids stay NULL.
+        print(f"⚠️ Could not tag the DuckLake commit ({e})")
+    return token
+
+
+def manifest_entries(con, raw_dates=None) -> dict:
+    """Manifest rows by raw YYYYMMDD date (all of them when raw_dates is None)."""
+    if not table_exists(con, MANIFEST_TABLE):
+        return {}
+    query = f"SELECT {', '.join(_COLUMNS)} FROM {MANIFEST_TABLE}"
+    params = None
+    if raw_dates is not None:
+        if not raw_dates:
+            return {}
+        query += f" WHERE source_date IN ({', '.join('?' for _ in raw_dates)})"
+        params = list(raw_dates)
+    rows = con.execute(query, params).fetchall()
+    return {row[0]: dict(zip(_COLUMNS, row)) for row in rows}
+
+
+def is_republished(entry: dict, source: dict) -> bool:
+    """True if the published file differs from the one recorded in the manifest."""
+    return not same_source(entry, source)
+
+
+def record_bronze(con, loads: list, commit_token: str):
+    """
+    Records bronze loads: dicts with source_date, url, etag, last_modified,
+    byte_size, content_sha256 and row_count. Replaces any previous row of the
+    same date (republished files start over, silver included).
+    """
+    if not loads:
+        return
+    dates = [load["source_date"] for load in loads]
+    con.execute(
+        f"DELETE FROM {MANIFEST_TABLE} WHERE source_date IN ({', '.join('?' for _ in dates)})",
+        dates,
+    )
+    con.executemany(
+        f"""
+        INSERT INTO {MANIFEST_TABLE}
+            (source_date, url, etag, last_modified, byte_size, content_sha256, row_count,
+             bronze_commit, bronze_loaded_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """,
+        [
+            [load["source_date"], load["url"], load.get("etag"), load.get("last_modified"),
+             load.get("byte_size"), load.get("content_sha256"), load.get("row_count"), commit_token]
+            for load in loads
+        ],
+    )
+
+
+def record_silver(con, raw_date: str, commit_token: str):
+    con.execute(
+        f"""
+        UPDATE {MANIFEST_TABLE}
+        SET silver_commit = ?, silver_snapshot_id = NULL, silver_loaded_at = CURRENT_TIMESTAMP
+        WHERE source_date = ?
+        """,
+        [commit_token, raw_date],
+    )
+
+
+def resolve_manifest_snapshots(con):
+    """Fills bronze/silver snapshot ids from the commit tokens that are still unresolved."""
+    if not table_exists(con, MANIFEST_TABLE):
+        return
+    for layer in ("bronze", "silver"):
+        con.execute(f"""
+            UPDATE {MANIFEST_TABLE} AS m
+            SET {layer}_snapshot_id = s.snapshot_id
+            FROM ducklake_snapshots('{DUCKLAKE_ATTACH_NAME}') AS s
+            WHERE m.{layer}_snapshot_id IS NULL
+              AND m.{layer}_commit IS NOT NULL
+              AND s.commit_extra_info = m.{layer}_commit
+        """)
+
+
+def plan_missing_sources(con, sources: list) -> list:
+    """
+    URLs to ingest out of the published `sources` (see fetch_mitma_sources):
+    dates missing from the manifest, not yet in silver, or republished since.
+    """
+    from ducklake_utils import extract_date_from_url
+
+    by_date = {}
+    for source in sources:
+        date_obj = extract_date_from_url(source["url"])
+        if date_obj:
+            by_date[date_obj.strftime('%Y%m%d')] = source
+
+    entries = manifest_entries(con, list(by_date))
+    missing, unfinished, republished = [], [], []
+    for raw_date, source in sorted(by_date.items()):
+        entry = entries.get(raw_date)
+        if entry is None:
+            missing.append(source["url"])
+        elif is_republished(entry, source):
+            republished.append(source["url"])
+        elif entry["silver_commit"] is None:
+            unfinished.append(source["url"])
+
+    print(
+        f"🗂️ Manifest plan: {len(by_date)} published, {len(missing)} missing, "
+        f"{len(unfinished)} without silver, {len(republished)} republished, "
+        f"{len(by_date) - len(missing) - len(unfinished) - len(republished)} up to date"
+    )
+    return missing + unfinished + republished
@@ -1,14 +1,21 @@
+import time
 from datetime import datetime, timedelta
 from airflow.sdk import dag, task,Param
 #from airflow.models.param import Param
 # --- Import your custom functions ---
 # Ensure these modules are in your PYTHONPATH or Airflow plugins folder
-from mitma.fetch_url_mitma import fetch_mitma_url
-from mitma.bronze_mitma import create_bronze_mitma_table,ingestion_bronze_mitma
-from mitma.silver_mitma import transform_mitma_silver,ingest_spain_holidays,create_silver_mitma_table
-from mitma.new_gold import transform_gold_mitma,create_gold_mitma_table
+from mitma.fetch_url_mitma import fetch_mitma_sources
+from mitma.bronze_mitma import create_bronze_mitma_table,ingestion_bronze_mitma_batch,plan_bronze_batches
+from mitma.landing_mitma import prefetch_landing
+from mitma.raw_parquet_mitma import raw_sources,recompress_landing
+from mitma.sensor_mitma import MitmaFileSensor
+from mitma.manifest_mitma import create_manifest_table,manifest_entries,plan_missing_sources,resolve_manifest_snapshots
+from mitma.checkpoint_mitma import completed_urls,record_checkpoints,run_per_date,run_summary
+from mitma.silver_mitma import transform_mitma_silver_dates,ingest_spain_holidays,build_dim_date,create_silver_mitma_table,register_silver_zones
+from mitma.new_gold import refresh_gold_mitma,create_gold_mitma_table
 from mitma.generate_report import generate_mobility_report_s3
-from ducklake_utils import connect_ducklake, close_ducklake, extract_date_from_url,DUCKLAKE_DATA_PATH
+from ducklake_utils import extract_date_from_url,DUCKLAKE_DATA_PATH
+from ducklake_pool import ducklake_session
 # --- Default Arguments ---
 default_args = {
     'owner': 'airflow',
@@ -25,8 +32,26 @@ default_args = {
     catchup=False,                   # Set True if you want to backfill past dates
     tags=['mitma', 'mobility'],
     params={
-        "start_date": Param(default="None", type=["string", "null"], description="YYYY-MM-DD"),
+        "start_date": Param(default=None, type=["string", "null"], description="YYYY-MM-DD"),
         "end_date": Param(default=None, type=["string", "null"], description="YYYY-MM-DD"),
+        "bronze_batch_size": Param(
+            default=0,
+            type="integer",
+            minimum=0,
+            description="URLs per bronze task: 0 = adaptive (file sizes and worker memory), 1 = one task per date",
+        ),
+        "fused_silver": Param(
+            default=False,
+            type="boolean",
+            description="Write silver from the same source scan as bronze (skips rescanning bronze)",
+        ),
+        "gold_refresh": Param(
+            default="auto",
+            type="string",
+            enum=["auto", "incremental", "full"],
+            description="Gold: fold only new dates (incremental), rebuild from all of silver (full), "
+                        "or incremental with a periodic full rebuild (auto)",
+        ),
     }
 )
 def mitma_pipeline():
@@ -35,7 +60,6 @@ def mitma_pipeline():
     # We use the logical_date (execution date) as the target date
     @task
     def task_fetch_urls(**context):
-        con = connect_ducklake()
         # 1. Try to get manual parameters from the UI Trigger
         # "params" dictionary is automatically available in context
         manual_start = context['params'].get('start_date')
@@ -53,38 +77,93 @@ def mitma_pipeline():
             s_date = context['ds']
             e_date = context['ds']
         # 3. Call your function
-        urls = fetch_mitma_url(s_date, e_date)
+        start = time.perf_counter()
+        sources = fetch_mitma_sources(s_date, e_date)
         
-        if not urls:
+        if not sources:
             print(f"No URLs found between {s_date} and {e_date}.")
             return []
-        close_ducklake(con)
+
+        # 4. Keep only dates missing from the ingestion manifest or republished upstream
+        with ducklake_session(transaction=True) as con:
+            urls = plan_missing_sources(con, sources)
+            record_checkpoints(con, context['run_id'], "fetched", urls, time.perf_counter() - start)
+        # HEAD metadata of the planned files, so stale local copies of republished ones are replaced
+        planned = set(urls)
+        context['ti'].xcom_push(key="sources", value={s["url"]: s for s in sources if s["url"] in planned})
         return urls
 
+    def planned_sources(context) -> dict:
+        return context['ti'].xcom_pull(task_ids="task_fetch_urls", key="sources") or {}
+
     @task
     def task_create_bronze_mitma(): 
-        con = connect_ducklake()
-        create_bronze_mitma_table(con)
-        close_ducklake(con)
+        with ducklake_session() as con:
+            create_bronze_mitma_table(con)
+            create_manifest_table(con)
         return True
         
+    # Downloads every file into the local landing zone in parallel, so the
+    # mapped bronze tasks below find the next dates already on disk.
+    @task
+    def task_prefetch_landing(urls, **context):
+        if not urls:
+            return []
+        return prefetch_landing(urls, sources=planned_sources(context))
+
+    # Converts the landed .csv.gz files into zstd Parquet in parallel (one
+    # process per file): gzip decompression is single-threaded in DuckDB,
+    # Parquet copies are scanned in parallel by bronze and by any re-ingest.
+    @task
+    def task_recompress_raw(urls, **context):
+        if not urls:
+            return []
+        return recompress_landing(urls, sources=planned_sources(context))
+
+    # Groups the URLs into micro-batches: one bronze task, one scan and one
+    # commit per batch instead of per date.
+    @task
+    def task_plan_bronze_batches(urls, **context):
+        if not urls:
+            return []
+        batch_size = int(context['params'].get('bronze_batch_size') or 0)
+        return plan_bronze_batches(urls, batch_size=batch_size)
+
     # 2. TASK: Ingest to Bronze
-    # This task receives the list of URLs from the previous task via XComs automatically
+    # This task receives one batch of URLs from the planner via XComs automatically
     @task
-    def task_ingest_bronze(url: str):
-        con = connect_ducklake()
-        if not url:
+    def task_ingest_bronze(urls: list, **context):
+        if not urls:
             print("Skipping ingestion: No URL provided.")
-            return
+            return []
+        fused = bool(context['params'].get('fused_silver'))
         
-        ingestion_bronze_mitma(con,url)
-        close_ducklake(con)
-        return url
+        # Raw Parquet copies when available, else the landed (or remote) CSV
+        planned = planned_sources(context)
+        sources = raw_sources(urls, planned)
+        inserted = []
+
+        def ingest(con, unit):
+            loaded = ingestion_bronze_mitma_batch(con,unit,sources,metadata=planned,fused=fused)
+            if fused:
+                record_checkpoints(con, context['run_id'], "silver", loaded)
+            # Rows only for dates loaded now; skipped dates were counted by the run that loaded them
+            entries = manifest_entries(con, [extract_date_from_url(u).strftime('%Y%m%d') for u in loaded])
+            inserted.extend(loaded)
+            return {raw: entry["row_count"] for raw, entry in entries.items()}
+
+        # One commit for the batch; if it fails, one per date so only bad files fail
+        run_per_date(urls, lambda: ducklake_session(stage="ingest_bronze_mitma", transaction=True),
+                     ingest, context['run_id'], "bronze")
+        # Already-present dates are passed on too: silver is rebuilt per date.
+        # In fused mode the inserted dates already have their silver rows.
+        if fused:
+            return [url for url in urls if url not in inserted]
+        return urls
 
 
     @task
     def task_create_holidays(urls):
-        con = connect_ducklake()
         valid_dates_list = set(extract_date_from_url(url) for url in urls)
         valid_dates_list.discard(None)
         if not valid_dates_list:
@@ -94,26 +173,47 @@ def mitma_pipeline():
         # Change '%Y-%m-%d' to '%Y%m%d'
         #ducklake_date_str = ", ".join([f"'{d.strftime('%Y%m%d')}'" for d in valid_dates_list])
         unique_years = {d.year for d in valid_dates_list} # This is a set, so, years are unique
-        for year in sorted(unique_years):
-            print(f"Ingesting holidays for {year}")
-            ingest_spain_holidays(con,year)
+        with ducklake_session(transaction=True) as con:
+            for year in sorted(unique_years):
+                print(f"Ingesting holidays for {year}")
+                ingest_spain_holidays(con,year)
+                build_dim_date(con,year)
         
-        close_ducklake(con)
         return True
 
     @task
     def task_create_silver_table():
-        con = connect_ducklake()
-        create_silver_mitma_table(con)
-        close_ducklake(con)
+        with ducklake_session() as con:
+            create_silver_mitma_table(con)
+
+    # dim_zone rows are added here, by one writer, once bronze (fused silver included) is done
+    @task
+    def task_register_zones(urls):
+        if not urls:
+            return
+        with ducklake_session(transaction=True) as con:
+            register_silver_zones(con, urls)
 
-    # 4. TASK: Silver Transformation
+    # 4. TASK: Silver Transformation (one commit per bronze batch)
     @task
-    def task_silver_transform(url):
-        con = connect_ducklake()
+    def task_silver_transform(urls, **context):
         print("Running Silver Ingestion (Atomic Swap)...")
-        transform_mitma_silver(con,url)
-        close_ducklake(con)
+        if not urls:
+            return
+        # Retries resume after the dates this run already moved to silver
+        with ducklake_session(read_only=True) as con:
+            done = completed_urls(con, context['run_id'], "silver", urls)
+        pending = [url for url in urls if url not in done]
+        if done:
+            print(f"⏭️ {len(done)} dates already in silver for this run")
+        if not pending:
+            return
+
+        def transform(con, unit):
+            # One set-based statement for all the dates of the unit
+            return transform_mitma_silver_dates(con, unit)
+
+        run_per_date(pending, lambda: ducklake_session(transaction=True), transform, context['run_id'], "silver")
     # 5. TASK: Update Statistics
     """
     @task
@@ -122,17 +222,22 @@ def mitma_pipeline():
         run_stats_update()
     """
     @task
-    def task_transform_gold():
-        con = connect_ducklake()
+    def task_transform_gold(**context):
         print("Updating Data Quality Stats...")
-        transform_gold_mitma(con)
-        close_ducklake(con)
+        with ducklake_session(stage="transform_gold_mitma", transaction=True) as con:
+            resolve_manifest_snapshots(con)
+            refresh_gold_mitma(con, context['params'].get('gold_refresh', 'auto'))
+
+    # Throughput per stage of this run, also when some dates failed
+    @task(trigger_rule="all_done")
+    def task_run_summary(**context):
+        with ducklake_session(read_only=True) as con:
+            return run_summary(con, context['run_id'])
 
     # In your DAG
     @task
     def task_create_report():
-        con = connect_ducklake()
-        try:
+        with ducklake_session(read_only=True) as con:
             # Generate and Upload
             generate_mobility_report_s3(
                 con=con, 
@@ -140,22 +245,43 @@ def mitma_pipeline():
                 bucket_name="transportationproject", 
                 s3_key="ducklake/reports/mitma_mobility.pdf"
             )
-        finally:
-            close_ducklake(con)
     # --- Define the Flow / Dependencies ---
     
 
 
+    # Scheduled runs wait (deferred, in the triggerer) for the day's file;
+    # manual runs (with or without a start/end range) go straight to fetching.
+    wait_for_file = MitmaFileSensor(
+        task_id="wait_for_mitma_file",
+        target_date="{{ '' if dag_run.run_type == 'manual' or (params.start_date and params.end_date) else ds }}",
+        soft_fail=True,
+    )
+
     # MAIN PIPELINE
     url_list = task_fetch_urls()
-    task_create_holidays(url_list)
+    wait_for_file >> url_list
+    calendar = task_create_holidays(url_list)
+    # Bronze does not wait for these: it reads whichever copy exists
+    # (raw Parquet, else the landed CSV, else the URL)
+    task_recompress_raw(task_prefetch_landing(url_list))
 
-    ingested_results = task_ingest_bronze.expand(url=url_list)
+    bronze_batches = task_plan_bronze_batches(url_list)
+    ingested_results = task_ingest_bronze.expand(urls=bronze_batches)
     task_create_bronze_mitma() >> ingested_results
 
-    silver_results = task_silver_transform.expand(url=ingested_results)
-    task_create_silver_table() >> silver_results
-    silver_results >> task_transform_gold()
+    silver_table = task_create_silver_table()
+    silver_table >> ingested_results
+    silver_results = task_silver_transform.expand(urls=ingested_results)
+    silver_table >> silver_results
+    zones = task_register_zones(url_list)
+    ingested_results >> zones
+    # Silver (and fused bronze) join dim_date, built by the holidays task
+    calendar >> ingested_results
+    calendar >> silver_results
+    gold = task_transform_gold()
+    silver_results >> gold
+    zones >> gold
+    gold >> task_run_summary()
     task_create_report()
 
 
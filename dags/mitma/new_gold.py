@@ -1,4 +1,20 @@
-from ducklake_utils import SILVER_MITMA_TABLE, GOLD_MITMA_TABLE
+import os
+import time
+
+from catalog_cache import catalog_cache
+from ducklake_utils import SILVER_MITMA_TABLE, GOLD_MITMA_TABLE, DIM_ZONE_TABLE, table_exists
+from mitma.manifest_mitma import MANIFEST_TABLE
+
+# Incremental gold (see refresh_gold_mitma): mergeable per-pattern statistics,
+# the dates folded into them and a log of refreshes.
+GOLD_STATS_TABLE = "gold_trip_pattern_stats"
+GOLD_STATS_DATES_TABLE = "gold_trip_pattern_stats_dates"
+GOLD_REFRESH_LOG_TABLE = "gold_refresh_log"
+# Unfiltered patterns computed from the stats, always up to date
+GOLD_LIVE_VIEW = "gold_trip_patterns_live"
+PATTERN_KEYS = "day_type, hour_period, origin_zone_key, destination_zone_key"
+# Days between full (outlier-filtered) rebuilds in auto mode; GOLD_FULL_REBUILD_DAYS overrides
+DEFAULT_FULL_REBUILD_DAYS = 7
 
 def create_gold_mitma_table(con):
     """
@@ -13,42 +29,75 @@ def create_gold_mitma_table(con):
             total_trips DOUBLE,
             avg_trips DOUBLE,
             std_trips DOUBLE,
-            num_days_observed INTEGER
+            num_days_observed INTEGER,
+            origin_zone_key INTEGER,
+            destination_zone_key INTEGER
         );
     """)
     print(f"✅ Table {GOLD_MITMA_TABLE} checked/created.")
 
 
-def transform_gold_mitma(con):
+def _with_zone_codes(patterns: str) -> str:
+    """
+    Final SELECT of the gold table: patterns are aggregated on the integer
+    dim_zone keys; the zone codes are looked up once per pattern at the end.
+    """
+    return f"""
+        SELECT
+            p.day_type,
+            p.hour_period,
+            oz.zone_id AS origin_zone,
+            dz.zone_id AS destination_zone,
+            p.total_trips,
+            p.avg_trips,
+            p.std_trips,
+            p.num_days_observed,
+            p.origin_zone_key,
+            p.destination_zone_key
+        FROM {patterns} p
+        JOIN {DIM_ZONE_TABLE} oz ON oz.zone_key = p.origin_zone_key
+        JOIN {DIM_ZONE_TABLE} dz ON dz.zone_key = p.destination_zone_key
+    """
+
+
+def transform_gold_mitma(con, stats_table: str = None):
     """
     Memory-optimized version: Computes patterns in a single pass without intermediate tables.
+    With stats_table (mergeable stats, see gold_stats_sql) the per-pattern
+    mean/std used by the outlier filter are read from it instead of being
+    recomputed from silver.
     """
     print("🔄 Starting Gold Aggregation (Memory-Optimized)...")
+    if stats_table:
+        stats_sql = f"""
+                SELECT {PATTERN_KEYS}, avg_trips, std_trips
+                FROM ({_stats_moments_sql(stats_table)})
+        """
+    else:
+        stats_sql = f"""
+                SELECT 
+                    day_type,
+                    hour_period,
+                    origin_zone_key,
+                    destination_zone_key,
+                    AVG(trips) as avg_trips,
+                    STDDEV_SAMP(trips) as std_trips
+                FROM {SILVER_MITMA_TABLE}
+                GROUP BY day_type, hour_period, origin_zone_key, destination_zone_key
+        """
     
     try:
         # Strategy 1: Single-pass aggregation (no intermediate table)
         # This calculates everything in one query, reducing memory footprint
         con.execute(f"""
             CREATE OR REPLACE TABLE {GOLD_MITMA_TABLE} AS
-            WITH stats AS (
-                SELECT 
-                    day_type,
-                    hour_period,
-                    origin_zone,
-                    destination_zone,
-                    SUM(trips) as total_trips,
-                    AVG(trips) as avg_trips,
-                    STDDEV_SAMP(trips) as std_trips,
-                    COUNT(DISTINCT date) as num_days_observed
-                FROM {SILVER_MITMA_TABLE}
-                GROUP BY day_type, hour_period, origin_zone, destination_zone
-            ),
+            WITH stats AS ({stats_sql}),
             outlier_filtered AS (
                 SELECT 
                     s.day_type,
                     s.hour_period,
-                    s.origin_zone,
-                    s.destination_zone,
+                    s.origin_zone_key,
+                    s.destination_zone_key,
                     s.trips,
                     s.date,
                     st.avg_trips,
@@ -57,25 +106,28 @@ def transform_gold_mitma(con):
                 JOIN stats st 
                     ON s.day_type = st.day_type 
                     AND s.hour_period = st.hour_period 
-                    AND s.origin_zone = st.origin_zone 
-                    AND s.destination_zone = st.destination_zone
+                    AND s.origin_zone_key = st.origin_zone_key 
+                    AND s.destination_zone_key = st.destination_zone_key
                 WHERE 
                     st.std_trips IS NULL 
                     OR st.std_trips = 0
                     OR (s.trips BETWEEN (st.avg_trips - 3 * st.std_trips) 
                                     AND (st.avg_trips + 3 * st.std_trips))
+            ),
+            patterns AS (
+                SELECT 
+                    day_type,
+                    hour_period,
+                    origin_zone_key,
+                    destination_zone_key,
+                    SUM(trips) as total_trips,
+                    AVG(trips) as avg_trips,
+                    COALESCE(STDDEV_SAMP(trips), 0) as std_trips,
+                    COUNT(DISTINCT date) as num_days_observed
+                FROM outlier_filtered
+                GROUP BY day_type, hour_period, origin_zone_key, destination_zone_key
             )
-            SELECT 
-                day_type,
-                hour_period,
-                origin_zone,
-                destination_zone,
-                SUM(trips) as total_trips,
-                AVG(trips) as avg_trips,
-                COALESCE(STDDEV_SAMP(trips), 0) as std_trips,
-                COUNT(DISTINCT date) as num_days_observed
-            FROM outlier_filtered
-            GROUP BY day_type, hour_period, origin_zone, destination_zone;
+            {_with_zone_codes('patterns')};
         """)
         
         count = con.execute(f"SELECT COUNT(*) FROM {GOLD_MITMA_TABLE}").fetchone()[0]
@@ -107,12 +159,12 @@ def transform_gold_mitma_chunked(con, chunk_by='day_type'):
                 {'CREATE OR REPLACE' if first_chunk else 'INSERT INTO'} TABLE {GOLD_MITMA_TABLE}
                 WITH stats AS (
                     SELECT 
-                        day_type, hour_period, origin_zone, destination_zone,
+                        day_type, hour_period, origin_zone_key, destination_zone_key,
                         AVG(trips) as avg_trips,
                         STDDEV_SAMP(trips) as std_trips
                     FROM {SILVER_MITMA_TABLE}
                     WHERE {chunk_by} = {chunk_val}
-                    GROUP BY day_type, hour_period, origin_zone, destination_zone
+                    GROUP BY day_type, hour_period, origin_zone_key, destination_zone_key
                 ),
                 filtered AS (
                     SELECT s.*
@@ -120,21 +172,24 @@ def transform_gold_mitma_chunked(con, chunk_by='day_type'):
                     JOIN stats st 
                         ON s.day_type = st.day_type 
                         AND s.hour_period = st.hour_period 
-                        AND s.origin_zone = st.origin_zone 
-                        AND s.destination_zone = st.destination_zone
+                        AND s.origin_zone_key = st.origin_zone_key 
+                        AND s.destination_zone_key = st.destination_zone_key
                     WHERE s.{chunk_by} = {chunk_val}
                         AND (st.std_trips IS NULL OR st.std_trips = 0
                              OR (s.trips BETWEEN (st.avg_trips - 3 * st.std_trips) 
                                              AND (st.avg_trips + 3 * st.std_trips)))
+                ),
+                patterns AS (
+                    SELECT 
+                        day_type, hour_period, origin_zone_key, destination_zone_key,
+                        SUM(trips) as total_trips,
+                        AVG(trips) as avg_trips,
+                        COALESCE(STDDEV_SAMP(trips), 0) as std_trips,
+                        COUNT(DISTINCT date) as num_days_observed
+                    FROM filtered
+                    GROUP BY day_type, hour_period, origin_zone_key, destination_zone_key
                 )
-                SELECT 
-                    day_type, hour_period, origin_zone, destination_zone,
-                    SUM(trips) as total_trips,
-                    AVG(trips) as avg_trips,
-                    COALESCE(STDDEV_SAMP(trips), 0) as std_trips,
-                    COUNT(DISTINCT date) as num_days_observed
-                FROM filtered
-                GROUP BY day_type, hour_period, origin_zone, destination_zone;
+                {_with_zone_codes('patterns')};
             """
             
             con.execute(query)
@@ -158,17 +213,20 @@ def transform_gold_mitma_streaming(con):
     try:
         con.execute(f"""
             CREATE OR REPLACE TABLE {GOLD_MITMA_TABLE} AS
-            SELECT 
-                day_type,
-                hour_period,
-                origin_zone,
-                destination_zone,
-                SUM(trips) as total_trips,
-                AVG(trips) as avg_trips,
-                COALESCE(STDDEV_SAMP(trips), 0) as std_trips,
-                COUNT(DISTINCT date) as num_days_observed
-            FROM {SILVER_MITMA_TABLE}
-            GROUP BY day_type, hour_period, origin_zone, destination_zone;
+            WITH patterns AS (
+                SELECT 
+                    day_type,
+                    hour_period,
+                    origin_zone_key,
+                    destination_zone_key,
+                    SUM(trips) as total_trips,
+                    AVG(trips) as avg_trips,
+                    COALESCE(STDDEV_SAMP(trips), 0) as std_trips,
+                    COUNT(DISTINCT date) as num_days_observed
+                FROM {SILVER_MITMA_TABLE}
+                GROUP BY day_type, hour_period, origin_zone_key, destination_zone_key
+            )
+            {_with_zone_codes('patterns')};
         """)
         
         count = con.execute(f"SELECT COUNT(*) FROM {GOLD_MITMA_TABLE}").fetchone()[0]
@@ -176,4 +234,335 @@ def transform_gold_mitma_streaming(con):
         
     except Exception as e:
         print(f"❌ Direct transform failed: {e}")
-        raise e
\ No newline at end of file
+        raise e
+
+
+# --- Incremental gold ---------------------------------------------------------
+#
+# gold_trip_pattern_stats keeps, per (day_type, hour_period, origin, destination),
+# statistics that can be merged across dates: row count, sum, mean, M2 (sum of
+# squared deviations from the mean), min, max and days observed. A new silver
+# date is aggregated on its own and MERGEd in with Chan et al.'s parallel
+# update of mean and M2, so the daily refresh reads one day of silver and the
+# std does not suffer the cancellation of sum-of-squares formulas. Mean and
+# std are read off the stats (gold_trip_patterns_live). The outlier filter needs a second
+# pass over every silver row, so gold_typical_day_patterns is rebuilt in full
+# only periodically or when a folded date changed in silver; each full rebuild
+# also checks the incremental stats against the recomputed ones.
+
+
+def create_gold_stats_tables(con):
+    if catalog_cache(con).has_column(GOLD_STATS_TABLE, "sum_sq_trips"):
+        # Stats from the sum-of-squares layout: dropped and folded again from silver
+        print(f"🔁 {GOLD_STATS_TABLE}: moving to mean/M2 stats, every date is folded again")
+        con.execute(f"DROP VIEW IF EXISTS {GOLD_LIVE_VIEW}")
+        con.execute(f"DROP TABLE {GOLD_STATS_TABLE}")
+        con.execute(f"DROP TABLE IF EXISTS {GOLD_STATS_DATES_TABLE}")
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {GOLD_STATS_TABLE} (
+            day_type INTEGER,
+            hour_period INTEGER,
+            origin_zone_key INTEGER,
+            destination_zone_key INTEGER,
+            n_rows BIGINT,
+            sum_trips DOUBLE,
+            mean_trips DOUBLE,
+            m2_trips DOUBLE,
+            min_trips DOUBLE,
+            max_trips DOUBLE,
+            num_days_observed INTEGER
+        );
+    """)
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {GOLD_STATS_DATES_TABLE} (
+            date DATE,
+            silver_commit VARCHAR,
+            rows BIGINT,
+            folded_at TIMESTAMP
+        );
+    """)
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {GOLD_REFRESH_LOG_TABLE} (
+            mode VARCHAR,
+            dates INTEGER,
+            patterns BIGINT,
+            mismatched_patterns BIGINT,
+            seconds DOUBLE,
+            refreshed_at TIMESTAMP
+        );
+    """)
+    con.execute(f"""
+        CREATE VIEW IF NOT EXISTS {GOLD_LIVE_VIEW} AS
+        {_with_zone_codes(f"({_stats_moments_sql(GOLD_STATS_TABLE)})")}
+    """)
+
+
+def gold_stats_sql(where: str = "TRUE") -> str:
+    """Mergeable statistics per pattern of the silver rows matching `where`."""
+    return f"""
+        SELECT
+            {PATTERN_KEYS},
+            COUNT(*) AS n_rows,
+            SUM(trips) AS sum_trips,
+            AVG(trips) AS mean_trips,
+            VAR_POP(trips) * COUNT(*) AS m2_trips,
+            MIN(trips) AS min_trips,
+            MAX(trips) AS max_trips,
+            COUNT(DISTINCT date) AS num_days_observed
+        FROM {SILVER_MITMA_TABLE}
+        WHERE {where}
+        GROUP BY {PATTERN_KEYS}
+    """
+
+
+def _stats_moments_sql(stats: str) -> str:
+    """Gold-shaped patterns (total/avg/std) from a relation of mergeable stats."""
+    return f"""
+        SELECT
+            {PATTERN_KEYS},
+            sum_trips AS total_trips,
+            mean_trips AS avg_trips,
+            -- sample std; NULL for a single row, like STDDEV_SAMP
+            CASE WHEN n_rows > 1 THEN sqrt(GREATEST(m2_trips / (n_rows - 1), 0)) END AS std_trips,
+            num_days_observed
+        FROM {stats}
+    """
+
+
+def _day_list(days: list) -> str:
+    return ", ".join(f"DATE '{d.isoformat()}'" for d in days)
+
+
+def pending_gold_dates(con) -> tuple:
+    """
+    (new, changed) silver dates for the incremental gold, from the ingestion
+    manifest: new dates are in silver but not folded yet; changed dates were
+    folded but silver has been rewritten since (different silver commit).
+    """
+    if not table_exists(con, MANIFEST_TABLE):
+        return [], []
+    rows = con.execute(f"""
+        SELECT CAST(strptime(m.source_date, '%Y%m%d') AS DATE) AS date,
+               f.date IS NOT NULL AS folded
+        FROM {MANIFEST_TABLE} m
+        LEFT JOIN {GOLD_STATS_DATES_TABLE} f ON f.date = CAST(strptime(m.source_date, '%Y%m%d') AS DATE)
+        WHERE m.silver_commit IS NOT NULL
+          AND (f.date IS NULL OR f.silver_commit IS DISTINCT FROM m.silver_commit)
+        ORDER BY 1
+    """).fetchall()
+    return [d for d, folded in rows if not folded], [d for d, folded in rows if folded]
+
+
+def _record_folded_dates(con, where: str):
+    # The silver commit of each date tells later refreshes whether it was rewritten
+    if table_exists(con, MANIFEST_TABLE):
+        commit_sql = f"(SELECT m.silver_commit FROM {MANIFEST_TABLE} m WHERE m.source_date = strftime(s.date, '%Y%m%d'))"
+    else:
+        commit_sql = "NULL"
+    con.execute(f"""
+        INSERT INTO {GOLD_STATS_DATES_TABLE}
+        SELECT s.date, {commit_sql}, s.rows, CURRENT_TIMESTAMP
+        FROM (SELECT date, COUNT(*) AS rows FROM {SILVER_MITMA_TABLE} WHERE {where} GROUP BY date) s
+    """)
+
+
+def fold_gold_dates(con, days: list) -> int:
+    """
+    Aggregates the silver rows of `days` (dates not folded yet) and merges
+    them into gold_trip_pattern_stats. Returns the patterns touched.
+    """
+    if not days:
+        return 0
+    where = f"date IN ({_day_list(days)})"
+    touched = con.execute(f"""
+        MERGE INTO {GOLD_STATS_TABLE} AS g
+        USING ({gold_stats_sql(where)}) AS d
+        ON g.day_type = d.day_type
+           AND g.hour_period = d.hour_period
+           AND g.origin_zone_key = d.origin_zone_key
+           AND g.destination_zone_key = d.destination_zone_key
+        -- Chan et al.: every SET reads the old g values
+        WHEN MATCHED THEN UPDATE SET
+            n_rows = g.n_rows + d.n_rows,
+            sum_trips = g.sum_trips + d.sum_trips,
+            mean_trips = g.mean_trips + (d.mean_trips - g.mean_trips) * d.n_rows / (g.n_rows + d.n_rows),
+            m2_trips = g.m2_trips + d.m2_trips
+                + (d.mean_trips - g.mean_trips) * (d.mean_trips - g.mean_trips)
+                  * g.n_rows * d.n_rows / (g.n_rows + d.n_rows),
+            min_trips = LEAST(g.min_trips, d.min_trips),
+            max_trips = GREATEST(g.max_trips, d.max_trips),
+            -- folded dates are disjoint, so days observed add up
+            num_days_observed = g.num_days_observed + d.num_days_observed
+        WHEN NOT MATCHED THEN INSERT VALUES (
+            d.day_type, d.hour_period, d.origin_zone_key, d.destination_zone_key,
+            d.n_rows, d.sum_trips, d.mean_trips, d.m2_trips, d.min_trips, d.max_trips, d.num_days_observed
+        )
+    """).fetchone()[0]
+    _record_folded_dates(con, where)
+    print(f"➕ Gold stats: folded {len(days)} new dates ({touched} patterns touched)")
+    return touched
+
+
+def _pattern_join(left: str, right: str) -> str:
+    return " AND ".join(f"{left}.{key} = {right}.{key}" for key in PATTERN_KEYS.split(", "))
+
+
+def _merge_stats_sql(a: str, b: str) -> str:
+    """Mergeable stats of the union of two disjoint sets of dates (Chan et al. for mean/M2)."""
+    keys = ", ".join(f"COALESCE(a.{key}, b.{key}) AS {key}" for key in PATTERN_KEYS.split(", "))
+    n = "(COALESCE(a.n_rows, 0) + COALESCE(b.n_rows, 0))"
+    delta = "(b.mean_trips - a.mean_trips)"
+    return f"""
+        SELECT
+            {keys},
+            {n} AS n_rows,
+            COALESCE(a.sum_trips, 0) + COALESCE(b.sum_trips, 0) AS sum_trips,
+            CASE WHEN a.n_rows IS NULL THEN b.mean_trips WHEN b.n_rows IS NULL THEN a.mean_trips
+                 ELSE a.mean_trips + {delta} * b.n_rows / {n} END AS mean_trips,
+            CASE WHEN a.n_rows IS NULL THEN b.m2_trips WHEN b.n_rows IS NULL THEN a.m2_trips
+                 ELSE a.m2_trips + b.m2_trips + {delta} * {delta} * a.n_rows * b.n_rows / {n} END AS m2_trips,
+            LEAST(a.min_trips, b.min_trips) AS min_trips,
+            GREATEST(a.max_trips, b.max_trips) AS max_trips,
+            COALESCE(a.num_days_observed, 0) + COALESCE(b.num_days_observed, 0) AS num_days_observed
+        FROM {a} a
+        FULL OUTER JOIN {b} b ON {_pattern_join('a', 'b')}
+    """
+
+
+def check_gold_consistency(con, full_stats: str, stale_rows: int = 0, rel_tolerance: float = 1e-9,
+                           moment_tolerance: float = 1e-6) -> int:
+    """
+    Compares the incremental gold_trip_pattern_stats with stats recomputed
+    from silver (relation full_stats). Returns the patterns that differ
+    (missing on either side, counts, sums, moments or min/max).
+    M2 gets the looser moment_tolerance: merged and one-pass M2 round differently.
+
+    When folded dates were rewritten in silver since, full_stats must leave
+    them out and stale_rows is the number of rows they had when folded: the
+    patterns holding more rows than full_stats carry that stale contribution
+    and are only checked to add up to exactly stale_rows.
+    """
+    differs = f"""
+        g.n_rows IS NULL OR f.n_rows IS NULL
+        OR g.n_rows <> f.n_rows
+        OR g.num_days_observed <> f.num_days_observed
+        OR abs(g.sum_trips - f.sum_trips) > {rel_tolerance} * GREATEST(abs(f.sum_trips), 1)
+        OR abs(g.mean_trips - f.mean_trips) > {rel_tolerance} * GREATEST(abs(f.mean_trips), 1)
+        OR abs(g.m2_trips - f.m2_trips) > {moment_tolerance} * GREATEST(abs(f.m2_trips), 1)
+        OR g.min_trips <> f.min_trips
+        OR g.max_trips <> f.max_trips
+    """
+    stale = "COALESCE(g.n_rows, 0) > COALESCE(f.n_rows, 0)"
+    mismatched, stale_patterns, extra_rows = con.execute(f"""
+        SELECT
+            COUNT(*) FILTER (WHERE NOT ({stale}) AND ({differs})),
+            COUNT(*) FILTER (WHERE {stale}),
+            COALESCE(SUM(g.n_rows - COALESCE(f.n_rows, 0)) FILTER (WHERE {stale}), 0)
+        FROM {GOLD_STATS_TABLE} g
+        FULL OUTER JOIN {full_stats} f ON {_pattern_join('g', 'f')}
+    """).fetchone()
+    if extra_rows != stale_rows:
+        print(f"⚠️ Gold consistency: {extra_rows} extra folded rows in {stale_patterns} patterns, "
+              f"expected {stale_rows} from rewritten dates")
+        mismatched += stale_patterns
+    elif stale_rows:
+        print(f"🔁 Gold consistency: {stale_patterns} patterns held the {stale_rows} stale rows of rewritten dates")
+    if mismatched:
+        print(f"⚠️ Gold consistency: {mismatched} patterns differ between incremental and full stats")
+    else:
+        print("✅ Gold consistency: incremental stats match the full recomputation")
+    return mismatched
+
+
+def rebuild_gold_mitma(con, changed_days: list = None) -> int:
+    """
+    Full rebuild: recomputes the mergeable stats from all of silver, checks
+    the incremental ones against them, replaces them (and the folded dates),
+    and rebuilds the outlier-filtered gold_typical_day_patterns from them, so
+    silver is read twice instead of three times. The recomputed mean/M2 come
+    from AVG/VAR_POP, so the filter uses the same mean and std as STDDEV_SAMP
+    over silver. changed_days are folded dates rewritten in silver since:
+    their stats are computed apart, so the check compares the other dates
+    (see check_gold_consistency). Returns the mismatched patterns.
+    """
+    con.execute("DROP TABLE IF EXISTS _gold_full_stats")
+    if changed_days:
+        changed = f"date IN ({_day_list(changed_days)})"
+        stale_rows = con.execute(
+            f"SELECT COALESCE(SUM(rows), 0) FROM {GOLD_STATS_DATES_TABLE} WHERE {changed}"
+        ).fetchone()[0]
+        con.execute(f"CREATE TEMP TABLE _gold_kept_stats AS {gold_stats_sql(f'NOT ({changed})')}")
+        mismatched = check_gold_consistency(con, "_gold_kept_stats", stale_rows=stale_rows)
+        con.execute(f"""
+            CREATE TEMP TABLE _gold_full_stats AS
+            {_merge_stats_sql("_gold_kept_stats", f"({gold_stats_sql(changed)})")}
+        """)
+        con.execute("DROP TABLE _gold_kept_stats")
+    else:
+        con.execute(f"CREATE TEMP TABLE _gold_full_stats AS {gold_stats_sql()}")
+        mismatched = check_gold_consistency(con, "_gold_full_stats")
+
+    con.execute(f"DELETE FROM {GOLD_STATS_TABLE}")
+    con.execute(f"INSERT INTO {GOLD_STATS_TABLE} SELECT * FROM _gold_full_stats")
+    con.execute(f"DELETE FROM {GOLD_STATS_DATES_TABLE}")
+    _record_folded_dates(con, "TRUE")
+
+    transform_gold_mitma(con, stats_table="_gold_full_stats")
+    con.execute("DROP TABLE _gold_full_stats")
+    return mismatched
+
+
+def _full_rebuild_due(con, every_days: int) -> bool:
+    last = con.execute(f"""
+        SELECT MAX(refreshed_at) FROM {GOLD_REFRESH_LOG_TABLE} WHERE mode = 'full'
+    """).fetchone()[0]
+    if last is None:
+        return True
+    return con.execute(
+        f"SELECT ? < CURRENT_TIMESTAMP - INTERVAL '{int(every_days)} days'", [last]
+    ).fetchone()[0]
+
+
+def refresh_gold_mitma(con, mode: str = "auto", full_rebuild_days: int = None) -> str:
+    """
+    Refreshes gold. Modes:
+      incremental  fold the new silver dates into the stats (live view only)
+      full         rebuild stats and the outlier-filtered gold from all of silver
+      auto         incremental, plus a full rebuild when the last one is older
+                   than full_rebuild_days
+    In every mode, folded dates rewritten in silver since trigger a full
+    rebuild: their old contribution cannot be taken out of the stats.
+    Returns the mode that ran.
+    """
+    if mode not in ("auto", "incremental", "full"):
+        raise ValueError(f"Unknown gold refresh mode '{mode}'. Valid options: auto, incremental, full")
+    if full_rebuild_days is None:
+        full_rebuild_days = int(os.environ.get("GOLD_FULL_REBUILD_DAYS", DEFAULT_FULL_REBUILD_DAYS))
+    create_gold_stats_tables(con)
+    start = time.perf_counter()
+
+    new_days, changed_days = pending_gold_dates(con)
+    if changed_days and mode != "full":
+        print(f"🔁 {len(changed_days)} folded dates were rewritten in silver: full rebuild")
+        mode = "full"
+    elif mode == "auto":
+        mode = "full" if _full_rebuild_due(con, full_rebuild_days) else "incremental"
+
+    if mode == "full":
+        # Fold first, so the consistency check compares the same dates
+        fold_gold_dates(con, new_days)
+        mismatched = rebuild_gold_mitma(con, changed_days)
+        dates = con.execute(f"SELECT COUNT(*) FROM {GOLD_STATS_DATES_TABLE}").fetchone()[0]
+    else:
+        fold_gold_dates(con, new_days)
+        mismatched, dates = None, len(new_days)
+
+    patterns = con.execute(f"SELECT COUNT(*) FROM {GOLD_STATS_TABLE}").fetchone()[0]
+    seconds = time.perf_counter() - start
+    con.execute(
+        f"INSERT INTO {GOLD_REFRESH_LOG_TABLE} VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
+        [mode, dates, patterns, mismatched, seconds],
+    )
+    print(f"✅ Gold refresh ({mode}): {dates} dates, {patterns} patterns in {seconds:.1f}s")
+    return mode
+
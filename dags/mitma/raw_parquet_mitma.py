@@ -0,0 +1,212 @@
+"""
+Raw Parquet area for MITMA daily files.
+
+DuckDB decompresses a .csv.gz on a single thread, so bronze ingestion of a
+batch is capped by gzip no matter how many threads the session has. This stage
+converts landed daily files into zstd Parquet once, one file per process, and
+bronze (and re-ingests/backfills) then read the Parquet copies, which DuckDB
+scans in parallel:
+
+- each worker process runs its own DuckDB with one thread and a share of the
+  task memory; COPY streams the CSV into row groups so memory stays bounded
+- columns keep the MITMA names with the bronze types (bronze_mitma.CSV_TYPES)
+- rows that fail casting go to a .rejects.parquet sidecar, which bronze moves
+  into the quarantine table
+- copies live under MITMA_RAW_DIR, a local directory or an s3:// prefix
+- each copy records the ETag/Last-Modified/size of the file it came from in
+  its Parquet key-value metadata; a copy of an older version of a
+  republished file counts as not converted
+
+Environment variables:
+    MITMA_RAW_DIR        raw area root (default $AIRFLOW_HOME/data/raw/mitma)
+    MITMA_RAW_WORKERS    conversion processes (default: CPUs available to the task)
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+from mitma.bronze_mitma import rejects_path, rejects_select_sql, typed_csv_reader
+from mitma.landing_mitma import SOURCE_KEYS, bronze_source, ensure_landed, landed_metadata, same_source
+from resource_profile import available_cpus, task_memory_bytes
+
+
+def raw_dir() -> str:
+    default_dir = os.path.join(os.environ.get("AIRFLOW_HOME", "."), "data", "raw", "mitma")
+    root = os.environ.get("MITMA_RAW_DIR", default_dir).rstrip("/")
+    return root if _is_remote(root) else os.path.abspath(root)
+
+
+def _is_remote(path: str) -> bool:
+    return path.startswith("s3://")
+
+
+def raw_parquet_path(url: str) -> str:
+    """Parquet copy of a MITMA URL, keeping the YYYY-MM folder of the source."""
+    parts = urlparse(url).path.rstrip("/").split("/")
+    name = parts[-1].removesuffix(".gz").removesuffix(".csv")
+    return f"{raw_dir()}/{parts[-2]}/{name}.parquet"
+
+
+def _connect(threads: int = 1, memory_limit: int = None):
+    import duckdb
+
+    from ducklake_utils import _connection_config, configure_s3, ensure_extensions
+
+    con = duckdb.connect(config=_connection_config())
+    con.execute(f"SET threads={threads}")
+    con.execute("SET preserve_insertion_order=false")
+    if memory_limit:
+        con.execute(f"SET memory_limit='{memory_limit // 1024 ** 2}MB'")
+    if _is_remote(raw_dir()):
+        ensure_extensions(con, "httpfs")
+        configure_s3(con)
+    return con
+
+
+def _kv_metadata_sql(source: dict) -> str:
+    values = ", ".join(
+        f"mitma_{key}: '{str(source[key]).replace(chr(39), chr(39) * 2)}'"
+        for key in SOURCE_KEYS if (source or {}).get(key) is not None
+    )
+    return f", KV_METADATA {{{values}}}" if values else ""
+
+
+def _raw_source_metadata(con, paths: list) -> dict:
+    """{path: source metadata recorded in its Parquet key-value metadata}."""
+    recorded = {path: {} for path in paths}
+    rows = con.execute(f"""
+        SELECT file_name, decode(key), decode(value)
+        FROM parquet_kv_metadata([{', '.join(repr(p) for p in paths)}])
+        WHERE starts_with(decode(key), 'mitma_')
+    """).fetchall()
+    for path, key, value in rows:
+        recorded.setdefault(path, {})[key.removeprefix("mitma_")] = value
+    return recorded
+
+
+def existing_raw_parquet(urls: list, sources: dict = None) -> set:
+    """
+    URLs that already have a Parquet copy (one listing of the raw area). A
+    data file without its rejects sidecar is a conversion still being
+    written and does not count. With `sources` (current source metadata by URL), copies made from an
+    older version of the file are left out.
+    """
+    if not urls:
+        return set()
+    sources = sources or {}
+    remote = _is_remote(raw_dir())
+    con = _connect() if remote or sources else None
+    try:
+        if not remote:
+            found = {url for url in urls
+                     if os.path.exists(raw_parquet_path(url)) and os.path.exists(rejects_path(raw_parquet_path(url)))}
+        else:
+            files = {row[0] for row in con.execute("SELECT file FROM glob(?)", [f"{raw_dir()}/*/*.parquet"]).fetchall()}
+            found = {url for url in urls
+                     if raw_parquet_path(url) in files and rejects_path(raw_parquet_path(url)) in files}
+        to_check = [url for url in found if sources.get(url)]
+        if to_check:
+            recorded = _raw_source_metadata(con, [raw_parquet_path(url) for url in to_check])
+            for url in to_check:
+                if not same_source(recorded.get(raw_parquet_path(url)), sources[url]):
+                    print(f"♻️ Raw Parquet copy of {url} is from an older version of the file")
+                    found.discard(url)
+    finally:
+        if con is not None:
+            con.close()
+    return found
+
+
+def convert_to_parquet(url: str, source: str, memory_limit: int = None, source_meta: dict = None) -> dict:
+    """
+    Converts one daily file (landed .csv.gz) into its raw Parquet copy,
+    recording source_meta (the landed file's ETag/size) in it.
+    Runs inside a worker process. Local copies are written to a temporary
+    file and renamed once the rejects sidecar exists; on s3 the sidecar comes
+    after the data file, so existing_raw_parquet() needs both.
+    """
+    start = time.perf_counter()
+    target = raw_parquet_path(url)
+    remote = _is_remote(target)
+    if not remote:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+    data_path = target if remote else f"{target}.{os.getpid()}.tmp"
+
+    con = _connect(threads=1, memory_limit=memory_limit)
+    try:
+        con.execute(f"""
+            COPY (SELECT * FROM {typed_csv_reader([source])})
+            TO '{data_path}' (FORMAT parquet, COMPRESSION zstd{_kv_metadata_sql(source_meta)})
+        """)
+        rejects = con.execute(f"SELECT COUNT(*) FROM ({rejects_select_sql()})").fetchone()[0]
+        con.execute(f"""
+            COPY (SELECT * REPLACE ('{url}' AS source_file) FROM ({rejects_select_sql()}))
+            TO '{rejects_path(target)}' (FORMAT parquet, COMPRESSION zstd)
+        """)
+        rows = con.execute(f"SELECT COUNT(*) FROM read_parquet('{data_path}')").fetchone()[0]
+    finally:
+        con.close()
+    if not remote:
+        os.replace(data_path, target)
+    return {"url": url, "path": target, "rows": rows, "rejects": rejects,
+            "seconds": round(time.perf_counter() - start, 2)}
+
+
+def recompress_landing(urls: list, max_workers: int = None, sources: dict = None) -> list:
+    """
+    Converts the landed files of urls that have no (current) Parquet copy yet,
+    one process per file. `sources` maps URLs to their current metadata.
+    Returns the URLs that have a Parquet copy afterwards.
+    """
+    sources = sources or {}
+    done = existing_raw_parquet(urls, sources)
+    todo = [url for url in urls if url not in done]
+    if not todo:
+        print(f"🧊 Raw Parquet: all {len(urls)} files already converted")
+        return sorted(done)
+
+    if max_workers is None:
+        max_workers = int(os.environ.get("MITMA_RAW_WORKERS", "0")) or available_cpus()
+    max_workers = max(1, min(max_workers, len(todo)))
+    memory_limit = task_memory_bytes() // max_workers
+
+    start = time.perf_counter()
+    converted = []
+    # spawn: the Airflow task process may hold DuckDB/threads that must not be forked
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+        futures = {}
+        for url in todo:
+            try:
+                source = ensure_landed(url, sources.get(url))
+            except Exception as e:
+                print(f"⚠️ Could not land {url} ({e}); bronze will read it over HTTP")
+                continue
+            futures[executor.submit(convert_to_parquet, url, source, memory_limit, landed_metadata(url))] = url
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"⚠️ Parquet conversion failed for {url}: {e}")
+                continue
+            converted.append(url)
+            print(f"🧊 {os.path.basename(result['path'])}: {result['rows']} rows, "
+                  f"{result['rejects']} rejected, {result['seconds']}s")
+
+    print(f"🧊 Raw Parquet: converted {len(converted)}/{len(todo)} files with {max_workers} processes "
+          f"in {time.perf_counter() - start:.1f}s")
+    return sorted(done | set(converted))
+
+
+def raw_sources(urls: list, sources: dict = None) -> dict:
+    """
+    Where bronze reads each URL from: its (current) Parquet copy, else the
+    landed CSV, else the URL.
+    """
+    sources = sources or {}
+    parquet = existing_raw_parquet(urls, sources)
+    return {url: raw_parquet_path(url) if url in parquet else bronze_source(url, sources.get(url))
+            for url in urls}
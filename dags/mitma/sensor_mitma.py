@@ -0,0 +1,87 @@
+"""
+Deferrable wait for the MITMA daily file of a date.
+
+MitmaFileSensor checks the availability cache/HEAD once on the worker; if the
+file is not published yet it defers to MitmaFileTrigger, which polls from the
+triggerer with the async probe of fetch_url_mitma, so no worker slot is held
+while waiting. The task resumes (and the ingestion downstream runs) only when
+the file appears.
+"""
+import asyncio
+from datetime import date, datetime, timedelta
+
+from airflow.sdk import BaseSensorOperator
+from airflow.triggers.base import BaseTrigger, TriggerEvent
+
+from mitma.fetch_url_mitma import mitma_url, probe_mitma_urls_async, remember_available, resolve_availability
+
+DEFAULT_POLL_INTERVAL = 30 * 60
+DEFAULT_TIMEOUT = 2 * 24 * 3600
+
+
+class MitmaFileTrigger(BaseTrigger):
+    """Fires once url answers 200 to a HEAD request; runs in the triggerer."""
+
+    def __init__(self, url: str, poll_interval: float = DEFAULT_POLL_INTERVAL):
+        super().__init__()
+        self.url = url
+        self.poll_interval = poll_interval
+
+    def serialize(self):
+        return (
+            "mitma.sensor_mitma.MitmaFileTrigger",
+            {"url": self.url, "poll_interval": self.poll_interval},
+        )
+
+    async def run(self):
+        while True:
+            source = (await probe_mitma_urls_async([self.url]))[self.url]
+            if source:
+                await asyncio.to_thread(remember_available, source)
+                yield TriggerEvent({"status": "available", "source": source})
+                return
+            self.log.info("%s not published yet, checking again in %ss", self.url, self.poll_interval)
+            await asyncio.sleep(self.poll_interval)
+
+
+class MitmaFileSensor(BaseSensorOperator):
+    """
+    Waits for the MITMA daily file of target_date (templated, YYYY-MM-DD).
+    An empty target_date succeeds immediately (manual runs do not wait).
+    Returns the file's source metadata (see fetch_url_mitma.probe_mitma_url).
+    """
+
+    template_fields = ("target_date",)
+
+    def __init__(self, target_date: str = "{{ ds }}", deferrable: bool = True,
+                 poke_interval: float = DEFAULT_POLL_INTERVAL, timeout: float = DEFAULT_TIMEOUT, **kwargs):
+        super().__init__(poke_interval=poke_interval, timeout=timeout, **kwargs)
+        self.target_date = target_date
+        self.deferrable = deferrable
+
+    def _day(self) -> date:
+        return datetime.strptime(self.target_date, "%Y-%m-%d").date()
+
+    def poke(self, context) -> bool:
+        return bool(resolve_availability([self._day()], refresh=True).get(self._day()))
+
+    def execute(self, context):
+        if not self.target_date:
+            self.log.info("No target date (manual run): not waiting for MITMA files")
+            return None
+        day = self._day()
+        source = resolve_availability([day]).get(day)
+        if source:
+            return source
+        if not self.deferrable:
+            super().execute(context)
+            return resolve_availability([day]).get(day)
+        self.defer(
+            trigger=MitmaFileTrigger(mitma_url(day), poll_interval=self.poke_interval),
+            method_name="execute_complete",
+            timeout=timedelta(seconds=self.timeout),
+        )
+
+    def execute_complete(self, context, event=None):
+        self.log.info("MITMA file for %s is available", self.target_date)
+        return event["source"]
@@ -1,10 +1,23 @@
-from ducklake_utils import connect_ducklake, close_ducklake, extract_date_from_url, BRONZE_MITMA_TABLE,SILVER_MITMA_TABLE,GOLD_MITMA_TABLE
-import re
-import datetime
-import pandas as pd
-import holidays
+from ducklake_utils import extract_date_from_url, ensure_date_partitioning, ensure_sort_order, ducklake_transaction, replace_partition, table_exists, BRONZE_MITMA_TABLE,SILVER_MITMA_TABLE,DIM_DATE_TABLE,DIM_ZONE_TABLE
+from catalog_cache import catalog_cache
+from mitma.manifest_mitma import manifest_entries, record_silver, tag_commit
+from mitma.zones_mitma import create_dim_zone_table, register_zones, zone_id_sql, zone_key_sql
+import os
+
+# Write order of silver rows inside each date partition, so the Parquet min/max
+# statistics of these columns let selective queries skip row groups.
+# Override with SILVER_SORT_KEYS (comma-separated silver columns).
+DEFAULT_SILVER_SORT_KEYS = "origin_zone, hour_period"
+SILVER_COLUMNS = (
+    "date", "hour_period", "origin_zone", "destination_zone", "trips", "day_type",
+    "origin_zone_key", "destination_zone_key",
+)
+# One value per date partition: as sort keys they do not reorder anything
+PARTITION_CONSTANT_COLUMNS = ("date", "day_type")
 
 def ingest_spain_holidays(con,year=2023):
+    import holidays
+    import pandas as pd
 
     # 1. Create the table structure if it doesn't exist yet
     con.execute("""
@@ -51,36 +64,79 @@ def ingest_spain_holidays(con,year=2023):
     con.unregister("df_holidays")
     print(f"Successfully inserted {len(df)} holidays for {year}.")
 
-def get_day_type(con, date_obj):
+
+def create_dim_date_table(con):
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {DIM_DATE_TABLE} (
+            date DATE,
+            weekday SMALLINT,
+            is_holiday BOOLEAN,
+            day_type INTEGER,
+            month SMALLINT,
+            season VARCHAR
+        );
+    """)
+
+
+def build_dim_date(con, year: int):
     """
-    Calculates the day_type logic once for the specific date.
-    Returns an Integer.
+    (Re)builds the dim_date rows of a whole year in one statement from
+    ref_holidays. weekday follows DuckDB's dayofweek (0 = Sunday); day_type is
+    8 for holidays, else 0 Sunday, 1 Monday, 2 Tuesday-Thursday, 5 Friday and
+    6 Saturday; seasons are meteorological.
     """
-    target_date_str = date_obj.strftime('%Y-%m-%d')
-    
-    # 1. Check if it is a Holiday in the DB
-    is_holiday = con.execute(
-        f"SELECT count(*) FROM ref_holidays WHERE date = '{target_date_str}'"
-    ).fetchone()[0] > 0
-    
-    if is_holiday:
-        return 8  # Holiday Type
-    
-    # 2. If not holiday, check weekday
-    wd = date_obj.weekday()
-    
-    if wd == 6: # Sunday
-        return 0
-    elif wd == 0: # Monday
-        return 1
-    elif wd in [1, 2, 3]: # Tue, Wed, Thu
-        return 2
-    elif wd == 4: # Friday
-        return 5
-    elif wd == 5: # Saturday
-        return 6
-    
-    return -1 # Should not happen
+    create_dim_date_table(con)
+    con.execute(f"DELETE FROM {DIM_DATE_TABLE} WHERE year(date) = {int(year)}")
+    con.execute(f"""
+        INSERT INTO {DIM_DATE_TABLE}
+        WITH days AS (
+            SELECT CAST(d AS DATE) AS date
+            FROM generate_series(DATE '{int(year)}-01-01', DATE '{int(year)}-12-31', INTERVAL 1 DAY) AS t(d)
+        ),
+        holidays AS (
+            SELECT DISTINCT date FROM ref_holidays WHERE year(date) = {int(year)}
+        )
+        SELECT
+            days.date,
+            dayofweek(days.date) AS weekday,
+            holidays.date IS NOT NULL AS is_holiday,
+            CASE
+                WHEN holidays.date IS NOT NULL THEN 8
+                WHEN dayofweek(days.date) = 0 THEN 0
+                WHEN dayofweek(days.date) = 1 THEN 1
+                WHEN dayofweek(days.date) IN (2, 3, 4) THEN 2
+                WHEN dayofweek(days.date) = 5 THEN 5
+                ELSE 6
+            END AS day_type,
+            month(days.date) AS month,
+            CASE
+                WHEN month(days.date) IN (12, 1, 2) THEN 'winter'
+                WHEN month(days.date) IN (3, 4, 5) THEN 'spring'
+                WHEN month(days.date) IN (6, 7, 8) THEN 'summer'
+                ELSE 'autumn'
+            END AS season
+        FROM days
+        LEFT JOIN holidays ON holidays.date = days.date
+    """)
+    print(f"📅 dim_date built for {year}")
+
+
+def ensure_dim_date(con, days: list):
+    """Makes sure dim_date (and ref_holidays) cover the years of `days`."""
+    years = sorted({d.year for d in days})
+    covered = set()
+    if table_exists(con, DIM_DATE_TABLE):
+        covered = {
+            row[0] for row in con.execute(
+                f"SELECT DISTINCT year(date) FROM {DIM_DATE_TABLE} WHERE year(date) IN ({', '.join(str(y) for y in years)})"
+            ).fetchall()
+        }
+    for year in years:
+        if year not in covered:
+            ingest_spain_holidays(con, year)
+            build_dim_date(con, year)
+
+
 def create_silver_mitma_table(con):
     con.execute(f"""
             CREATE TABLE IF NOT EXISTS {SILVER_MITMA_TABLE} (
@@ -89,72 +145,255 @@ def create_silver_mitma_table(con):
                 origin_zone VARCHAR,
                 destination_zone VARCHAR,
                 trips DOUBLE,
-                day_type INTEGER
+                day_type INTEGER,
+                origin_zone_key INTEGER,
+                destination_zone_key INTEGER
             );
         """)
-def transform_mitma_silver(con,url:str):
-    try:    
-        date_obj = extract_date_from_url(url)            
-        if not date_obj:
-            print(f"⚠️ Could not extract date from {url}. Skipping.")
-            return
+    create_dim_zone_table(con)
+    if not catalog_cache(con).has_column(SILVER_MITMA_TABLE, "origin_zone_key"):
+        migrate_silver_zone_keys(con)
+    elif con.execute(
+        f"SELECT COUNT(*) FROM {DIM_ZONE_TABLE} WHERE zone_key IS DISTINCT FROM TRY_CAST(zone_id AS INTEGER)"
+    ).fetchone()[0]:
+        # dim_zone from before the zone-code keys
+        migrate_silver_zone_keys(con, renumber=True)
+    ensure_date_partitioning(con, SILVER_MITMA_TABLE)
+    ensure_sort_order(con, SILVER_MITMA_TABLE, silver_sort_keys())
 
-        target_date = date_obj.strftime('%Y-%m-%d')
-
-        target_date_raw = date_obj.strftime('%Y%m%d')
-        target_date_iso = date_obj.strftime('%Y-%m-%d')
-        day_type_constant = get_day_type(con, date_obj)
-        print(f"Date {target_date} determined as day_type: {day_type_constant}")
-        con.execute(f"DELETE FROM {SILVER_MITMA_TABLE} WHERE date = '{target_date_iso}'")                
-        
-        check_count = con.execute(f"""
-            SELECT COUNT(*) FROM {BRONZE_MITMA_TABLE} 
-            WHERE CAST(date AS VARCHAR) = '{target_date_raw}'
-        """).fetchone()[0]
-        
-        if check_count == 0:
-            print(f"⚠️ WARNING: No rows found in Bronze for raw date '{target_date_raw}'. Skipping Insert.")
-            return
-        print(f"Found {check_count} rows in Bronze. Proceeding with transformation...")
+
+def silver_sort_keys() -> str:
+    """
+    Configured silver sort keys (SILVER_SORT_KEYS), validated against the
+    silver columns. Columns constant within a date partition are dropped.
+    """
+    keys = [key.strip() for key in os.environ.get("SILVER_SORT_KEYS", DEFAULT_SILVER_SORT_KEYS).split(",")]
+    unknown = [key for key in keys if key not in SILVER_COLUMNS]
+    constant = [key for key in keys if key in PARTITION_CONSTANT_COLUMNS]
+    keys = [key for key in keys if key not in PARTITION_CONSTANT_COLUMNS]
+    if unknown or not keys:
+        valid = [column for column in SILVER_COLUMNS if column not in PARTITION_CONSTANT_COLUMNS]
+        raise ValueError(f"Invalid SILVER_SORT_KEYS {unknown or constant}. Valid columns: {', '.join(valid)}")
+    if constant:
+        print(f"⚠️ SILVER_SORT_KEYS: {', '.join(constant)} has one value per date partition, ignored")
+    return ", ".join(keys)
+
+
+def recluster_silver(con, days: list) -> int:
+    """
+    Rewrites the silver partitions of `days` sorted by the silver sort keys,
+    one date (one transaction) at a time. For dates written before the sort
+    keys were set, or compacted by a DuckLake without SET SORTED BY.
+    Returns the rows rewritten.
+    """
+    keys = silver_sort_keys()
+    rewritten = 0
+    for day in sorted(days):
+        con.execute("DROP TABLE IF EXISTS _silver_recluster")
+        con.execute(f"CREATE TEMP TABLE _silver_recluster AS SELECT * FROM {SILVER_MITMA_TABLE} WHERE date = ?", [day])
+        rewritten += replace_partition(con, SILVER_MITMA_TABLE, day, "SELECT * FROM _silver_recluster", order_by=keys)
+        con.execute("DROP TABLE _silver_recluster")
+    print(f"🧮 Silver reclustered by ({keys}) for {len(days)} dates ({rewritten} rows)")
+    return rewritten
+
+
+def migrate_silver_zone_keys(con, renumber: bool = False, drop_unkeyed: bool = False):
+    """
+    One-off: adds the dim_zone keys to a silver table created before them and
+    fills them in for the existing rows. renumber=True moves a dim_zone with
+    sequential keys to the zone-code keys (see zones_mitma) and clears the
+    incremental gold stats, so the next gold refresh folds every date again.
+    dim_zone rows whose code does not cast keep their row with a NULL key;
+    drop_unkeyed=True deletes them instead.
+    """
+    from mitma.new_gold import GOLD_STATS_DATES_TABLE, GOLD_STATS_TABLE
+
+    print("🔁 Adding zone keys to silver_mobility_trips...")
+    with ducklake_transaction(con, label="silver zone keys migration"):
+        if renumber:
+            unkeyed = con.execute(
+                f"SELECT COUNT(*) FROM {DIM_ZONE_TABLE} WHERE TRY_CAST(zone_id AS INTEGER) IS NULL"
+            ).fetchone()[0]
+            if unkeyed and drop_unkeyed:
+                con.execute(f"DELETE FROM {DIM_ZONE_TABLE} WHERE TRY_CAST(zone_id AS INTEGER) IS NULL")
+                print(f"🗑️ dim_zone: {unkeyed} zones without a numeric code deleted")
+            elif unkeyed:
+                print(f"⚠️ dim_zone: {unkeyed} zones without a numeric code keep a NULL zone_key")
+            con.execute(f"UPDATE {DIM_ZONE_TABLE} SET zone_key = TRY_CAST(zone_id AS INTEGER)")
+            for table in (GOLD_STATS_TABLE, GOLD_STATS_DATES_TABLE):
+                if table_exists(con, table):
+                    con.execute(f"DELETE FROM {table}")
+        else:
+            con.execute(f"ALTER TABLE {SILVER_MITMA_TABLE} ADD COLUMN origin_zone_key INTEGER")
+            con.execute(f"ALTER TABLE {SILVER_MITMA_TABLE} ADD COLUMN destination_zone_key INTEGER")
+        register_zones(con, f"""
+            SELECT origin_zone AS zone_id FROM {SILVER_MITMA_TABLE}
+            UNION SELECT destination_zone FROM {SILVER_MITMA_TABLE}
+        """)
         con.execute(f"""
-        INSERT INTO {SILVER_MITMA_TABLE} 
+            UPDATE {SILVER_MITMA_TABLE} SET
+                origin_zone_key = {zone_key_sql('origin_zone')},
+                destination_zone_key = {zone_key_sql('destination_zone')}
+        """)
+
+
+def _silver_filter(where: str) -> str:
+    return f"""
+            {where}
+            AND b.origin_zone NOT LIKE 'PT%'
+            AND b.destination_zone NOT LIKE 'PT%'
+            AND b.origin_zone NOT LIKE 'FR%'
+            AND b.destination_zone NOT LIKE 'FR%'
+            AND b.origin_zone <> 'externo'
+            AND b.destination_zone <> 'externo'
+            AND b.trips IS NOT NULL
+            AND b.hour_period IS NOT NULL
+    """
+
+
+def silver_zones_sql(source: str, where: str = "TRUE") -> str:
+    """Normalised zone codes of the rows of `source` (aliased b) that go into silver."""
+    return f"""
+        SELECT {zone_id_sql('b.origin_zone')} AS zone_id FROM {source} b WHERE {_silver_filter(where)}
+        UNION
+        SELECT {zone_id_sql('b.destination_zone')} AS zone_id FROM {source} b WHERE {_silver_filter(where)}
+    """
+
+
+def report_unkeyed_zones(con, source: str, where: str = "TRUE") -> int:
+    """
+    Rows of `source` (aliased b) that pass the silver filter but are dropped
+    because a zone code does not cast to a zone_key. Prints the count and
+    the codes involved; returns the count.
+    """
+    unkeyed = f"({zone_key_sql('b.origin_zone')} IS NULL OR {zone_key_sql('b.destination_zone')} IS NULL)"
+    rows, codes = con.execute(f"""
+        SELECT COUNT(*),
+               list_sort(list_distinct(flatten(list(
+                   list_filter([b.origin_zone, b.destination_zone], z -> {zone_key_sql('z')} IS NULL)
+               ))))[:10]
+        FROM {source} b
+        WHERE {_silver_filter(where)} AND {unkeyed}
+    """).fetchone()
+    if rows:
+        print(f"⚠️ Silver: {rows} rows dropped, zone codes without an integer key: {', '.join(codes)}")
+    return rows
+
+
+def silver_select_sql(source: str, day_type_sql: str, where: str = "TRUE", joins: str = "") -> str:
+    """
+    SELECT turning bronze-shaped rows of `source` (aliased b) into silver rows:
+    foreign/external zones dropped, _AM/_AD suffixes normalised and the zones'
+    dim_zone keys attached (the codes cast to INTEGER, see zones_mitma).
+    Rows whose codes do not cast are dropped too (see report_unkeyed_zones).
+    Shared by transform_mitma_silver and the fused CSV-to-silver path
+    (load_silver_from_staging).
+    """
+    return f"""
         SELECT
-            strptime(CAST(date AS VARCHAR), '%Y%m%d')::DATE AS date,
-            TRY_CAST(hour_period AS INTEGER) AS hour_period,
-            REPLACE(REPLACE(origin_zone, '_AM', ''), '_AD', '') AS origin_zone,
-            REPLACE(REPLACE(destination_zone, '_AM', ''), '_AD', '') AS destination_zone,
-            TRY_CAST(trips AS DOUBLE) AS trips,
-            {day_type_constant} AS day_type
-        FROM {BRONZE_MITMA_TABLE}
-        WHERE
-            CAST(date AS VARCHAR) = '{target_date_raw}'
-            AND origin_zone NOT LIKE 'PT%'
-            AND destination_zone NOT LIKE 'PT%'
-            AND origin_zone NOT LIKE 'FR%'
-            AND destination_zone NOT LIKE 'FR%'
-            AND origin_zone <> 'externo'
-            AND destination_zone <> 'externo'
-            AND strptime(CAST(date AS VARCHAR), '%Y%m%d') IS NOT NULL
-            AND TRY_CAST(trips AS DOUBLE) IS NOT NULL
-            AND TRY_CAST(hour_period AS INTEGER) IS NOT NULL;
-            """)
-        
-        total_count = con.execute(f"SELECT COUNT(*) FROM {SILVER_MITMA_TABLE};").fetchone()[0]
-        print(f"✅ Success: Silver Layer updated. Total rows in '{SILVER_MITMA_TABLE}': {total_count}")
-        # Remove the outliers 
-        #con.execute(f
-        """
-            DELETE FROM {GOLD_MITMA_TABLE}
-            WHERE (day_type, hour_period, origin_zone, destination_zone) IN (
-                SELECT b.day_type, b.hour_period, b.origin_zone, b.destination_zone
-                FROM {GOLD_MITMA_TABLE} b
-                WHERE b.trips NOT BETWEEN (s.mean_trips - 10 * s.std_trips) 
-                                    AND (s.mean_trips + 10 * s.std_trips)
-            );
-        """
-        #)
-        print(" Data quality clean and fixes applied successfully.")
+            b.date,
+            CAST(b.hour_period AS INTEGER) AS hour_period,
+            {zone_id_sql('b.origin_zone')} AS origin_zone,
+            {zone_id_sql('b.destination_zone')} AS destination_zone,
+            b.trips,
+            {day_type_sql} AS day_type,
+            {zone_key_sql('b.origin_zone')} AS origin_zone_key,
+            {zone_key_sql('b.destination_zone')} AS destination_zone_key
+        FROM {source} b
+        {joins}
+        WHERE {_silver_filter(where)}
+            AND {zone_key_sql('b.origin_zone')} IS NOT NULL
+            AND {zone_key_sql('b.destination_zone')} IS NOT NULL
+    """
+
+
+def load_silver_from_staging(con, staging: str, days: list, commit_token: str = None):
+    """
+    Fused path: writes the silver rows of `days` straight from a staging table
+    holding the freshly read source rows (see bronze_mitma fused mode), so
+    bronze is not scanned again. Marks the dates as loaded into silver.
+    """
+    if not days:
+        return
+    ensure_dim_date(con, days)
+    report_unkeyed_zones(con, staging)
+    replace_partition(con, SILVER_MITMA_TABLE, days, silver_select_sql(
+        staging,
+        day_type_sql="d.day_type",
+        joins=f"JOIN {DIM_DATE_TABLE} d ON d.date = b.date",
+    ), order_by=silver_sort_keys())
+    token = commit_token or tag_commit(con, "silver", f"{len(days)} dates (fused)")
+    for d in days:
+        record_silver(con, d.strftime('%Y%m%d'), token)
+    print(f"✅ Silver written from the staged source rows for {len(days)} dates")
+
+
+def register_silver_zones(con, urls: list) -> int:
+    """
+    Registers in dim_zone the zones the bronze rows of urls' dates bring to
+    silver. Run once for all the dates of a DAG run, after bronze and before
+    gold, so dim_zone has a single writer.
+    """
+    days = sorted({d for d in (extract_date_from_url(url) for url in urls) if d})
+    if not days:
+        return 0
+    day_list = ", ".join(f"DATE '{d.isoformat()}'" for d in days)
+    return register_zones(con, silver_zones_sql(BRONZE_MITMA_TABLE, where=f"b.date IN ({day_list})"))
+
+
+def transform_mitma_silver_dates(con, urls: list, commit_token: str = None) -> dict:
+    """
+    Rebuilds the silver rows of a set of dates from bronze in one statement,
+    taking each row's day_type from dim_date. Dates without bronze rows end up
+    empty in silver. Marks the dates as loaded into silver in the ingestion
+    manifest (see manifest_mitma). Returns {raw YYYYMMDD date: silver rows}.
+    """
+    days = sorted({d for d in (extract_date_from_url(url) for url in urls) if d})
+    if not days:
+        print("⚠️ No dates could be extracted from the URLs. Skipping.")
+        return {}
+    ensure_dim_date(con, days)
+    day_list = ", ".join(f"DATE '{d.isoformat()}'" for d in days)
+
+    report_unkeyed_zones(con, BRONZE_MITMA_TABLE, where=f"b.date IN ({day_list})")
+    with ducklake_transaction(con, label=f"silver {len(days)} dates"):
+        # Only these dates' partition files are dropped and rewritten
+        inserted = replace_partition(con, SILVER_MITMA_TABLE, days, silver_select_sql(
+            BRONZE_MITMA_TABLE,
+            day_type_sql="d.day_type",
+            where=f"b.date IN ({day_list})",
+            joins=f"JOIN {DIM_DATE_TABLE} d ON d.date = b.date",
+        ), order_by=silver_sort_keys())
+    counts = {
+        row[0].strftime('%Y%m%d'): row[1] for row in con.execute(f"""
+            SELECT date, COUNT(*) FROM {SILVER_MITMA_TABLE} WHERE date IN ({day_list}) GROUP BY date
+        """).fetchall()
+    }
+    for d in days:
+        raw = d.strftime('%Y%m%d')
+        if raw not in counts:
+            print(f"⚠️ WARNING: No rows found in Bronze for raw date '{raw}'.")
+
+    entries = manifest_entries(con, [d.strftime('%Y%m%d') for d in days])
+    if entries:
+        token = commit_token or tag_commit(con, "silver", f"{len(days)} dates")
+        for raw in entries:
+            record_silver(con, raw, token)
+    print(f"✅ Success: Silver Layer updated for {len(days)} dates ({inserted} rows).")
+    return {d.strftime('%Y%m%d'): counts.get(d.strftime('%Y%m%d'), 0) for d in days}
+
+
+def transform_mitma_silver(con,url:str,commit_token:str=None):
+    """
+    Rebuilds the silver rows of one date from bronze (see
+    transform_mitma_silver_dates). Returns the number of silver rows written.
+    """
+    try:
+        date_obj = extract_date_from_url(url)
+        if not date_obj:
+            print(f"⚠️ Could not extract date from {url}. Skipping.")
+            return
+        return transform_mitma_silver_dates(con, [url], commit_token).get(date_obj.strftime('%Y%m%d'), 0)
     except Exception as e:
         print(f"Error during DQ process: {e}")
         raise e
-        
\ No newline at end of file
@@ -0,0 +1,91 @@
+"""
+dim_zone: integer keys for MITMA zones.
+
+MITMA identifies zones by VARCHAR codes: 7-digit districts (province 2 +
+municipality 3 + district 2, e.g. 2807901) and 5-digit municipalities
+(e.g. 01001, also the _AM/_AD aggregates once their suffix is dropped).
+dim_zone gives each normalised code an INTEGER zone_key and precomputes the
+integer district/municipality/province ids, so silver and gold join and
+group on INTEGER keys instead of hashing strings, and municipality rollups
+read municipality_key instead of computing LEFT(zone, 5) on every row.
+
+zone_key is not a surrogate: it is the zone code cast to INTEGER
+(zone_key_sql), so any task can compute it without reading dim_zone, silver
+attaches keys on its own and parallel writers cannot assign different keys
+to the same zone. 5-digit municipality codes and 7-digit district codes
+never collide (provinces are 01-52). Codes that do not cast have no key:
+they are not registered, and silver drops their rows and reports how many
+(see silver_mitma.report_unkeyed_zones). The DAG adds a run's zones in a
+single task, and check_dim_zone_unique() guards against duplicate rows.
+"""
+from ducklake_utils import DIM_ZONE_TABLE, table_exists
+
+
+def zone_id_sql(column: str) -> str:
+    """Normalised zone code of a raw MITMA zone column (_AM/_AD suffixes dropped)."""
+    return f"REPLACE(REPLACE({column}, '_AM', ''), '_AD', '')"
+
+
+def zone_key_sql(column: str) -> str:
+    """dim_zone key of a raw MITMA zone column: its normalised code cast to INTEGER (NULL if it does not cast)."""
+    return f"TRY_CAST({zone_id_sql(column)} AS INTEGER)"
+
+
+def create_dim_zone_table(con):
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {DIM_ZONE_TABLE} (
+            zone_key INTEGER,
+            zone_id VARCHAR,
+            zone_level VARCHAR,
+            district_key INTEGER,
+            municipality_key INTEGER,
+            province_key SMALLINT,
+            municipality_id VARCHAR,
+            province_id VARCHAR
+        );
+    """)
+
+
+def register_zones(con, zones_sql: str, params=None) -> int:
+    """
+    Adds to dim_zone the zone codes returned by zones_sql (one zone_id column,
+    already normalised) that it does not hold yet. Returns the zones added.
+    """
+    if not table_exists(con, DIM_ZONE_TABLE):
+        create_dim_zone_table(con)
+    added = con.execute(f"""
+        INSERT INTO {DIM_ZONE_TABLE}
+        WITH new_zones AS (
+            SELECT DISTINCT zone_id FROM ({zones_sql}) z
+            WHERE TRY_CAST(zone_id AS INTEGER) IS NOT NULL
+              AND zone_id NOT IN (SELECT zone_id FROM {DIM_ZONE_TABLE})
+        )
+        SELECT
+            TRY_CAST(zone_id AS INTEGER) AS zone_key,
+            zone_id,
+            CASE length(zone_id) WHEN 7 THEN 'district' WHEN 5 THEN 'municipality' END AS zone_level,
+            CASE WHEN length(zone_id) = 7 THEN TRY_CAST(zone_id AS INTEGER) END AS district_key,
+            TRY_CAST(LEFT(zone_id, 5) AS INTEGER) AS municipality_key,
+            TRY_CAST(LEFT(zone_id, 2) AS SMALLINT) AS province_key,
+            LEFT(zone_id, 5) AS municipality_id,
+            LEFT(zone_id, 2) AS province_id
+        FROM new_zones
+    """, params).fetchone()[0]
+    if added:
+        print(f"🗺️ dim_zone: {added} new zones registered")
+    check_dim_zone_unique(con)
+    return added
+
+
+def check_dim_zone_unique(con):
+    """Raises ValueError if a zone_id or a (non-NULL) zone_key appears more than once in dim_zone."""
+    duplicates = con.execute(f"""
+        SELECT 'zone_id' AS col, zone_id AS value FROM {DIM_ZONE_TABLE} GROUP BY zone_id HAVING COUNT(*) > 1
+        UNION ALL
+        SELECT 'zone_key', CAST(zone_key AS VARCHAR) FROM {DIM_ZONE_TABLE}
+        WHERE zone_key IS NOT NULL GROUP BY zone_key HAVING COUNT(*) > 1
+        ORDER BY 1, 2
+    """).fetchall()
+    if duplicates:
+        listed = ", ".join(f"{col}={value}" for col, value in duplicates[:10])
+        raise ValueError(f"{DIM_ZONE_TABLE} has {len(duplicates)} duplicated keys: {listed}")
@@ -0,0 +1,299 @@
+"""
+Telemetría de consultas de las sesiones DuckLake.
+
+ducklake_session() envuelve su conexión en una InstrumentedConnection que
+registra, por cada con.execute() y con.executemany():
+    - tiempo de reloj (ejecución + lectura del resultado con fetch*)
+    - filas producidas (escritas en INSERT/CREATE AS/DELETE/UPDATE, devueltas en el resto)
+    - filas y bytes escaneados (del perfil de DuckDB)
+    - el módulo.función que la lanza y la tarea de Airflow en curso
+
+DuckDB produce los resultados de un SELECT en streaming: el perfil solo está
+completo cuando se ha leído el resultado. Por eso execute() devuelve un
+TrackedResult que cierra el registro tras fetchall/fetchdf/arrow...; si el
+resultado no se lee (escrituras), el registro se cierra en la siguiente
+sentencia o al terminar la sesión.
+
+Al terminar la sesión se imprime un resumen de las sentencias más lentas y
+se persisten los registros.
+
+executemany() no devuelve un resultado que leer: se registra al terminar, con
+su tiempo total y sin perfil (el de DuckDB solo cubriría el último juego de
+parámetros).
+
+Variables de entorno:
+    DUCKLAKE_TELEMETRY       "0" desactiva el registro (activo por defecto)
+    DUCKLAKE_TELEMETRY_SINK  "file" (defecto), "lake" (tabla ops_query_log) o "both"
+    DUCKLAKE_TELEMETRY_DIR   directorio de los ficheros JSONL (defecto $AIRFLOW_HOME/data/telemetry)
+"""
+import datetime
+import json
+import os
+import sys
+import time
+
+OPS_QUERY_LOG_TABLE = "ops_query_log"
+SUMMARY_TOP_N = 5
+
+# Operadores cuya cardinalidad hija es el número de filas escritas/afectadas.
+_WRITE_OPERATORS = {
+    "INSERT", "CREATE_TABLE_AS", "DELETE_OPERATOR", "DELETE", "UPDATE", "BATCH_COPY_TO_FILE", "COPY_TO_FILE",
+}
+
+
+def telemetry_enabled() -> bool:
+    return os.environ.get("DUCKLAKE_TELEMETRY", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def _telemetry_dir() -> str:
+    default_dir = os.path.join(os.environ.get("AIRFLOW_HOME", "."), "data", "telemetry")
+    return os.environ.get("DUCKLAKE_TELEMETRY_DIR", default_dir)
+
+
+def _airflow_task() -> str:
+    dag_id = os.environ.get("AIRFLOW_CTX_DAG_ID")
+    task_id = os.environ.get("AIRFLOW_CTX_TASK_ID")
+    if dag_id and task_id:
+        return f"{dag_id}.{task_id}"
+    return task_id or ""
+
+
+def _calling_function() -> str:
+    """Primer frame fuera de este módulo, p. ej. 'silver_mitma.transform_mitma_silver'."""
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_globals.get("__name__") == __name__:
+        frame = frame.f_back
+    if frame is None:
+        return ""
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}"
+
+
+def _statement_label(query: str, limit: int = 160) -> str:
+    return " ".join(query.split())[:limit]
+
+
+def _rows_produced(profile: dict) -> int:
+    children = profile.get("children") or []
+    if children and children[0].get("operator_type") in _WRITE_OPERATORS:
+        return sum(c.get("operator_cardinality", 0) for c in children[0].get("children", []))
+    return profile.get("rows_returned", 0)
+
+
+class QueryLog:
+    """Registros de sentencias recogidos durante una sesión."""
+
+    def __init__(self):
+        self.records = []
+
+    def record(self, query: str, seconds: float, caller: str, profile=None, error=None):
+        profile = profile or {}
+        self.records.append({
+            "recorded_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "task": _airflow_task(),
+            "caller": caller,
+            "statement": _statement_label(query),
+            "seconds": round(seconds, 6),
+            "rows_produced": _rows_produced(profile) if profile else None,
+            "rows_scanned": profile.get("cumulative_rows_scanned"),
+            "bytes_read": profile.get("total_bytes_read"),
+            "error": str(error) if error else None,
+        })
+
+    def summary(self, top_n: int = SUMMARY_TOP_N) -> str:
+        if not self.records:
+            return "📈 Telemetría de consultas: ninguna sentencia registrada."
+        total = sum(r["seconds"] for r in self.records)
+        lines = [f"📈 Telemetría de consultas: {len(self.records)} sentencias, {total:.2f}s en total. Más lentas:"]
+        for r in sorted(self.records, key=lambda r: r["seconds"], reverse=True)[:top_n]:
+            share = (r["seconds"] / total * 100) if total else 0
+            lines.append(
+                f"   {r['seconds']:8.2f}s {share:5.1f}%  rows={r['rows_produced']}  "
+                f"scanned={r['rows_scanned']}  {r['caller']}: {r['statement'][:80]}"
+            )
+        return "\n".join(lines)
+
+    def write_file(self):
+        directory = _telemetry_dir()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"queries-{datetime.date.today():%Y%m%d}.jsonl")
+        with open(path, "a") as f:
+            for r in self.records:
+                f.write(json.dumps(r) + "\n")
+        return path
+
+    def write_lake(self, con):
+        """Añade los registros a ops_query_log en una única transacción (un snapshot)."""
+        columns = list(self.records[0])
+        con.execute(f"""
+            CREATE TABLE IF NOT EXISTS {OPS_QUERY_LOG_TABLE} (
+                recorded_at TIMESTAMP,
+                task VARCHAR,
+                caller VARCHAR,
+                statement VARCHAR,
+                seconds DOUBLE,
+                rows_produced BIGINT,
+                rows_scanned BIGINT,
+                bytes_read BIGINT,
+                error VARCHAR
+            )
+        """)
+        placeholders = ", ".join("?" for _ in columns)
+        con.execute("BEGIN TRANSACTION")
+        try:
+            con.executemany(
+                f"INSERT INTO {OPS_QUERY_LOG_TABLE} ({', '.join(columns)}) VALUES ({placeholders})",
+                [[r[c] for c in columns] for r in self.records],
+            )
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+
+    def flush(self, con=None):
+        """Persiste los registros según DUCKLAKE_TELEMETRY_SINK y los vacía."""
+        if not self.records:
+            return
+        sink = os.environ.get("DUCKLAKE_TELEMETRY_SINK", "file").lower()
+        try:
+            if sink in ("file", "both"):
+                self.write_file()
+            if sink in ("lake", "both") and con is not None:
+                self.write_lake(con)
+        except Exception as e:
+            # La telemetría nunca debe hacer fallar la tarea.
+            print(f"⚠️ No se pudo persistir la telemetría de consultas: {e}")
+        self.records = []
+
+
+# Métodos que leen el resultado completo: tras ellos el perfil ya es definitivo.
+_FETCH_METHODS = {
+    "fetchall", "fetchone", "fetchdf", "fetch_df", "df", "fetchnumpy", "arrow",
+    "fetch_arrow_table", "to_arrow_table", "pl",
+}
+
+
+class TrackedResult:
+    """
+    Resultado de InstrumentedConnection.execute(). Delega en el resultado de
+    DuckDB y, al leerlo con un método fetch, suma el tiempo de lectura y cierra
+    el registro de la sentencia con el perfil ya completo.
+    """
+
+    def __init__(self, owner, result, token):
+        self._owner = owner
+        self._result = result
+        self._token = token
+
+    def __getattr__(self, name):
+        attr = getattr(self._result, name)
+        if name not in _FETCH_METHODS or not callable(attr):
+            return attr
+
+        def fetch(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                self._owner._finish_pending(self._token, time.perf_counter() - start)
+        return fetch
+
+
+class InstrumentedConnection:
+    """Proxy sobre una conexión DuckDB que registra cada execute() y executemany()."""
+
+    def __init__(self, con, log=None, enabled=True):
+        self._con = con
+        self.log = log or QueryLog()
+        self.enabled = enabled
+        # Sentencia ejecutada cuyo registro espera a la lectura del resultado
+        self._pending = None
+        # Funciones notificadas con el texto de cada sentencia (p. ej. invalidar la caché del catálogo).
+        self.listeners = []
+        if enabled:
+            try:
+                con.execute("SET enable_profiling='no_output'")
+            except Exception:
+                self.enabled = False
+
+    @property
+    def raw(self):
+        """Conexión DuckDB subyacente."""
+        return self._con
+
+    def _profile(self):
+        try:
+            return json.loads(self._con.get_profiling_information(format="json"))
+        except Exception:
+            return None
+
+    def _notify(self, query):
+        for listener in self.listeners:
+            listener(query)
+
+    def _finish_pending(self, token=None, fetch_seconds: float = 0.0):
+        """Cierra el registro pendiente (si token no coincide, ya se cerró)."""
+        pending = self._pending
+        if pending is None or (token is not None and pending["token"] is not token):
+            return
+        self._pending = None
+        self.log.record(pending["query"], pending["seconds"] + fetch_seconds, pending["caller"],
+                        profile=self._profile())
+
+    def execute(self, query, parameters=None):
+        if not self.enabled:
+            try:
+                return self._con.execute(query, parameters)
+            finally:
+                self._notify(query)
+        # El perfil de la sentencia anterior se pierde al ejecutar la siguiente
+        self._finish_pending()
+        caller = _calling_function()
+        start = time.perf_counter()
+        try:
+            result = self._con.execute(query, parameters)
+        except Exception as e:
+            self.log.record(query, time.perf_counter() - start, caller, error=e)
+            raise
+        finally:
+            self._notify(query)
+        token = object()
+        self._pending = {"query": query, "caller": caller, "seconds": time.perf_counter() - start, "token": token}
+        return TrackedResult(self, result, token)
+
+    def executemany(self, query, parameters=None):
+        if not self.enabled:
+            try:
+                return self._con.executemany(query, parameters)
+            finally:
+                self._notify(query)
+        self._finish_pending()
+        caller = _calling_function()
+        start = time.perf_counter()
+        try:
+            result = self._con.executemany(query, parameters)
+        except Exception as e:
+            self.log.record(query, time.perf_counter() - start, caller, error=e)
+            raise
+        finally:
+            self._notify(query)
+        self.log.record(query, time.perf_counter() - start, caller)
+        return result
+
+    def finish(self):
+        """Imprime el resumen de la sesión, persiste los registros y desactiva el perfilado."""
+        if not self.enabled:
+            return
+        self._finish_pending()
+        print(self.log.summary())
+        self.log.flush(self._con)
+        try:
+            self._con.execute("RESET enable_profiling")
+        except Exception:
+            pass
+
+    def __getattr__(self, name):
+        attr = getattr(self._con, name)
+        if name not in _FETCH_METHODS or not callable(attr) or self._pending is None:
+            return attr
+        # con.execute(...); con.fetchall(): lectura sobre la conexión
+        return TrackedResult(self, self._con, self._pending["token"]).__getattr__(name)
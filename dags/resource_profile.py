@@ -0,0 +1,301 @@
+"""
+Perfil de recursos de las sesiones DuckDB.
+
+Calcula memory_limit, threads y el directorio temporal a partir de lo que el
+worker puede usar de verdad, en lugar de valores fijos:
+
+- memoria: límite del cgroup (v2 memory.max / v1 memory.limit_in_bytes), si no la RAM del host
+- cpus:    cuota del cgroup (v2 cpu.max / v1 cfs_quota_us), si no la máscara de afinidad
+- ambos se reparten entre las tareas DuckDB vivas en el worker (sesiones
+  registradas), con la concurrencia configurada como máximo
+
+Variables de entorno:
+    DUCKDB_MEMORY_LIMIT       memory_limit explícito (p. ej. '12GB'), sin detección
+    DUCKDB_THREADS            número de hilos explícito, sin detección
+    DUCKDB_CONCURRENT_TASKS   máximo de tareas DuckDB simultáneas en este worker
+                              (por defecto AIRFLOW__CELERY__WORKER_CONCURRENCY)
+    DUCKDB_TEMP_DIR           directorio de volcado, sin detección
+    DUCKDB_SESSION_REGISTRY   directorio donde se registran las sesiones vivas (default /tmp/duckdb_sessions)
+"""
+import os
+import threading
+
+# Fracción de la memoria de cada tarea que se da a DuckDB; el resto es margen
+# para Python, pandas y las reservas propias de las extensiones.
+DEFAULT_MEMORY_FRACTION = 0.75
+
+# Ajustes por etapa para los pasos pesados. Las etapas "exclusive" suponen que
+# corren solas en el worker y no se dividen por la concurrencia.
+STAGE_OVERRIDES = {
+    "transform_gold_mitma": {"exclusive": True, "memory_fraction": 0.85, "large_aggregations": True},
+    "create_municipality_distances": {"exclusive": True, "large_aggregations": True},
+}
+
+TEMP_DIR_CANDIDATES = [
+    "/local_disk0/duckdb_temp",
+    "/mnt/nvme/duckdb_temp",
+    "/mnt/duckdb_temp",
+    "/tmp/duckdb_temp",
+]
+
+_CGROUP_V1_UNLIMITED = 1 << 60
+_GB = 1024 ** 3
+_MB = 1024 ** 2
+
+
+def _read_first_line(path: str):
+    try:
+        with open(path) as f:
+            return f.readline().strip()
+    except OSError:
+        return None
+
+
+def cgroup_memory_limit_bytes():
+    """Límite de memoria del cgroup del contenedor en bytes, o None si no hay."""
+    value = _read_first_line("/sys/fs/cgroup/memory.max")
+    if value is None:
+        value = _read_first_line("/sys/fs/cgroup/memory/memory.limit_in_bytes")
+    if not value or value == "max":
+        return None
+    try:
+        limit = int(value)
+    except ValueError:
+        return None
+    return limit if limit < _CGROUP_V1_UNLIMITED else None
+
+
+def host_memory_bytes() -> int:
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+
+def cgroup_cpu_limit():
+    """Cuota de CPU del cgroup del contenedor (puede ser fraccionaria), o None si no hay."""
+    value = _read_first_line("/sys/fs/cgroup/cpu.max")
+    if value:
+        quota, _, period = value.partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+    quota = _read_first_line("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+    period = _read_first_line("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def available_cpus() -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpu_limit()
+    if quota:
+        cpus = min(cpus, max(1, int(quota)))
+    return max(1, cpus)
+
+
+def _registry_dir() -> str:
+    return os.environ.get("DUCKDB_SESSION_REGISTRY", "/tmp/duckdb_sessions")
+
+
+# Sesiones abiertas de este proceso; la marca se borra al cerrar la última
+_OPEN_SESSIONS = {"pid": None, "count": 0}
+_OPEN_SESSIONS_LOCK = threading.Lock()
+
+
+def _marker_path() -> str:
+    return os.path.join(_registry_dir(), str(os.getpid()))
+
+
+def _open_sessions() -> dict:
+    # Un hijo de fork empieza sin sesiones propias
+    if _OPEN_SESSIONS["pid"] != os.getpid():
+        _OPEN_SESSIONS.update(pid=os.getpid(), count=0)
+    return _OPEN_SESSIONS
+
+
+def register_duckdb_session():
+    """Marca este proceso como poseedor de una sesión DuckDB (un fichero por pid)."""
+    with _OPEN_SESSIONS_LOCK:
+        _open_sessions()["count"] += 1
+    try:
+        os.makedirs(_registry_dir(), exist_ok=True)
+        open(_marker_path(), "a").close()
+    except OSError:
+        pass
+
+
+def unregister_duckdb_session():
+    """Contraparte de register_duckdb_session(), al cerrar una sesión."""
+    with _OPEN_SESSIONS_LOCK:
+        sessions = _open_sessions()
+        sessions["count"] = max(sessions["count"] - 1, 0)
+        if sessions["count"]:
+            return
+        try:
+            os.remove(_marker_path())
+        except OSError:
+            pass
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def live_duckdb_sessions() -> int:
+    """Procesos vivos con sesiones en el registro (las marcas huérfanas se borran)."""
+    registry = _registry_dir()
+    try:
+        entries = os.listdir(registry)
+    except OSError:
+        return 1
+    alive = 0
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        if _pid_alive(int(entry)):
+            alive += 1
+        else:
+            try:
+                os.remove(os.path.join(registry, entry))
+            except OSError:
+                pass
+    return max(alive, 1)
+
+
+def concurrent_duckdb_tasks() -> int:
+    """
+    Tareas DuckDB entre las que repartir el worker: las sesiones vivas, con la
+    concurrencia configurada como tope (una tarea sola usa todo el worker).
+    """
+    configured = os.environ.get("DUCKDB_CONCURRENT_TASKS") or os.environ.get(
+        "AIRFLOW__CELERY__WORKER_CONCURRENCY"
+    )
+    live = live_duckdb_sessions()
+    if configured and configured.isdigit() and int(configured) > 0:
+        return min(live, int(configured))
+    return live
+
+
+def _is_tmpfs(path: str) -> bool:
+    """Un volcado en tmpfs contaría contra el mismo límite de memoria que se protege."""
+    try:
+        with open("/proc/mounts") as f:
+            mounts = [line.split() for line in f]
+    except OSError:
+        return False
+    path = os.path.realpath(path)
+    best, best_type = "", None
+    for fields in mounts:
+        if len(fields) < 3:
+            continue
+        mount_point, fs_type = fields[1], fields[2]
+        inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+        if inside and len(mount_point) > len(best):
+            best, best_type = mount_point, fs_type
+    return best_type == "tmpfs"
+
+
+def pick_temp_directory() -> str:
+    """Primer candidato en disco local, escribible y que no sea tmpfs."""
+    explicit = os.environ.get("DUCKDB_TEMP_DIR")
+    if explicit:
+        return explicit
+    for candidate in TEMP_DIR_CANDIDATES:
+        parent = os.path.dirname(candidate)
+        if os.path.isdir(parent) and os.access(parent, os.W_OK) and not _is_tmpfs(parent):
+            return candidate
+    return TEMP_DIR_CANDIDATES[-1]
+
+
+def _free_disk_bytes(path: str) -> int:
+    probe = path
+    while probe and not os.path.exists(probe):
+        probe = os.path.dirname(probe)
+    stats = os.statvfs(probe or "/")
+    return stats.f_bavail * stats.f_frsize
+
+
+def _parse_bytes(value: str) -> int:
+    """'12GB' / '512MB' / '1.5GiB' -> bytes."""
+    units = {"KB": 1024, "MB": _MB, "GB": _GB, "TB": 1024 * _GB, "B": 1}
+    text = value.strip().upper().replace("IB", "B")
+    for suffix, factor in units.items():
+        if text.endswith(suffix):
+            return int(float(text[: -len(suffix)]) * factor)
+    return int(float(text))
+
+
+def _stage_concurrency(stage) -> tuple:
+    """(ajustes de la etapa, tareas entre las que se reparte el worker)."""
+    override = STAGE_OVERRIDES.get(stage, {}) if stage else {}
+    return override, 1 if override.get("exclusive") else concurrent_duckdb_tasks()
+
+
+def _memory_share(override: dict, concurrency: int) -> int:
+    explicit = os.environ.get("DUCKDB_MEMORY_LIMIT")
+    if explicit:
+        return _parse_bytes(explicit)
+    total_memory = cgroup_memory_limit_bytes() or host_memory_bytes()
+    fraction = override.get("memory_fraction", DEFAULT_MEMORY_FRACTION)
+    return int(total_memory * fraction / concurrency)
+
+
+def task_memory_bytes(stage=None) -> int:
+    """Memoria que DuckDB puede usar en una tarea de esta etapa (la de resource_profile)."""
+    return _memory_share(*_stage_concurrency(stage))
+
+
+def _format_bytes(n: int) -> str:
+    if n >= _GB:
+        return f"{n / _GB:.1f}GB"
+    return f"{max(1, n // _MB)}MB"
+
+
+def resource_profile(stage=None) -> dict:
+    """Ajustes de DuckDB para este worker y (opcionalmente) una etapa concreta."""
+    override, concurrency = _stage_concurrency(stage)
+    memory_limit = os.environ.get("DUCKDB_MEMORY_LIMIT") or _format_bytes(_memory_share(override, concurrency))
+
+    threads_env = os.environ.get("DUCKDB_THREADS")
+    threads = int(threads_env) if threads_env else max(1, available_cpus() // concurrency)
+
+    temp_directory = pick_temp_directory()
+    max_temp_size = _format_bytes(int(_free_disk_bytes(temp_directory) * 0.8 / concurrency))
+
+    return {
+        "stage": stage,
+        "memory_limit": memory_limit,
+        "threads": threads,
+        "temp_directory": temp_directory,
+        "max_temp_directory_size": max_temp_size,
+        "concurrency": concurrency,
+        "memory_source": "cgroup" if cgroup_memory_limit_bytes() else "host",
+        "large_aggregations": override.get("large_aggregations", False),
+    }
+
+
+def apply_resource_profile(con, stage=None) -> dict:
+    """Aplica resource_profile() a una conexión DuckDB y muestra los valores elegidos."""
+    register_duckdb_session()
+    profile = resource_profile(stage)
+
+    con.execute(f"SET threads={profile['threads']};")
+    con.execute(f"SET memory_limit='{profile['memory_limit']}';")
+    con.execute(f"SET temp_directory='{profile['temp_directory']}';")
+    con.execute(f"SET max_temp_directory_size='{profile['max_temp_directory_size']}';")
+
+    print(
+        f"🔧 Recursos de DuckDB (etapa={stage or 'default'}): "
+        f"memory_limit={profile['memory_limit']} ({profile['memory_source']}), "
+        f"threads={profile['threads']}, concurrency={profile['concurrency']}, "
+        f"temp={profile['temp_directory']} (máx. {profile['max_temp_directory_size']})"
+    )
+    return profile
@@ -1,5 +1,9 @@
-import duckdb
-import geopandas as gpd
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import duckdb
 
 
 def filter_geometry_by_shapefile(
@@ -18,6 +22,8 @@ def filter_geometry_by_shapefile(
     Returns:
         Relación DuckDB con los registros filtrados (gold_geometry_wgs84)
     """
+    import geopandas as gpd
+
     # Leer el shapefile y obtener la geometría unificada
     gdf = gpd.read_file(shapefile_path)
     
@@ -64,6 +70,8 @@ def create_gold_geometry_table(
     shapefile_path: str,
     spatial_predicate: str = "intersects"
 ) -> int:
+    import geopandas as gpd
+
     gdf = gpd.read_file(shapefile_path)
     
     # Forzar reproyección a WGS84
@@ -27,7 +27,7 @@ VALENCIA_SHAPEFILE = "/usr/local/airflow/include/valencia.shp"
 
 def verify_silver_table(**context):
     """Verifica que existe silver_geometry_wgs84 y cuenta registros."""
-    con = connect_ducklake()
+    con = connect_ducklake(stage="geometry")
     
     try:
         count = con.execute(
@@ -46,7 +46,7 @@ def verify_silver_table(**context):
 
 def create_gold_table(**context):
     """Crea gold_geometry_wgs84 filtrando por el polígono de Valencia."""
-    con = connect_ducklake()
+    con = connect_ducklake(stage="geometry")
     
     try:
         count = create_gold_geometry_table(
@@ -66,7 +66,7 @@ def verify_gold_table(**context):
     """Verifica la tabla gold y muestra las primeras filas."""
     import geopandas as gpd
     
-    con = connect_ducklake()
+    con = connect_ducklake(stage="geometry")
     
     try:
         sample = con.execute("""
@@ -0,0 +1,36 @@
+"""
+Build step: installs every DuckDB extension the pipeline can request into
+DUCKDB_EXTENSION_DIRECTORY so that sessions never download extensions at
+startup. Run from the Dockerfile (see README) or manually:
+
+    DUCKDB_EXTENSION_DIRECTORY=/usr/local/airflow/duckdb_extensions \
+        python scripts/bake_duckdb_extensions.py
+"""
+import os
+import sys
+
+import duckdb
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dags"))
+
+from ducklake_utils import all_known_extensions  # noqa: E402
+
+
+def main():
+    extension_directory = os.environ.get("DUCKDB_EXTENSION_DIRECTORY")
+    if not extension_directory:
+        raise SystemExit("DUCKDB_EXTENSION_DIRECTORY must be set to bake the extension bundle.")
+    os.makedirs(extension_directory, exist_ok=True)
+
+    con = duckdb.connect(config={"extension_directory": extension_directory})
+    for name in all_known_extensions():
+        print(f"Installing DuckDB extension '{name}' into {extension_directory}")
+        con.execute(f"INSTALL {name};")
+        # LOAD verifies the binary matches this DuckDB version/platform.
+        con.execute(f"LOAD {name};")
+    con.close()
+    print(f"Baked {len(all_known_extensions())} extensions for DuckDB {duckdb.__version__}")
+
+
+if __name__ == "__main__":
+    main()
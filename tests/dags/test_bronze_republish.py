@@ -0,0 +1,75 @@
+"""A date republished upstream is reloaded in bronze and its stale raw Parquet copy is not reused."""
+import gzip
+import os
+import sys
+
+import duckdb
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "dags"))
+
+from ducklake_utils import BRONZE_QUARANTINE_TABLE  # noqa: E402
+from mitma import bronze_mitma, raw_parquet_mitma  # noqa: E402
+from mitma.manifest_mitma import manifest_entries  # noqa: E402
+
+URL = "https://movilidad-opendata.mitma.es/estudios_basicos/por-distritos/viajes/ficheros-diarios/2023-01/20230105_Viajes_distritos.csv.gz"
+HEADER = ("fecha|periodo|origen|destino|distancia|actividad_origen|actividad_destino|"
+          "estudio_origen_posible|estudio_destino_posible|residencia|renta|edad|sexo|viajes|viajes_km")
+
+
+def _daily_file(folder, trips: list) -> str:
+    """The daily file of URL under folder, named like its landing-zone copy."""
+    folder.mkdir()
+    path = folder / URL.rsplit("/", 1)[-1]
+    lines = [HEADER] + [
+        f"20230105|{hour}|2807901|2807902|0.5-2|casa|trabajo|no|no|28|10-15|25-45|mujer|{value}|1.0"
+        for hour, value in enumerate(trips)
+    ]
+    with gzip.open(path, "wt") as f:
+        f.write("\n".join(lines) + "\n")
+    return str(path)
+
+
+def test_republished_date_replaces_bronze_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(bronze_mitma, "ensure_date_partitioning", lambda con, table: None)
+    monkeypatch.setattr(bronze_mitma, "probe_mitma_url", lambda url: None)
+    con = duckdb.connect()
+    bronze_mitma.create_bronze_mitma_table(con)
+
+    v1 = _daily_file(tmp_path / "v1", [1.0, 2.0, "n/a"])
+    v2 = _daily_file(tmp_path / "v2", [5.0, 6.0, 7.0])
+    first = {URL: {"url": URL, "etag": '"v1"', "byte_size": os.path.getsize(v1)}}
+    second = {URL: {"url": URL, "etag": '"v2"', "byte_size": os.path.getsize(v2)}}
+
+    assert bronze_mitma.ingestion_bronze_mitma_batch(con, [URL], {URL: v1}, metadata=first) == [URL]
+    assert con.execute(f"SELECT COUNT(*) FROM {BRONZE_QUARANTINE_TABLE}").fetchone()[0] == 1
+    # Same version again: skipped
+    assert bronze_mitma.ingestion_bronze_mitma_batch(con, [URL], {URL: v1}, metadata=first) == []
+    # New ETag from the fetch plan: old rows replaced
+    assert bronze_mitma.ingestion_bronze_mitma_batch(con, [URL], {URL: v2}, metadata=second) == [URL]
+
+    trips = [row[0] for row in con.execute("SELECT trips FROM bronze_mobility_trips ORDER BY trips").fetchall()]
+    assert trips == [5.0, 6.0, 7.0]
+    # The old version's rejected row left the quarantine with its bronze rows
+    assert con.execute(f"SELECT COUNT(*) FROM {BRONZE_QUARANTINE_TABLE}").fetchone()[0] == 0
+    entry = manifest_entries(con)["20230105"]
+    assert entry["etag"] == '"v2"' and entry["row_count"] == 3
+
+
+def test_raw_parquet_of_older_version_is_not_reused(tmp_path, monkeypatch):
+    monkeypatch.setenv("MITMA_RAW_DIR", str(tmp_path / "raw"))
+    source = _daily_file(tmp_path / "v1", [1.0, 2.0])
+    v1 = {"etag": '"v1"', "byte_size": os.path.getsize(source)}
+    raw_parquet_mitma.convert_to_parquet(URL, source, source_meta=v1)
+
+    assert raw_parquet_mitma.existing_raw_parquet([URL]) == {URL}
+    assert raw_parquet_mitma.existing_raw_parquet([URL], {URL: v1}) == {URL}
+    assert raw_parquet_mitma.existing_raw_parquet([URL], {URL: {**v1, "etag": '"v2"'}}) == set()
+
+
+def test_raw_parquet_without_rejects_sidecar_is_not_converted(tmp_path, monkeypatch):
+    monkeypatch.setenv("MITMA_RAW_DIR", str(tmp_path / "raw"))
+    source = _daily_file(tmp_path / "v1", [1.0])
+    result = raw_parquet_mitma.convert_to_parquet(URL, source)
+    os.remove(bronze_mitma.rejects_path(result["path"]))
+
+    assert raw_parquet_mitma.existing_raw_parquet([URL]) == set()
@@ -0,0 +1,90 @@
+"""Availability probing of MITMA daily files against a local HTTP stand-in."""
+import os
+import sys
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "dags"))
+
+from mitma import fetch_url_mitma  # noqa: E402
+
+PUBLISHED = {"20240101", "20240102", "20240104"}
+FLAKY = {"20240104"}  # answers 503 once before 200
+
+
+class _MitmaStandIn(BaseHTTPRequestHandler):
+    requests_seen = []
+    failed_once = set()
+
+    def do_HEAD(self):
+        raw_date = self.path.rsplit("/", 1)[-1][:8]
+        self.requests_seen.append(raw_date)
+        if raw_date in FLAKY and raw_date not in self.failed_once:
+            self.failed_once.add(raw_date)
+            self.send_response(503)
+        elif raw_date in PUBLISHED:
+            self.send_response(200)
+            self.send_header("ETag", f'"{raw_date}-v1"')
+            self.send_header("Last-Modified", "Mon, 01 Jan 2024 00:00:00 GMT")
+            self.send_header("Content-Length", "1234")
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in(tmp_path, monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _MitmaStandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    _MitmaStandIn.requests_seen = []
+    _MitmaStandIn.failed_once = set()
+    monkeypatch.setenv("MITMA_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}/viajes")
+    monkeypatch.setenv("MITMA_AVAILABILITY_CACHE", str(tmp_path / "availability.json"))
+    yield _MitmaStandIn
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_sources_probes_once_and_caches(stand_in):
+    sources = fetch_url_mitma.fetch_mitma_sources("2024-01-01", "2024-01-05")
+
+    assert [s["url"].rsplit("/", 1)[-1][:8] for s in sources] == sorted(PUBLISHED)
+    assert sources[0]["etag"] == '"20240101-v1"'
+    assert sources[0]["byte_size"] == 1234
+    # Five dates plus one retry of the flaky one
+    assert len(stand_in.requests_seen) == 6
+
+    stand_in.requests_seen = []
+    cached = fetch_url_mitma.fetch_mitma_sources("2024-01-01", "2024-01-05")
+    assert cached == sources
+    assert stand_in.requests_seen == []
+
+
+def test_refresh_reprobes_cached_dates(stand_in):
+    days = [date(2024, 1, 1), date(2024, 1, 3)]
+    fetch_url_mitma.resolve_availability(days)
+    stand_in.requests_seen = []
+
+    result = fetch_url_mitma.resolve_availability(days, refresh=True)
+
+    assert result[date(2024, 1, 1)]["etag"] == '"20240101-v1"'
+    assert result[date(2024, 1, 3)] is None
+    assert sorted(stand_in.requests_seen) == ["20240101", "20240103"]
+
+
+def test_unreachable_urls_are_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv("MITMA_BASE_URL", "http://127.0.0.1:9/viajes")
+    monkeypatch.setenv("MITMA_AVAILABILITY_CACHE", str(tmp_path / "availability.json"))
+
+    result = fetch_url_mitma.resolve_availability([date(2024, 1, 1)])
+
+    assert result == {}
+    assert not (tmp_path / "availability.json").exists()
@@ -0,0 +1,103 @@
+"""Incremental gold stats (folded date by date) match a full refresh from silver."""
+import datetime
+import math
+import os
+import sys
+
+import duckdb
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "dags"))
+
+from mitma import new_gold  # noqa: E402
+from mitma.zones_mitma import register_zones  # noqa: E402
+
+DAYS = [datetime.date(2023, 1, 2) + datetime.timedelta(days=i) for i in range(6)]
+
+
+def _lake():
+    con = duckdb.connect()
+    register_zones(con, "SELECT lpad(CAST(i AS VARCHAR), 7, '0') AS zone_id FROM range(1, 5) t(i)")
+    # Large trip counts with a small spread: sum-of-squares formulas lose the std here
+    con.execute("""
+        CREATE TABLE silver_mobility_trips AS
+        SELECT DATE '2023-01-02' + CAST(i % 6 AS INTEGER) AS date,
+               CAST(i // 6 % 3 AS INTEGER) AS hour_period,
+               lpad(CAST(1 + i // 18 % 4 AS VARCHAR), 7, '0') AS origin_zone,
+               lpad(CAST(1 + i // 72 % 2 AS VARCHAR), 7, '0') AS destination_zone,
+               1e9 + (hash(i) % 1000) / 100.0 AS trips,
+               CAST(i % 2 AS INTEGER) AS day_type,
+               CAST(1 + i // 18 % 4 AS INTEGER) AS origin_zone_key,
+               CAST(1 + i // 72 % 2 AS INTEGER) AS destination_zone_key
+        FROM range(20000) t(i)
+    """)
+    con.execute("CREATE TABLE ops_ingestion_manifest (source_date VARCHAR, silver_commit VARCHAR)")
+    con.execute("INSERT INTO ops_ingestion_manifest SELECT strftime(date, '%Y%m%d'), 'c' FROM "
+                "(SELECT DISTINCT date FROM silver_mobility_trips)")
+    return con
+
+
+def _live_stats(con) -> list:
+    return con.execute(f"""
+        SELECT {new_gold.PATTERN_KEYS}, total_trips, avg_trips, std_trips, num_days_observed
+        FROM {new_gold.GOLD_LIVE_VIEW} ORDER BY ALL
+    """).fetchall()
+
+
+def test_incremental_folds_match_full_refresh():
+    con = _lake()
+    new_gold.create_gold_stats_tables(con)
+    for day in DAYS:
+        new_gold.fold_gold_dates(con, [day])
+    incremental = _live_stats(con)
+
+    assert new_gold.refresh_gold_mitma(con, "full") == "full"
+    full = _live_stats(con)
+    silver = con.execute(f"""
+        SELECT {new_gold.PATTERN_KEYS}, SUM(trips), AVG(trips), STDDEV_SAMP(trips), COUNT(DISTINCT date)
+        FROM silver_mobility_trips GROUP BY ALL ORDER BY ALL
+    """).fetchall()
+
+    assert con.execute("SELECT mismatched_patterns FROM gold_refresh_log").fetchone()[0] == 0
+    assert len(incremental) == len(full) == len(silver) == 48
+    for inc, ful, ref in zip(incremental, full, silver):
+        assert inc[:4] == ful[:4] == ref[:4]
+        assert inc[7] == ful[7] == ref[7]
+        for a, b, expected, tolerance in zip(inc[4:7], ful[4:7], ref[4:7], (1e-12, 1e-12, 1e-6)):
+            assert math.isclose(a, expected, rel_tol=tolerance)
+            assert math.isclose(b, expected, rel_tol=tolerance)
+
+
+def test_rewritten_date_triggers_full_rebuild_with_a_clean_check():
+    con = _lake()
+    assert new_gold.refresh_gold_mitma(con, "incremental") == "incremental"
+
+    # Silver rewrites one folded date (a republished file)
+    con.execute("UPDATE silver_mobility_trips SET trips = trips + 5 WHERE date = DATE '2023-01-04'")
+    con.execute("DELETE FROM silver_mobility_trips WHERE date = DATE '2023-01-04' AND hour_period = 0")
+    con.execute("UPDATE ops_ingestion_manifest SET silver_commit = 'c2' WHERE source_date = '20230104'")
+
+    assert new_gold.refresh_gold_mitma(con, "incremental") == "full"
+    assert con.execute("SELECT mismatched_patterns FROM gold_refresh_log WHERE mode = 'full'").fetchone()[0] == 0
+    assert new_gold.pending_gold_dates(con) == ([], [])
+    silver = con.execute(f"""
+        SELECT {new_gold.PATTERN_KEYS}, SUM(trips), AVG(trips), STDDEV_SAMP(trips), COUNT(DISTINCT date)
+        FROM silver_mobility_trips GROUP BY ALL ORDER BY ALL
+    """).fetchall()
+    for live, ref in zip(_live_stats(con), silver):
+        assert live[:4] == ref[:4] and live[7] == ref[7]
+        assert math.isclose(live[5], ref[5], rel_tol=1e-12)
+        assert math.isclose(live[6], ref[6], rel_tol=1e-6)
+
+
+def test_consistency_check_still_reports_real_discrepancies():
+    con = _lake()
+    new_gold.refresh_gold_mitma(con, "incremental")
+    con.execute("UPDATE ops_ingestion_manifest SET silver_commit = 'c2' WHERE source_date = '20230104'")
+    # A pattern corrupted outside the rewritten date
+    con.execute(f"""
+        UPDATE {new_gold.GOLD_STATS_TABLE} SET max_trips = max_trips + 1
+        WHERE day_type = 1 AND hour_period = 0 AND origin_zone_key = 1 AND destination_zone_key = 1
+    """)
+
+    new_gold.refresh_gold_mitma(con, "auto")
+    assert con.execute("SELECT mismatched_patterns FROM gold_refresh_log WHERE mode = 'full'").fetchone()[0] == 1
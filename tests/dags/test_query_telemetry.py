@@ -0,0 +1,56 @@
+"""Query telemetry records the real rows and time of reads, not only of writes."""
+import json
+import os
+import sys
+
+import duckdb
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "dags"))
+
+from query_telemetry import InstrumentedConnection  # noqa: E402
+
+
+def _session():
+    return InstrumentedConnection(duckdb.connect())
+
+
+def test_select_reports_rows_after_fetch():
+    con = _session()
+    rows = con.execute("SELECT * FROM range(5000)").fetchall()
+    df = con.execute("SELECT * FROM range(1234) WHERE range % 2 = 0").fetchdf()
+
+    assert len(rows) == 5000 and len(df) == 617
+    first, second = con.log.records
+    assert first["rows_produced"] == 5000
+    assert first["rows_scanned"] == 5000
+    assert second["rows_produced"] == 617
+
+
+def test_unfetched_write_is_recorded_on_next_statement_and_finish(tmp_path, monkeypatch):
+    monkeypatch.setenv("DUCKLAKE_TELEMETRY_DIR", str(tmp_path))
+    con = _session()
+    con.execute("CREATE TABLE t AS SELECT * FROM range(300)")
+    con.execute("INSERT INTO t SELECT * FROM range(20)")
+    assert [r["rows_produced"] for r in con.log.records] == [300]
+
+    con.finish()
+    (log_file,) = tmp_path.iterdir()
+    records = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert [r["rows_produced"] for r in records] == [300, 20]
+
+
+def test_fetch_on_connection_closes_the_record():
+    con = _session()
+    con.execute("SELECT * FROM range(42)")
+    assert len(con.fetchall()) == 42
+    assert con.log.records[0]["rows_produced"] == 42
+
+
+def test_executemany_is_recorded():
+    con = _session()
+    con.execute("CREATE TABLE t (i INTEGER)")
+    con.executemany("INSERT INTO t VALUES (?)", [[1], [2], [3]])
+
+    assert [r["statement"] for r in con.log.records] == ["CREATE TABLE t (i INTEGER)", "INSERT INTO t VALUES (?)"]
+    assert con.log.records[1]["caller"].endswith("test_executemany_is_recorded")
+    assert con.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 3
@@ -0,0 +1,26 @@
+"""dim_date.day_type: 8 on holidays, else 0 Sunday, 1 Monday, 2 Tuesday-Thursday, 5 Friday, 6 Saturday."""
+import datetime
+import os
+import sys
+
+import duckdb
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "dags"))
+
+from mitma.silver_mitma import build_dim_date  # noqa: E402
+
+
+def test_dim_date_day_types():
+    con = duckdb.connect()
+    con.execute("CREATE TABLE ref_holidays (date DATE, is_holiday BOOLEAN)")
+    con.execute("INSERT INTO ref_holidays VALUES ('2024-01-01', true), ('2024-01-06', true), ('2024-12-25', true)")
+    build_dim_date(con, 2024)
+
+    day_types = dict(con.execute("SELECT date, day_type FROM dim_date ORDER BY date").fetchall())
+    assert len(day_types) == 366
+    # Week of 2024-01-07 (Sunday) to 2024-01-13 (Saturday)
+    week = [datetime.date(2024, 1, 7) + datetime.timedelta(days=i) for i in range(7)]
+    assert [day_types[day] for day in week] == [0, 1, 2, 2, 2, 5, 6]
+    # Holidays on a Monday, a Saturday and a Wednesday
+    assert [day_types[datetime.date(2024, m, d)] for m, d in ((1, 1), (1, 6), (12, 25))] == [8, 8, 8]
+    assert day_types[datetime.date(2024, 12, 24)] == 2